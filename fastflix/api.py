@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Build encoding commands from a source and a profile without the GUI, or Qt at all.
+
+    from fastflix.api import plan, setup
+
+    fastflix = setup()
+    video = plan("movie.mkv", "Standard Profile", fastflix=fastflix)
+    for command in video.video_settings.conversion_commands:
+        print(command.command)
+
+The result is the same video the GUI would add to the queue when that profile is selected,
+so it can be saved with fastflix.ff_queue.save_queue and encoded by the GUI or `fastflix run-queue`.
+Set up once per process and reuse it, as it runs FFmpeg to see what it supports.
+"""
+import logging
+import tempfile
+from pathlib import Path
+from types import ModuleType, SimpleNamespace
+from typing import Dict, List, Optional, Union
+
+from fastflix.exceptions import FlixError
+from fastflix.flix import ffmpeg_audio_encoders, ffmpeg_configuration, ffprobe_configuration
+from fastflix.language import t
+from fastflix.models.config import Config
+from fastflix.models.fastflix import FastFlix
+from fastflix.models.profiles import Profile
+from fastflix.models.video import Video
+from fastflix.planner import build_video
+from fastflix.resources import get_bool_env
+
+logger = logging.getLogger("fastflix")
+
+__all__ = ["plan", "setup", "load_encoders"]
+
+DEVMODE = get_bool_env("DEVMODE")
+
+
+def load_encoders(config: Config, ffmpeg_config: Optional[List[str]] = None) -> Dict[str, ModuleType]:
+    """Encoders by name, in the order they are listed, leaving out any the FFmpeg build does not include"""
+    from fastflix.encoders.av1_aom import main as av1_plugin
+    from fastflix.encoders.avc_x264 import main as avc_plugin
+    from fastflix.encoders.copy import main as copy_plugin
+    from fastflix.encoders.gif import main as gif_plugin
+    from fastflix.encoders.ffmpeg_hevc_nvenc import main as nvenc_plugin
+    from fastflix.encoders.hevc_x265 import main as hevc_plugin
+    from fastflix.encoders.rav1e import main as rav1e_plugin
+    from fastflix.encoders.svt_av1 import main as svt_av1_plugin
+    from fastflix.encoders.vp9 import main as vp9_plugin
+    from fastflix.encoders.webp import main as webp_plugin
+    from fastflix.encoders.qsvencc_hevc import main as qsvencc_plugin
+    from fastflix.encoders.qsvencc_avc import main as qsvencc_avc_plugin
+    from fastflix.encoders.nvencc_hevc import main as nvencc_plugin
+    from fastflix.encoders.nvencc_avc import main as nvencc_avc_plugin
+    from fastflix.encoders.vceencc_hevc import main as vceencc_hevc_plugin
+    from fastflix.encoders.vceencc_avc import main as vceencc_avc_plugin
+    from fastflix.encoders.hevc_videotoolbox import main as hevc_videotoolbox_plugin
+    from fastflix.encoders.h264_videotoolbox import main as h264_videotoolbox_plugin
+    from fastflix.encoders.svt_av1_avif import main as svt_av1_avif_plugin
+    from fastflix.encoders.nvencc_av1 import main as nvencc_av1_plugin
+    from fastflix.encoders.qsvencc_av1 import main as qsvencc_av1_plugin
+    from fastflix.encoders.vceencc_av1 import main as vceencc_av1_plugin
+    from fastflix.encoders.vvc import main as vvc_plugin
+    from fastflix.encoders.vaapi_h264 import main as vaapi_h264_plugin
+    from fastflix.encoders.vaapi_hevc import main as vaapi_hevc_plugin
+    from fastflix.encoders.vaapi_vp9 import main as vaapi_vp9_plugin
+    from fastflix.encoders.vaapi_mpeg2 import main as vaapi_mpeg2_plugin
+    from fastflix.encoders.modify import main as modify_plugin
+
+    encoders = [
+        hevc_plugin,
+        nvenc_plugin,
+        hevc_videotoolbox_plugin,
+        h264_videotoolbox_plugin,
+        av1_plugin,
+        rav1e_plugin,
+        svt_av1_plugin,
+        svt_av1_avif_plugin,
+        avc_plugin,
+        vp9_plugin,
+        gif_plugin,
+        webp_plugin,
+        vvc_plugin,
+        vaapi_hevc_plugin,
+        vaapi_h264_plugin,
+        vaapi_vp9_plugin,
+        vaapi_mpeg2_plugin,
+        copy_plugin,
+        modify_plugin,
+    ]
+
+    if DEVMODE:
+        encoders.insert(1, qsvencc_plugin)
+        encoders.insert(encoders.index(av1_plugin), qsvencc_av1_plugin)
+        encoders.insert(encoders.index(avc_plugin), qsvencc_avc_plugin)
+        encoders.insert(1, nvencc_plugin)
+        encoders.insert(encoders.index(av1_plugin), nvencc_av1_plugin)
+        encoders.insert(encoders.index(avc_plugin), nvencc_avc_plugin)
+        encoders.insert(1, vceencc_hevc_plugin)
+        encoders.insert(encoders.index(av1_plugin), vceencc_av1_plugin)
+        encoders.insert(encoders.index(avc_plugin), vceencc_avc_plugin)
+    else:
+        if config.qsvencc:
+            # if "H.265/HEVC" in config.qsvencc_encoders:
+            encoders.insert(1, qsvencc_plugin)
+            # if "AV1" in config.qsvencc_encoders:
+            encoders.insert(encoders.index(av1_plugin), qsvencc_av1_plugin)
+            # if "H.264/AVC" in config.qsvencc_encoders:
+            encoders.insert(encoders.index(avc_plugin), qsvencc_avc_plugin)
+
+        if config.nvencc:
+            # if "H.265/HEVC" in config.nvencc_encoders:
+            encoders.insert(1, nvencc_plugin)
+            # if "AV1" in config.nvencc_encoders:
+            encoders.insert(encoders.index(av1_plugin), nvencc_av1_plugin)
+            # if "H.264/AVC" in config.nvencc_encoders:
+            encoders.insert(encoders.index(avc_plugin), nvencc_avc_plugin)
+
+        if config.vceencc:
+            # if reusables.win_based: # and "H.265/HEVC" in config.vceencc_encoders:
+            # HEVC AMF support only works on windows currently
+            encoders.insert(1, vceencc_hevc_plugin)
+            # if "AV1" in config.vceencc_encoders:
+            encoders.insert(encoders.index(av1_plugin), vceencc_av1_plugin)
+            # if "H.264/AVC" in config.vceencc_encoders:
+            encoders.insert(encoders.index(avc_plugin), vceencc_avc_plugin)
+
+    return {
+        encoder.name: encoder
+        for encoder in encoders
+        if (not getattr(encoder, "requires", None)) or encoder.requires in (ffmpeg_config or []) or DEVMODE
+    }
+
+
+def setup(config: Optional[Config] = None, portable_mode: bool = False) -> FastFlix:
+    """Load the config, unless one is given, and find out what the configured FFmpeg supports"""
+    if config is None:
+        config = Config()
+        config.load(portable_mode=portable_mode)
+    fastflix = FastFlix(config=config)
+    app = SimpleNamespace(fastflix=fastflix)
+    ffmpeg_configuration(app, config)
+    ffprobe_configuration(app, config)
+    ffmpeg_audio_encoders(app, config)
+    fastflix.encoders = load_encoders(config, fastflix.ffmpeg_config)
+    return fastflix
+
+
+def plan(
+    source: Union[str, Path],
+    profile: Union[str, Profile, None] = None,
+    fastflix: Optional[FastFlix] = None,
+    work_path: Optional[Path] = None,
+) -> Video:
+    """
+    A video ready to encode, with its conversion commands, from a source and a profile.
+    The profile can be given by name, and defaults to the one selected in the config.
+    """
+    if fastflix is None:
+        fastflix = setup()
+    config = fastflix.config
+    if profile is None:
+        profile = config.selected_profile
+    if isinstance(profile, str):
+        if profile not in config.profiles:
+            raise FlixError(f"{t('No profile named')} {profile}")
+        profile = config.profiles[profile]
+    if work_path is None:
+        config.work_path.mkdir(parents=True, exist_ok=True)
+        work_path = Path(tempfile.mkdtemp(prefix="temp_", dir=config.work_path))
+    return build_video(fastflix, Path(source), profile, work_path)
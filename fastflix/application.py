@@ -7,6 +7,7 @@ import coloredlogs
 import reusables
 from PySide6 import QtGui, QtWidgets, QtCore
 
+from fastflix.api import load_encoders
 from fastflix.flix import ffmpeg_audio_encoders, ffmpeg_configuration, ffprobe_configuration, ffmpeg_opencl_support
 from fastflix.language import t
 from fastflix.models.config import Config, MissingFF
@@ -14,7 +15,7 @@ from fastflix.models.fastflix import FastFlix
 from fastflix.models.fastflix_app import FastFlixApp
 from fastflix.program_downloads import ask_for_ffmpeg, grab_stable_ffmpeg
 from fastflix.resources import main_icon, breeze_styles_path
-from fastflix.shared import file_date, message, latest_fastflix, DEVMODE, yes_no_message
+from fastflix.shared import file_date, message, latest_fastflix, yes_no_message
 from fastflix.widgets.container import Container
 from fastflix.widgets.progress_bar import ProgressBar, Task
 from fastflix.gpu_detect import automatic_rigaya_download
@@ -62,98 +63,7 @@ def init_logging(app: FastFlixApp):
 
 
 def init_encoders(app: FastFlixApp, **_):
-    from fastflix.encoders.av1_aom import main as av1_plugin
-    from fastflix.encoders.avc_x264 import main as avc_plugin
-    from fastflix.encoders.copy import main as copy_plugin
-    from fastflix.encoders.gif import main as gif_plugin
-    from fastflix.encoders.ffmpeg_hevc_nvenc import main as nvenc_plugin
-    from fastflix.encoders.hevc_x265 import main as hevc_plugin
-    from fastflix.encoders.rav1e import main as rav1e_plugin
-    from fastflix.encoders.svt_av1 import main as svt_av1_plugin
-    from fastflix.encoders.vp9 import main as vp9_plugin
-    from fastflix.encoders.webp import main as webp_plugin
-    from fastflix.encoders.qsvencc_hevc import main as qsvencc_plugin
-    from fastflix.encoders.qsvencc_avc import main as qsvencc_avc_plugin
-    from fastflix.encoders.nvencc_hevc import main as nvencc_plugin
-    from fastflix.encoders.nvencc_avc import main as nvencc_avc_plugin
-    from fastflix.encoders.vceencc_hevc import main as vceencc_hevc_plugin
-    from fastflix.encoders.vceencc_avc import main as vceencc_avc_plugin
-    from fastflix.encoders.hevc_videotoolbox import main as hevc_videotoolbox_plugin
-    from fastflix.encoders.h264_videotoolbox import main as h264_videotoolbox_plugin
-    from fastflix.encoders.svt_av1_avif import main as svt_av1_avif_plugin
-    from fastflix.encoders.nvencc_av1 import main as nvencc_av1_plugin
-    from fastflix.encoders.qsvencc_av1 import main as qsvencc_av1_plugin
-    from fastflix.encoders.vceencc_av1 import main as vceencc_av1_plugin
-    from fastflix.encoders.vvc import main as vvc_plugin
-    from fastflix.encoders.vaapi_h264 import main as vaapi_h264_plugin
-    from fastflix.encoders.vaapi_hevc import main as vaapi_hevc_plugin
-    from fastflix.encoders.vaapi_vp9 import main as vaapi_vp9_plugin
-    from fastflix.encoders.vaapi_mpeg2 import main as vaapi_mpeg2_plugin
-    from fastflix.encoders.modify import main as modify_plugin
-
-    encoders = [
-        hevc_plugin,
-        nvenc_plugin,
-        hevc_videotoolbox_plugin,
-        h264_videotoolbox_plugin,
-        av1_plugin,
-        rav1e_plugin,
-        svt_av1_plugin,
-        svt_av1_avif_plugin,
-        avc_plugin,
-        vp9_plugin,
-        gif_plugin,
-        webp_plugin,
-        vvc_plugin,
-        vaapi_hevc_plugin,
-        vaapi_h264_plugin,
-        vaapi_vp9_plugin,
-        vaapi_mpeg2_plugin,
-        copy_plugin,
-        modify_plugin,
-    ]
-
-    if DEVMODE:
-        encoders.insert(1, qsvencc_plugin)
-        encoders.insert(encoders.index(av1_plugin), qsvencc_av1_plugin)
-        encoders.insert(encoders.index(avc_plugin), qsvencc_avc_plugin)
-        encoders.insert(1, nvencc_plugin)
-        encoders.insert(encoders.index(av1_plugin), nvencc_av1_plugin)
-        encoders.insert(encoders.index(avc_plugin), nvencc_avc_plugin)
-        encoders.insert(1, vceencc_hevc_plugin)
-        encoders.insert(encoders.index(av1_plugin), vceencc_av1_plugin)
-        encoders.insert(encoders.index(avc_plugin), vceencc_avc_plugin)
-    else:
-        if app.fastflix.config.qsvencc:
-            # if "H.265/HEVC" in app.fastflix.config.qsvencc_encoders:
-            encoders.insert(1, qsvencc_plugin)
-            # if "AV1" in app.fastflix.config.qsvencc_encoders:
-            encoders.insert(encoders.index(av1_plugin), qsvencc_av1_plugin)
-            # if "H.264/AVC" in app.fastflix.config.qsvencc_encoders:
-            encoders.insert(encoders.index(avc_plugin), qsvencc_avc_plugin)
-
-        if app.fastflix.config.nvencc:
-            # if "H.265/HEVC" in app.fastflix.config.nvencc_encoders:
-            encoders.insert(1, nvencc_plugin)
-            # if "AV1" in app.fastflix.config.nvencc_encoders:
-            encoders.insert(encoders.index(av1_plugin), nvencc_av1_plugin)
-            # if "H.264/AVC" in app.fastflix.config.nvencc_encoders:
-            encoders.insert(encoders.index(avc_plugin), nvencc_avc_plugin)
-
-        if app.fastflix.config.vceencc:
-            # if reusables.win_based: # and "H.265/HEVC" in app.fastflix.config.vceencc_encoders:
-            # HEVC AMF support only works on windows currently
-            encoders.insert(1, vceencc_hevc_plugin)
-            # if "AV1" in app.fastflix.config.vceencc_encoders:
-            encoders.insert(encoders.index(av1_plugin), vceencc_av1_plugin)
-            # if "H.264/AVC" in app.fastflix.config.vceencc_encoders:
-            encoders.insert(encoders.index(avc_plugin), vceencc_avc_plugin)
-
-    app.fastflix.encoders = {
-        encoder.name: encoder
-        for encoder in encoders
-        if (not getattr(encoder, "requires", None)) or encoder.requires in app.fastflix.ffmpeg_config or DEVMODE
-    }
+    app.fastflix.encoders = load_encoders(app.fastflix.config, app.fastflix.ffmpeg_config)
 
 
 def init_fastflix_directories(app: FastFlixApp):
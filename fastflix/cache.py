@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+import hashlib
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional, Union
+
+logger = logging.getLogger("fastflix")
+
+__all__ = ["FileCache", "cache_key", "source_identity"]
+
+
+def source_identity(source: Union[Path, str]) -> str:
+    """Cheap fingerprint of a file that changes if the file is replaced or modified"""
+    source = Path(source)
+    try:
+        stat = source.stat()
+    except OSError:
+        return hashlib.sha256(str(source).encode("utf-8")).hexdigest()
+    ident = f"{source.resolve()}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha256(ident.encode("utf-8")).hexdigest()
+
+
+def cache_key(*parts) -> str:
+    return hashlib.sha256("\x1f".join(str(part) for part in parts).encode("utf-8")).hexdigest()
+
+
+class FileCache:
+    """
+    Size bound, least recently used cache of files stored in a single directory.
+
+    Entries are named after their key, file modification times are used to keep the
+    usage order between sessions, so no separate index file needs to be kept around.
+    """
+
+    def __init__(self, directory: Union[Path, str], max_size: int, suffix: str = ""):
+        self.directory = Path(directory)
+        self.max_size = max_size
+        self.suffix = suffix
+        self._lock = threading.RLock()
+        self._entries: OrderedDict[str, int] = OrderedDict()
+        self._size = 0
+        self._load()
+
+    def _load(self):
+        try:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            files = [x for x in self.directory.iterdir() if x.is_file() and x.name.endswith(self.suffix)]
+        except OSError:
+            logger.warning(f"Could not use cache directory {self.directory}")
+            return
+        for file in sorted(files, key=lambda x: x.stat().st_mtime_ns):
+            size = file.stat().st_size
+            self._entries[file.name[: len(file.name) - len(self.suffix)]] = size
+            self._size += size
+        self.prune()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key: str):
+        return key in self._entries
+
+    def path(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> Optional[Path]:
+        with self._lock:
+            if key not in self._entries:
+                return None
+            path = self.path(key)
+            if not path.exists():
+                self._forget(key)
+                return None
+            self._entries.move_to_end(key)
+            try:
+                os.utime(path)
+            except OSError:
+                pass
+            return path
+
+    def read(self, key: str) -> Optional[bytes]:
+        path = self.get(key)
+        if not path:
+            return None
+        try:
+            return path.read_bytes()
+        except OSError:
+            return None
+
+    def store(self, key: str, data: bytes) -> Path:
+        with self._lock:
+            path = self.path(key)
+            path.write_bytes(data)
+            self._register(key, len(data))
+            return path
+
+    def add(self, key: str, file: Union[Path, str], move: bool = False) -> Optional[Path]:
+        """Copy (or move) an existing file into the cache"""
+        with self._lock:
+            path = self.path(key)
+            try:
+                if move:
+                    shutil.move(file, path)
+                else:
+                    shutil.copyfile(file, path)
+            except OSError:
+                logger.debug(f"Could not add {file} to cache")
+                return None
+            self._register(key, path.stat().st_size)
+            return path
+
+    def prune(self):
+        with self._lock:
+            # The most recently used entry is always kept, even if it alone is over the limit
+            while len(self._entries) > 1 and self._size > self.max_size:
+                key = next(iter(self._entries))
+                self.path(key).unlink(missing_ok=True)
+                self._forget(key)
+
+    def clear(self):
+        with self._lock:
+            for key in list(self._entries):
+                self.path(key).unlink(missing_ok=True)
+                self._forget(key)
+
+    def _register(self, key: str, size: int):
+        if key in self._entries:
+            self._size -= self._entries[key]
+        self._entries[key] = size
+        self._entries.move_to_end(key)
+        self._size += size
+        self.prune()
+
+    def _forget(self, key: str):
+        self._size -= self._entries.pop(key, 0)
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""
+The order a video's conversion commands can run in.
+
+A command waits on the command before it, unless its `depends_on` lists the uuids of the earlier commands
+it needs, where an empty list means it can start right away. As commands only ever wait on those before
+them, running them one at a time in list order is always valid, and runners with more than one slot
+can start every ready command at once. Only the headless queue runner has more than one, the GUI's
+conversion worker runs one command at a time.
+
+Finished commands are tracked by `Status.current_command`, the first one that has not finished, along with
+the uuids of any finished after it in `Status.finished_commands`.
+"""
+import logging
+from typing import Collection, List
+
+from fastflix.models.video import Video
+
+logger = logging.getLogger("fastflix")
+
+__all__ = ["all_finished", "dependencies", "finish_command", "ready_commands"]
+
+
+def dependencies(commands: list, index: int) -> List[int]:
+    """Indexes of the commands the one at index waits on"""
+    depends_on = getattr(commands[index], "depends_on", None)
+    if depends_on is None:
+        return [index - 1] if index else []
+    earlier = {command.uuid: i for i, command in enumerate(commands[:index])}
+    found = [earlier[uuid] for uuid in depends_on if uuid in earlier]
+    if len(found) != len(depends_on):
+        logger.warning(f"{commands[index].name} depends on commands that are not before it, waiting on all of them")
+        return list(range(index))
+    return found
+
+
+def is_finished(video: Video, index: int) -> bool:
+    commands = video.video_settings.conversion_commands
+    return index < video.status.current_command or commands[index].uuid in video.status.finished_commands
+
+
+def ready_commands(video: Video, running: Collection[int] = ()) -> List[int]:
+    """Indexes of the commands that have not finished, are not running and have nothing left to wait on"""
+    commands = video.video_settings.conversion_commands
+    return [
+        index
+        for index in range(video.status.current_command, len(commands))
+        if index not in running
+        and not is_finished(video, index)
+        and all(is_finished(video, dependency) for dependency in dependencies(commands, index))
+    ]
+
+
+def finish_command(video: Video, index: int):
+    """Marks the command as finished, moving the current command on past every finished one"""
+    commands = video.video_settings.conversion_commands
+    if index != video.status.current_command:
+        video.status.finished_commands.append(commands[index].uuid)
+        return
+    video.status.current_command += 1
+    while video.status.current_command < len(commands):
+        uuid = commands[video.status.current_command].uuid
+        if uuid not in video.status.finished_commands:
+            break
+        video.status.finished_commands.remove(uuid)
+        video.status.current_command += 1
+
+
+def all_finished(video: Video) -> bool:
+    return video.status.current_command >= len(video.video_settings.conversion_commands)
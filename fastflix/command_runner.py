@@ -57,6 +57,7 @@ class BackgroundRunner:
         self.error_message = []
         self.success_message = []
         self.started_at = None
+        self.reader = None
 
     def start_exec(self, command, work_dir: str = None, shell: bool = False, errors=(), successes=()):
         self.clean()
@@ -97,7 +98,8 @@ class BackgroundRunner:
 
         self.started_at = datetime.datetime.now(datetime.timezone.utc)
 
-        Thread(target=self.read_output).start()
+        self.reader = Thread(target=self.read_output)
+        self.reader.start()
 
     def change_priority(
         self, new_priority: Literal["Realtime", "High", "Above Normal", "Normal", "Below Normal", "Idle"]
@@ -165,6 +167,9 @@ class BackgroundRunner:
 
     def clean(self):
         self.kill(log=False)
+        if self.reader and self.reader.is_alive():
+            # The last command's output is still being read, which looks at the process being replaced
+            self.reader.join()
         self.process = None
         self.error_detected = False
         self.success_detected = False
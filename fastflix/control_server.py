@@ -0,0 +1,316 @@
+# -*- coding: utf-8 -*-
+"""
+Optional localhost control of the encode worker, started when FF_API_PORT is set.
+
+    POST /rpc     JSON-RPC 2.0 calls: enqueue, start, cancel, pause, resume, priority and status
+    GET /events   Server-sent events of the worker's status and encode progress, one JSON object per event
+
+Requests are answered on 127.0.0.1 only, and only when addressed to 127.0.0.1 or localhost and the port,
+so a web page cannot reach it through a DNS name it points at 127.0.0.1.
+If FF_API_TOKEN is set, it has to be sent as a bearer token.
+Nothing here, or anything it imports, may import PySide6.
+"""
+import json
+import logging
+import os
+import secrets
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from queue import Empty, Full, Queue
+from threading import Lock, Thread
+from typing import Callable, Dict, List, Optional
+
+from fastflix.command_runner import priority_levels
+from fastflix.headless import parse_progress
+
+logger = logging.getLogger("fastflix-core")
+
+__all__ = ["ControlServer", "ProgressLog", "RPCError", "control_server_from_env"]
+
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+UNAVAILABLE = -32000
+
+
+class RPCError(Exception):
+    def __init__(self, code: int, message: str):
+        super().__init__(message)
+        self.code = code
+        self.message = message
+
+
+class ProgressLog:
+    """
+    Stands in for the worker's log queue, passing every line on to the GUI as before
+    while publishing the ffmpeg status lines as progress events, at most once per `interval` seconds.
+    """
+
+    def __init__(self, log_queue, publish: Callable[[dict], None], interval: float = 1):
+        self.log_queue = log_queue
+        self.publish = publish
+        self.interval = interval
+        self.last_progress = 0.0
+
+    def put(self, item):
+        self.log_queue.put(item)
+        if not isinstance(item, str) or time.monotonic() - self.last_progress < self.interval:
+            return
+        # The runner hands over everything left in its output in one go once the encode ends
+        for line in reversed(item.splitlines()):
+            if progress := parse_progress(line):
+                self.last_progress = time.monotonic()
+                self.publish({"event": "progress", **progress})
+                return
+
+
+class ControlServer:
+    """
+    Forwards JSON-RPC calls to the worker and GUI process queues and streams the worker's events to every listener.
+
+    Queue verbs go straight to the worker, the same as the GUI's buttons send them, other than pausing and resuming,
+    which go through the GUI so its pause button follows along. New videos are handed to the GUI, as it owns the
+    queue, which loads them just like those found in a watch folder.
+    """
+
+    def __init__(
+        self,
+        worker_queue,
+        status_queue,
+        port: int = 0,
+        token: str = "",
+        gui_alive: Callable[[], bool] = lambda: True,
+        listener_backlog: int = 1000,
+    ):
+        self.worker_queue = worker_queue
+        self.status_queue = status_queue
+        self.token = token
+        self.gui_alive = gui_alive
+        self.listener_backlog = listener_backlog
+        self.listeners: List[Queue] = []
+        self.lock = Lock()
+        self.state = {"encoding": False, "paused": False, "video": None, "command": None, "priority": "Normal"}
+        self.stopped = False
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", port), make_handler(self))
+        self.httpd.daemon_threads = True
+        self.thread: Optional[Thread] = None
+
+    @property
+    def port(self) -> int:
+        return self.httpd.server_address[1]
+
+    def start(self):
+        self.thread = Thread(target=self.httpd.serve_forever, kwargs={"poll_interval": 0.2}, daemon=True)
+        self.thread.start()
+        logger.info(f"Control API listening on http://127.0.0.1:{self.port}")
+
+    def stop(self):
+        self.stopped = True
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def publish(self, event: dict):
+        with self.lock:
+            if event.get("event") == "progress":
+                event = {**event, "video": self.state["video"], "command": self.state["command"]}
+            self.track(event)
+            listeners = list(self.listeners)
+        for listener in listeners:
+            try:
+                listener.put_nowait(event)
+            except Full:
+                # A listener that stopped reading should not hold up the worker
+                pass
+
+    def track(self, event: dict):
+        name = event.get("event")
+        if name == "start":
+            self.state.update(encoding=True, paused=False, video=event["video"], command=event["command"])
+        elif name in ("complete", "error", "cancelled"):
+            self.state.update(encoding=False, paused=False, video=None, command=None)
+        elif name in ("paused", "resumed"):
+            self.state["paused"] = name == "paused"
+        elif name == "priority":
+            self.state["priority"] = event["priority"]
+
+    def listen(self) -> Queue:
+        listener = Queue(maxsize=self.listener_backlog)
+        with self.lock:
+            self.listeners.append(listener)
+        return listener
+
+    def forget(self, listener: Queue):
+        with self.lock:
+            if listener in self.listeners:
+                self.listeners.remove(listener)
+
+    def call(self, method: str, params: Dict):
+        if method == "status":
+            with self.lock:
+                return dict(self.state)
+        if method == "enqueue":
+            return self.enqueue(**params)
+        if method == "start":
+            self.to_gui("start queue")
+            return True
+        if method == "cancel":
+            self.worker_queue.put(["cancel"])
+            return True
+        if method in ("pause", "resume"):
+            # Through the GUI while it is running, so its pause button and state stay in step
+            message = f"{method} encode"
+            if self.gui_alive():
+                self.status_queue.put((message,))
+            else:
+                self.worker_queue.put([message])
+            return True
+        if method == "priority":
+            level = params.get("priority")
+            if level not in priority_levels:
+                raise RPCError(INVALID_PARAMS, f"priority must be one of {', '.join(priority_levels)}")
+            self.worker_queue.put(["priority", level])
+            return True
+        raise RPCError(METHOD_NOT_FOUND, f"Unknown method {method}")
+
+    def enqueue(self, source: str = "", profile: str = "", start: bool = False, priority: int = 0, deadline: str = ""):
+        if not source or not Path(source).is_file():
+            raise RPCError(INVALID_PARAMS, f"No video found at {source!r}")
+        if not isinstance(priority, int):
+            raise RPCError(INVALID_PARAMS, "priority must be a whole number, higher is encoded sooner")
+        try:
+            due = datetime.fromisoformat(deadline) if deadline else None
+        except (TypeError, ValueError):
+            raise RPCError(INVALID_PARAMS, "deadline must be an ISO 8601 date and time") from None
+        schedule = {"priority": priority, "deadline": due}
+        self.to_gui("enqueue", str(Path(source).absolute()), profile or "", bool(start), schedule)
+        return True
+
+    def to_gui(self, *message):
+        if not self.gui_alive():
+            raise RPCError(UNAVAILABLE, "The FastFlix window is not running")
+        self.status_queue.put(message)
+
+    def rpc(self, body: bytes) -> Optional[dict]:
+        try:
+            request = json.loads(body)
+        except ValueError:
+            return rpc_error(None, PARSE_ERROR, "Could not parse request")
+        if not isinstance(request, dict) or not isinstance(request.get("method"), str):
+            return rpc_error(None, INVALID_REQUEST, "Expected a JSON-RPC request object")
+        params = request.get("params") or {}
+        if not isinstance(params, dict):
+            return rpc_error(request.get("id"), INVALID_PARAMS, "params must be an object")
+        try:
+            result = self.call(request["method"], params)
+        except RPCError as err:
+            return rpc_error(request.get("id"), err.code, err.message)
+        except TypeError as err:
+            return rpc_error(request.get("id"), INVALID_PARAMS, str(err))
+        if "id" not in request:
+            # A notification, nothing is sent back
+            return None
+        return {"jsonrpc": "2.0", "id": request["id"], "result": result}
+
+
+def rpc_error(request_id, code: int, message: str) -> dict:
+    return {"jsonrpc": "2.0", "id": request_id, "error": {"code": code, "message": message}}
+
+
+def make_handler(server: ControlServer):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, format, *args):
+            logger.debug(f"Control API {self.address_string()} {format % args}")
+
+        def local_host(self) -> bool:
+            # A rebound DNS name reaches 127.0.0.1 as well, but the browser still sends that name as the Host
+            if self.headers.get("Host", "").lower() in (f"127.0.0.1:{server.port}", f"localhost:{server.port}"):
+                return True
+            self.reply(403, {"error": "Forbidden"})
+            return False
+
+        def authorized(self) -> bool:
+            if not self.local_host():
+                return False
+            if not server.token:
+                return True
+            sent = self.headers.get("Authorization", "")
+            if secrets.compare_digest(sent.encode(), f"Bearer {server.token}".encode()):
+                return True
+            self.reply(401, {"error": "Unauthorized"})
+            return False
+
+        def reply(self, code: int, body: Optional[dict]):
+            data = json.dumps(body).encode("utf-8") if body is not None else b""
+            self.send_response(code)
+            if data:
+                self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            if self.path != "/rpc":
+                return self.reply(404, {"error": "Not found"})
+            if not self.authorized():
+                return
+            # Browsers can only send JSON to another origin after a CORS check, which is never answered
+            if self.headers.get("Content-Type", "").split(";")[0].strip() != "application/json":
+                return self.reply(415, {"error": "Content-Type must be application/json"})
+            body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+            response = server.rpc(body)
+            self.reply(200 if response is not None else 204, response)
+
+        def do_GET(self):
+            if self.path != "/events":
+                return self.reply(404, {"error": "Not found"})
+            if not self.authorized():
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            listener = server.listen()
+            try:
+                with server.lock:
+                    state = dict(server.state)
+                self.send_event({"event": "status", **state})
+                while not server.stopped:
+                    try:
+                        self.send_event(listener.get(timeout=15))
+                    except Empty:
+                        # Keeps the connection from being closed as idle, and finds listeners that have left
+                        self.wfile.write(b": keep-alive\n\n")
+                        self.wfile.flush()
+            except OSError:
+                pass
+            finally:
+                server.forget(listener)
+
+        def send_event(self, event: dict):
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+    return Handler
+
+
+def control_server_from_env(worker_queue, status_queue, gui_alive: Callable[[], bool]) -> Optional[ControlServer]:
+    """A running control server if FF_API_PORT is set, otherwise None"""
+    port = os.getenv("FF_API_PORT")
+    if not port:
+        return None
+    try:
+        server = ControlServer(
+            worker_queue, status_queue, port=int(port), token=os.getenv("FF_API_TOKEN", ""), gui_alive=gui_alive
+        )
+    except (ValueError, OSError):
+        logger.exception(f"Could not start the control API on port {port}")
+        return None
+    server.start()
+    return server
@@ -2,7 +2,7 @@
 import logging
 from pathlib import Path
 from queue import Empty
-from typing import Literal
+from typing import Callable, Literal, Optional
 from datetime import datetime
 
 import reusables
@@ -23,7 +23,15 @@ log_path = Path(user_data_dir("FastFlix", appauthor=False, roaming=True)) / "log
 
 
 @reusables.log_exception(log="fastflix-core")
-def queue_worker(gui_proc, worker_queue, status_queue, log_queue):
+def queue_worker(gui_proc, worker_queue, status_queue, log_queue, publish: Optional[Callable[[dict], None]] = None):
+    """
+    Runs the commands the GUI sends over `worker_queue` one at a time, reporting back on `status_queue`.
+    If `publish` is given, it is also handed every status change and encode progress as an event dict.
+    """
+    if publish:
+        from fastflix.control_server import ProgressLog
+
+        log_queue = ProgressLog(log_queue, publish)
     runner = BackgroundRunner(log_queue=log_queue)
     gui_died = False
     currently_encoding = False
@@ -34,6 +42,14 @@ def queue_worker(gui_proc, worker_queue, status_queue, log_queue):
     log_name = ""
     priority: Literal["Realtime", "High", "Above Normal", "Normal", "Below Normal", "Idle"] = "Normal"
 
+    def report(status):
+        status_queue.put((status, video_uuid, command_uuid))
+        notify(status)
+
+    def notify(event, **extra):
+        if publish:
+            publish({"event": event, "video": video_uuid, "command": command_uuid, **extra})
+
     def start_command():
         nonlocal currently_encoding
         log_queue.put(f"CLEAR_WINDOW:{video_uuid}:{command_uuid}")
@@ -51,6 +67,7 @@ def queue_worker(gui_proc, worker_queue, status_queue, log_queue):
             work_dir=work_dir,
         )
         runner.change_priority(priority)
+        notify("start", priority=priority)
 
     while True:
         if currently_encoding and not runner.is_alive():
@@ -61,12 +78,12 @@ def queue_worker(gui_proc, worker_queue, status_queue, log_queue):
             if runner.error_detected:
                 logger.info(t("Error detected while converting"))
 
-                status_queue.put(("error", video_uuid, command_uuid))
+                report("error")
                 if gui_died:
                     return
                 continue
 
-            status_queue.put(("complete", video_uuid, command_uuid))
+            report("complete")
             if gui_died:
                 return
 
@@ -94,13 +111,14 @@ def queue_worker(gui_proc, worker_queue, status_queue, log_queue):
                 logger.debug(t("Cancel has been requested, killing encoding"))
                 runner.kill()
                 currently_encoding = False
-                status_queue.put(("cancelled", video_uuid, command_uuid))
+                report("cancelled")
                 log_queue.put("STOP_TIMER")
 
             if request[0] == "pause encode":
                 logger.debug(t("Command worker received request to pause current encode"))
                 try:
                     runner.pause()
+                    notify("paused")
                 except Exception:
                     logger.exception("Could not pause command")
 
@@ -108,10 +126,12 @@ def queue_worker(gui_proc, worker_queue, status_queue, log_queue):
                 logger.debug(t("Command worker received request to resume paused encode"))
                 try:
                     runner.resume()
+                    notify("resumed")
                 except Exception:
                     logger.exception("Could not resume command")
 
             if request[0] == "priority":
                 priority = request[1]
+                notify("priority", priority=priority)
                 if runner.is_alive():
                     runner.change_priority(priority)
@@ -19,4 +19,6 @@ enable_attachments = True
 enable_concat = True
 
 from fastflix.encoders.av1_aom.command_builder import build  # noqa: F401,E402
-from fastflix.encoders.av1_aom.settings_panel import AV1 as settings_panel  # noqa: F401,E402
+from fastflix.encoders.common.helpers import lazy_settings_panel  # noqa: E402
+
+__getattr__ = lazy_settings_panel("fastflix.encoders.av1_aom.settings_panel", "AV1")
@@ -2,7 +2,7 @@
 from pathlib import Path
 
 from fastflix.models.encode import AttachmentTrack
-from fastflix.shared import clean_file_string
+from fastflix.paths import clean_file_string
 
 
 def image_type(file: Path | str) -> tuple[str | None, str | None]:
@@ -1,6 +1,13 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import json
 import logging
+import math
+import re
+from pathlib import Path
+from typing import Dict, List
+
+from fastflix.models.encode import AudioTrack, LoudnessMeasurement
 
 logger = logging.getLogger("fastflix")
 
@@ -30,6 +37,65 @@ channel_list = {
 
 lossless = ["flac", "truehd", "alac", "tta", "wavpack", "mlp"]
 
+# EBU R128 integrated loudness, true peak and loudness range targets
+loudnorm_targets = {"I": -23, "TP": -1, "LRA": 7}
+
+loudnorm_result_re = re.compile(r"\[Parsed_loudnorm_(\d+) @ [^\]]+\]\s*(\{.*?\})", re.DOTALL)
+
+
+def track_channel_layout(track: AudioTrack) -> str:
+    try:
+        return track.downmix if track.downmix and track.downmix != "No Downmix" else track.raw_info.channel_layout
+    except (AssertionError, KeyError, AttributeError):
+        logger.warning("Could not determine channel layout, defaulting to stereo, please manually specify")
+        return "stereo"
+
+
+def normalized(track: AudioTrack) -> bool:
+    """Loudness normalization is a filter, so only applies to tracks that are being converted"""
+    return track.enabled and track.normalize and bool(track.conversion_codec) and track.conversion_codec != "none"
+
+
+def loudnorm_filter(measurement: LoudnessMeasurement = None, sample_rate=None) -> str:
+    targets = ":".join(f"{k}={v}" for k, v in loudnorm_targets.items())
+    if not measurement:
+        return f"loudnorm={targets}:print_format=json"
+    # loudnorm upsamples to 192 kHz internally, put it back where it was
+    return (
+        f"loudnorm={targets}:measured_I={measurement.input_i}:measured_TP={measurement.input_tp}"
+        f":measured_LRA={measurement.input_lra}:measured_thresh={measurement.input_thresh}"
+        f":offset={measurement.target_offset}:linear=true,aresample={sample_rate or 48000}"
+    )
+
+
+def loudness_analysis_command(ffmpeg: Path, source: Path, tracks: List[AudioTrack]) -> List[str]:
+    """A single decode of the source that measures the loudness of every given track at once"""
+    chains = [
+        f"[0:{track.index}]aformat=channel_layouts={track_channel_layout(track)},{loudnorm_filter()}[loud{i}]"
+        for i, track in enumerate(tracks)
+    ]
+    command = [str(ffmpeg), "-hide_banner", "-nostats", "-i", str(source), "-filter_complex", ";".join(chains)]
+    for i in range(len(tracks)):
+        command.extend(["-map", f"[loud{i}]"])
+    return command + ["-vn", "-sn", "-dn", "-f", "null", "-"]
+
+
+def parse_loudness(output: str, tracks: List[AudioTrack]) -> Dict[int, LoudnessMeasurement]:
+    """Measurements by track outdex, loudnorm instances report in the same order as their filter chains"""
+    results = sorted(((int(n), body) for n, body in loudnorm_result_re.findall(output)), key=lambda x: x[0])
+    measurements = {}
+    for track, (_, body) in zip(tracks, results):
+        try:
+            measurement = LoudnessMeasurement(**json.loads(body))
+        except ValueError:
+            logger.warning(f"Could not read loudness of audio track {track.index}: {body}")
+            continue
+        if all(math.isfinite(x) for x in measurement.model_dump().values()):
+            measurements[track.outdex] = measurement
+        else:
+            logger.warning(f"Audio track {track.index} is silent, it will not be normalized")
+    return measurements
+
 
 def audio_quality_converter(quality, codec, channels=2, track_number=1):
     base = [120, 96, 72, 48, 24, 24, 16, 8, 8, 8][quality]
@@ -66,16 +132,15 @@ def build_audio(audio_tracks, audio_file_index=0):
         if not track.conversion_codec or track.conversion_codec == "none":
             command_list.append(f"-c:{track.outdex} copy")
         elif track.conversion_codec:
-            try:
-                cl = track.downmix if track.downmix and track.downmix != "No Downmix" else track.raw_info.channel_layout
-            except (AssertionError, KeyError):
-                cl = "stereo"
-                logger.warning("Could not determine channel layout, defaulting to stereo, please manually specify")
+            cl = track_channel_layout(track)
 
             downmix = (
                 f"-ac:{track.outdex} {channel_list[cl]}" if track.downmix and track.downmix != "No Downmix" else ""
             )
-            channel_layout = f'-filter:{track.outdex} "aformat=channel_layouts={cl}"'
+            audio_filters = f"aformat=channel_layouts={cl}"
+            if normalized(track) and track.loudness:
+                audio_filters += f",{loudnorm_filter(track.loudness, (track.raw_info or {}).get('sample_rate'))}"
+            channel_layout = f'-filter:{track.outdex} "{audio_filters}"'
 
             bitrate = ""
             if track.conversion_codec not in lossless:
@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
+import importlib
 import uuid
 from pathlib import Path
-from typing import Tuple, Union, Optional
+from typing import List, Tuple, Union, Optional
 
 import reusables
 from pydantic import BaseModel, Field
@@ -10,13 +11,27 @@ from fastflix.encoders.common.attachments import build_attachments
 from fastflix.encoders.common.audio import build_audio
 from fastflix.encoders.common.subtitles import build_subtitle
 from fastflix.models.fastflix import FastFlix
-from fastflix.shared import clean_file_string, sanitize, quoted_path
+from fastflix.paths import clean_file_string, sanitize, quoted_path
 
 null = "/dev/null"
 if reusables.win_based:
     null = "NUL"
 
 
+def lazy_settings_panel(module: str, panel: str):
+    """
+    Module level __getattr__ for an encoder's main.py, so its settings panel, and with it Qt,
+    is only imported once the GUI asks for it. Building commands never needs the panel.
+    """
+
+    def __getattr__(name):
+        if name == "settings_panel":
+            return getattr(importlib.import_module(module), panel)
+        raise AttributeError(f"module {module.rsplit('.', 1)[0]}.main has no attribute {name}")
+
+    return __getattr__
+
+
 class Command(BaseModel):
     command: str
     item: str = "command"
@@ -24,6 +39,8 @@ class Command(BaseModel):
     exe: str = None
     shell: bool = False
     uuid: str = Field(default_factory=lambda: str(uuid.uuid4()))
+    # The uuids of earlier commands this one needs finished first, None waits on the command before it
+    depends_on: Optional[List[str]] = None
 
 
 def generate_ffmpeg_start(
@@ -180,8 +197,18 @@ def generate_filters(
     deblock: Union[str, None] = None,
     deblock_size: int = 4,
     denoise: Union[str, None] = None,
+    input_index: int = 0,
+    output_label: str = "v",
+    ladder: Optional[list] = None,
+    ladder_output: Optional[int] = None,
     **_,
 ):
+    ladder_scales = None
+    if ladder and ladder_output is not None:
+        # Everything but the scale is run once, then split into each rendition's size
+        ladder_scales = [scale] + [f"-2:{rendition['height']}" for rendition in ladder]
+        scale = None
+
     filter_list = []
     if start_filters:
         filter_list.append(start_filters)
@@ -249,21 +276,51 @@ def generate_filters(
         if burn_in_subtitle_type == "picture":
             if filters:
                 # You have to overlay first for it to work when scaled
-                filter_complex = f"[0:{selected_track}][0:{burn_in_subtitle_track}]overlay[subbed];[subbed]{filters}[v]"
+                filter_complex = (
+                    f"[{input_index}:{selected_track}][{input_index}:{burn_in_subtitle_track}]overlay[subbed{input_index or ''}];"
+                    f"[subbed{input_index or ''}]{filters}[{output_label}]"
+                )
             else:
-                filter_complex = f"[0:{selected_track}][0:{burn_in_subtitle_track}]overlay[v]"
+                filter_complex = f"[{input_index}:{selected_track}][{input_index}:{burn_in_subtitle_track}]overlay[{output_label}]"
         else:
             filter_prefix = f"{filters}," if filters else ""
-            filter_complex = f"[0:{selected_track}]{filter_prefix}subtitles='{quoted_path(clean_file_string(source))}':si={burn_in_subtitle_track}[v]"
+            filter_complex = f"[{input_index}:{selected_track}]{filter_prefix}subtitles='{quoted_path(clean_file_string(source))}':si={burn_in_subtitle_track}[{output_label}]"
     elif filters:
-        filter_complex = f"[0:{selected_track}]{filters}[v]"
+        filter_complex = f"[{input_index}:{selected_track}]{filters}[{output_label}]"
+    elif ladder_scales:
+        filter_complex = ""
     else:
         return ""
 
+    if ladder_scales:
+        if ladder_output:
+            # The graph is only given once, with the first output, the others just map their stream of it
+            return f' -map "[{output_label}{ladder_output}]" '
+        filter_complex = ladder_filters(
+            filter_complex or f"[{input_index}:{selected_track}]null[{output_label}]",
+            ladder_scales,
+            scale_filter,
+            output_label,
+        )
+        return f' -filter_complex "{filter_complex}" -map "[{output_label}0]" '
+
     if raw_filters:
         return filter_complex
 
-    return f' -filter_complex "{filter_complex}" -map "[v]" '
+    return f' -filter_complex "{filter_complex}" -map "[{output_label}]" '
+
+
+def ladder_filters(filter_complex: str, scales: List[Optional[str]], scale_filter: str, output_label: str) -> str:
+    """Splits the output of a filter graph into one stream per scale, labeled with the output label and index"""
+    split_labels = [f"{output_label}_split{i}" for i in range(len(scales))]
+    branches = [
+        f"[{split}]scale={scale}:flags={scale_filter},setsar=1:1[{output_label}{i}]"
+        if scale
+        else f"[{split}]null[{output_label}{i}]"
+        for i, (split, scale) in enumerate(zip(split_labels, scales))
+    ]
+    split = f"[{output_label}]split={len(scales)}{''.join(f'[{label}]' for label in split_labels)}"
+    return ";".join([filter_complex, split, *branches])
 
 
 def generate_all(
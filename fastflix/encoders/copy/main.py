@@ -18,4 +18,6 @@ enable_attachments = True
 enable_advanced = False
 
 from fastflix.encoders.copy.command_builder import build  # noqa: F401,E402
-from fastflix.encoders.copy.settings_panel import Copy as settings_panel  # noqa: F401,E402
+from fastflix.encoders.common.helpers import lazy_settings_panel  # noqa: E402
+
+__getattr__ = lazy_settings_panel("fastflix.encoders.copy.settings_panel", "Copy")
@@ -19,4 +19,6 @@ enable_attachments = True
 enable_concat = True
 
 from fastflix.encoders.ffmpeg_hevc_nvenc.command_builder import build  # noqa: F401,E402
-from fastflix.encoders.ffmpeg_hevc_nvenc.settings_panel import NVENC as settings_panel  # noqa: F401,E402
+from fastflix.encoders.common.helpers import lazy_settings_panel  # noqa: E402
+
+__getattr__ = lazy_settings_panel("fastflix.encoders.ffmpeg_hevc_nvenc.settings_panel", "NVENC")
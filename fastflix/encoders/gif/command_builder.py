@@ -4,7 +4,7 @@ import secrets
 from fastflix.encoders.common.helpers import Command, generate_filters
 from fastflix.models.encode import GIFSettings
 from fastflix.models.fastflix import FastFlix
-from fastflix.shared import clean_file_string
+from fastflix.paths import clean_file_string
 
 
 def build(fastflix: FastFlix):
@@ -34,6 +34,17 @@ def build(fastflix: FastFlix):
     if settings.extra:
         beginning += "  "
 
+    if settings.single_pass:
+        # The palette is made from the same decode it is used on, with "single" making a new palette for each frame
+        # as it goes instead of holding every frame until the palette of the whole video is ready
+        new_palette = ":new=1" if settings.stats_mode == "single" else ""
+        command = (
+            f'{beginning} -filter_complex "{filters};[v]split[a][b];[a]palettegen{args}[p];'
+            f'[b][p]paletteuse=dither={settings.dither}{new_palette}[o]" -map "[o]" '
+            f'{settings.extra} -y "{output_video}" '
+        )
+        return [Command(command=command, name="GIF creation", exe="ffmpeg")]
+
     temp_palette = fastflix.current_video.work_path / f"temp_palette_{secrets.token_hex(10)}.png"
 
     command_1 = (
@@ -20,4 +20,6 @@ enable_concat = False
 audio_formats = []
 
 from fastflix.encoders.gif.command_builder import build  # noqa: F401,E402
-from fastflix.encoders.gif.settings_panel import GIF as settings_panel  # noqa: F401,E402
+from fastflix.encoders.common.helpers import lazy_settings_panel  # noqa: E402
+
+__getattr__ = lazy_settings_panel("fastflix.encoders.gif.settings_panel", "GIF")
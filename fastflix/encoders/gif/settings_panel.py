@@ -23,6 +23,7 @@ class GIF(SettingPanel):
         grid.addLayout(self.init_fps(), 1, 0, 1, 2)
         grid.addLayout(self.init_max_colors(), 2, 0, 1, 2)
         grid.addLayout(self.init_statistics_mode(), 3, 0, 1, 2)
+        grid.addLayout(self.init_single_pass(), 4, 0, 1, 2)
         grid.addLayout(self._add_custom(), 11, 0, 1, 6)
 
         grid.addWidget(QtWidgets.QWidget(), 5, 0, 5, 6)
@@ -76,6 +77,17 @@ class GIF(SettingPanel):
             opt="stats_mode",
         )
 
+    def init_single_pass(self):
+        return self._add_check_box(
+            label="Single Pass",
+            widget_name="single_pass",
+            opt="single_pass",
+            tooltip=(
+                "Make the palette and the GIF from one read of the video, instead of a palette pass first.\n"
+                "Frames are kept in memory until the palette is ready, unless Statistics Mode is single."
+            ),
+        )
+
     def update_video_encoder_settings(self):
         self.app.fastflix.current_video.video_settings.video_encoder_settings = GIFSettings(
             fps=self.widgets.fps.currentText(),
@@ -84,6 +96,7 @@ class GIF(SettingPanel):
             pix_fmt="yuv420p",  # hack for thumbnails to show properly
             max_colors=self.widgets.max_colors.currentText(),
             stats_mode=self.widgets.stats_mode.currentText(),
+            single_pass=self.widgets.single_pass.isChecked(),
             extra_both_passes=self.widgets.extra_both_passes.isChecked(),
         )
 
@@ -19,4 +19,6 @@ enable_attachments = False
 enable_concat = True
 
 from fastflix.encoders.h264_videotoolbox.command_builder import build  # noqa: F401,E402
-from fastflix.encoders.h264_videotoolbox.settings_panel import H264VideoToolbox as settings_panel  # noqa: F401,E402
+from fastflix.encoders.common.helpers import lazy_settings_panel  # noqa: E402
+
+__getattr__ = lazy_settings_panel("fastflix.encoders.h264_videotoolbox.settings_panel", "H264VideoToolbox")
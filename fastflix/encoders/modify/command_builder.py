@@ -1,7 +1,7 @@
 # -*- coding: utf-8 -*-
 from fastflix.encoders.common.helpers import Command, generate_all
 from fastflix.models.fastflix import FastFlix
-from fastflix.shared import clean_file_string
+from fastflix.paths import clean_file_string
 
 
 def build(fastflix: FastFlix):
@@ -18,4 +18,6 @@ enable_attachments = False
 enable_advanced = False
 
 from fastflix.encoders.modify.command_builder import build  # noqa: F401,E402
-from fastflix.encoders.modify.settings_panel import Modify as settings_panel  # noqa: F401,E402
+from fastflix.encoders.common.helpers import lazy_settings_panel  # noqa: E402
+
+__getattr__ = lazy_settings_panel("fastflix.encoders.modify.settings_panel", "Modify")
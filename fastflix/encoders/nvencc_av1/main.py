@@ -97,4 +97,6 @@ audio_formats = [
 ]
 
 from fastflix.encoders.nvencc_av1.command_builder import build  # noqa: F401,E402
-from fastflix.encoders.nvencc_av1.settings_panel import NVENCC as settings_panel  # noqa: F401,E402
+from fastflix.encoders.common.helpers import lazy_settings_panel  # noqa: E402
+
+__getattr__ = lazy_settings_panel("fastflix.encoders.nvencc_av1.settings_panel", "NVENCC")
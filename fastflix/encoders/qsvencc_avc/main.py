@@ -98,4 +98,6 @@ audio_formats = [
 ]
 
 from fastflix.encoders.qsvencc_avc.command_builder import build  # noqa: F401,E402
-from fastflix.encoders.qsvencc_avc.settings_panel import QSVEncH264 as settings_panel  # noqa: F401,E402
+from fastflix.encoders.common.helpers import lazy_settings_panel  # noqa: E402
+
+__getattr__ = lazy_settings_panel("fastflix.encoders.qsvencc_avc.settings_panel", "QSVEncH264")
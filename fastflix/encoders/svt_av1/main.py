@@ -19,4 +19,6 @@ enable_attachments = True
 enable_concat = True
 
 from fastflix.encoders.svt_av1.command_builder import build  # noqa: F401,E402
-from fastflix.encoders.svt_av1.settings_panel import SVT_AV1 as settings_panel  # noqa: F401,E402
+from fastflix.encoders.common.helpers import lazy_settings_panel  # noqa: E402
+
+__getattr__ = lazy_settings_panel("fastflix.encoders.svt_av1.settings_panel", "SVT_AV1")
@@ -5,7 +5,7 @@ from fastflix.encoders.common.helpers import Command
 from fastflix.models.encode import VCEEncCAVCSettings
 from fastflix.models.video import Video
 from fastflix.models.fastflix import FastFlix
-from fastflix.shared import clean_file_string
+from fastflix.paths import clean_file_string
 from fastflix.encoders.common.encc_helpers import (
     build_subtitle,
     build_audio,
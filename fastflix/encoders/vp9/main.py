@@ -20,4 +20,6 @@ enable_attachments = False
 enable_concat = True
 
 from fastflix.encoders.vp9.command_builder import build  # noqa: F401,E402
-from fastflix.encoders.vp9.settings_panel import VP9 as settings_panel  # noqa: F401,E402
+from fastflix.encoders.common.helpers import lazy_settings_panel  # noqa: E402
+
+__getattr__ = lazy_settings_panel("fastflix.encoders.vp9.settings_panel", "VP9")
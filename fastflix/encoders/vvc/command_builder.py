@@ -4,7 +4,7 @@ import secrets
 from fastflix.encoders.common.helpers import Command, generate_all, null
 from fastflix.models.encode import VVCSettings
 from fastflix.models.fastflix import FastFlix
-from fastflix.shared import clean_file_string, quoted_path
+from fastflix.paths import clean_file_string, quoted_path
 
 vvc_valid_color_primaries = [
     "bt709",
@@ -21,4 +21,6 @@ enable_concat = True
 audio_formats = []
 
 from fastflix.encoders.webp.command_builder import build  # noqa: F401,E402
-from fastflix.encoders.webp.settings_panel import WEBP as settings_panel  # noqa: F401,E402
+from fastflix.encoders.common.helpers import lazy_settings_panel  # noqa: E402
+
+__getattr__ = lazy_settings_panel("fastflix.encoders.webp.settings_panel", "WEBP")
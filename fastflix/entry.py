@@ -9,6 +9,7 @@ try:
     import reusables
 
     import fastflix.language  # Have to set language first thing  # noqa: F401
+    from fastflix.control_server import control_server_from_env  # noqa: F401
     from fastflix.conversion_worker import queue_worker  # noqa: F401
     from fastflix.models.config import Config  # noqa: F401
     from fastflix.models.fastflix import FastFlix  # noqa: F401
@@ -59,6 +60,10 @@ def startup_options():
     if "--version" in options:
         print(__version__)
         return 0
+    if options[:1] == ["run-queue"]:
+        from fastflix.headless import run_queue
+
+        return run_queue(options[1:])
 
 
 def main(portable_mode=False):
@@ -117,11 +122,21 @@ def main(portable_mode=False):
             logger.exception("Could not create GUI Process, please report this error!")
             return exit_status
 
+        control_server = control_server_from_env(worker_queue, status_queue, gui_alive=gui_proc.is_alive)
+
         try:
-            queue_worker(gui_proc, worker_queue, status_queue, log_queue)
+            queue_worker(
+                gui_proc,
+                worker_queue,
+                status_queue,
+                log_queue,
+                publish=control_server.publish if control_server else None,
+            )
             exit_status = 0
         except Exception:
             logger.exception("Exception occurred while running FastFlix core")
         finally:
+            if control_server:
+                control_server.stop()
             gui_proc.kill()
             return exit_status
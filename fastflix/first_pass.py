@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+"""
+Reuse of first pass statistics between two pass encodes of the same source.
+
+The statistics a first pass writes depend on the source and everything that reaches the encoder, but not on
+the target bitrate, so the same video queued at several bitrates only needs its first pass run once.
+Entries are keyed by the source file, the FFmpeg build and the first pass command with its statistics file
+name and bitrate taken out, which covers the trim range, filters and encoder settings.
+"""
+import glob
+import json
+import logging
+import re
+import shlex
+import shutil
+from pathlib import Path
+from typing import List, Optional, Tuple
+
+from fastflix.cache import FileCache, cache_key, source_identity
+from fastflix.models.video import Video
+
+logger = logging.getLogger("fastflix")
+
+__all__ = ["first_pass_cache", "first_pass_key", "reuse_first_pass", "store_first_pass"]
+
+passlogfile_re = re.compile(r'-passlogfile "([^"]+)"')
+# x265 takes a file name in its parameters instead of FFmpeg's prefix
+x265_stats_re = re.compile(r'(?<=[":])stats=([^:"]+)')
+first_pass_re = re.compile(r"(?:^|\s)-pass 1(?:\s|$)|[\":]pass=1[:\"]")
+# The random part of the statistics file name the builders use, wherever and however it is quoted
+stats_name_re = re.compile(r"pass_log_file_[0-9a-f]+")
+bitrate_re = re.compile(r"-b:v \S+")
+
+
+def stats_prefix(command: str) -> Optional[str]:
+    match = passlogfile_re.search(command) or x265_stats_re.search(command)
+    return match.group(1) if match else None
+
+
+def first_pass_key(video: Video, index: int) -> Optional[str]:
+    """The cache key of the video's command at index, if it is the first of two passes"""
+    commands = video.video_settings.conversion_commands
+    if index + 1 >= len(commands) or commands[index].exe != "ffmpeg":
+        return None
+    command = commands[index].command
+    prefix = stats_prefix(command)
+    if not prefix or not first_pass_re.search(command):
+        return None
+    if len(set(stats_name_re.findall(command))) > 1:
+        # An ABR ladder's first pass writes statistics for each of its outputs
+        return None
+    # Each video has its own work folder, so the whole statistics path is left out
+    normalized = bitrate_re.sub("", stats_name_re.sub("<stats>", command.replace(prefix, "<stats>")))
+    try:
+        ffmpeg = shlex.split(command.replace("\\", "\\\\"))[0]
+    except ValueError:
+        return None
+    return cache_key(source_identity(video.source), source_identity(ffmpeg), " ".join(normalized.split()))
+
+
+def first_pass_cache(work_path: Path) -> FileCache:
+    # Statistics with macroblock tree or cutree data run to tens of megabytes for a feature length film
+    return FileCache(Path(work_path) / "first_pass_cache", 2_000_000_000)
+
+
+def stats_location(video: Video, prefix: str) -> Tuple[Path, str]:
+    """The folder and file name start of the statistics, a relative name is written to the work folder"""
+    path = Path(prefix)
+    if not path.is_absolute():
+        path = Path(video.work_path) / path
+    return path.parent, path.name
+
+
+def reuse_first_pass(video: Video, cache: FileCache) -> bool:
+    """
+    If the video is about to run a first pass that has been run before, copy in its statistics
+    and move on to the second pass. Returns if the first pass was skipped.
+    """
+    index = video.status.current_command
+    if not (key := first_pass_key(video, index)):
+        return False
+    if not (listing := cache.read(key)):
+        return False
+    folder, name = stats_location(video, stats_prefix(video.video_settings.conversion_commands[index].command))
+    suffixes: List[str] = json.loads(listing)
+    cached = [cache.get(cache_key(key, suffix)) for suffix in suffixes]
+    if not all(cached):
+        return False
+    folder.mkdir(parents=True, exist_ok=True)
+    try:
+        for suffix, file in zip(suffixes, cached):
+            shutil.copyfile(file, folder / f"{name}{suffix}")
+    except OSError:
+        logger.warning("Could not copy cached first pass statistics, running the first pass")
+        return False
+    logger.info(f"{video.source.name}: reusing the statistics of an earlier first pass")
+    video.status.current_command = index + 1
+    return True
+
+
+def store_first_pass(video: Video, index: int, cache: FileCache):
+    """Keep the statistics of a finished first pass for later encodes of the same source"""
+    if not (key := first_pass_key(video, index)):
+        return
+    folder, name = stats_location(video, stats_prefix(video.video_settings.conversion_commands[index].command))
+    files = [file for file in folder.glob(f"{glob.escape(name)}*") if file.is_file()]
+    if not files:
+        return
+    suffixes = []
+    for file in files:
+        suffix = file.name[len(name) :]
+        if cache.add(cache_key(key, suffix), file):
+            suffixes.append(suffix)
+    cache.store(key, json.dumps(suffixes).encode("utf-8"))
@@ -1,20 +1,36 @@
 # -*- coding: utf-8 -*-
 import logging
+import math
 import os
 import re
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from subprocess import PIPE, CompletedProcess, Popen, TimeoutExpired, run, check_output
-from typing import List, Tuple, Union
+from subprocess import DEVNULL, PIPE, CompletedProcess, Popen, TimeoutExpired, run, check_output
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple, Union
 from packaging import version
 import shlex
 
 import reusables
 from box import Box, BoxError
 
+from fastflix.cache import FileCache, cache_key, source_identity
+from fastflix.encoders.common.audio import (
+    loudnorm_targets,
+    loudness_analysis_command,
+    parse_loudness,
+    track_channel_layout,
+)
 from fastflix.exceptions import FlixError
 from fastflix.language import t
 from fastflix.models.config import Config
-from fastflix.models.fastflix_app import FastFlixApp
+from fastflix.models.encode import AudioTrack, LoudnessMeasurement
+from fastflix.models.video import ConcatIndex
+
+if TYPE_CHECKING:
+    # Only the GUI has a FastFlixApp, everything here just uses its .fastflix so it runs without Qt as well
+    from fastflix.models.fastflix_app import FastFlixApp
 
 here = os.path.abspath(os.path.dirname(__file__))
 re_tff = re.compile(r"TFF:\s+(\d+)")
@@ -90,6 +106,41 @@ ffmpeg_valid_color_space = [
     "ictcp",
 ]
 
+denoise_presets = {
+    "nlmeans": {
+        "weak": "nlmeans=s=1.0:p=3:r=9",
+        "moderate": "nlmeans=s=1.0:p=7:r=15",
+        "strong": "nlmeans=s=10.0:p=13:r=25",
+    },
+    "atadenoise": {
+        "weak": "atadenoise=0a=0.01:0b=0.02:1a=0.01:1b=0.02:2a=0.01:2b=0.02:s=9",
+        "moderate": "atadenoise=0a=0.02:0b=0.04:1a=0.02:1b=0.04:2a=0.02:2b=0.04:s=9",
+        "strong": "atadenoise=0a=0.04:0b=0.12:1a=0.04:1b=0.12:2a=0.04:2b=0.12:s=9",
+    },
+    "hqdn3d": {
+        "weak": "hqdn3d=luma_spatial=2:chroma_spatial=1.5:luma_tmp=3:chroma_tmp=2.25",
+        "moderate": "hqdn3d=luma_spatial=4:chroma_spatial=3:luma_tmp=6:chroma_tmp=4.5",
+        "strong": "hqdn3d=luma_spatial=10:chroma_spatial=7.5:luma_tmp=15:chroma_tmp=11.25",
+    },
+    "vaguedenoiser": {
+        "weak": "vaguedenoiser=threshold=1:method=soft:nsteps=5",
+        "moderate": "vaguedenoiser=threshold=3:method=soft:nsteps=5",
+        "strong": "vaguedenoiser=threshold=6:method=soft:nsteps=5",
+    },
+}
+
+subtitle_types = {
+    "dvd_subtitle": "picture",
+    "hdmv_pgs_subtitle": "pgs",
+    "dvdsub": "picture",
+    "subrip": "text",
+    "ssa": "text",
+    "ass": "text",
+    "mov_text": "text",
+    "webvtt": "text",
+    "xsub": "text",
+}
+
 
 def clean_file_string(source):
     return str(source).strip()
@@ -143,8 +194,15 @@ def guess_bit_depth(pix_fmt: str, color_primaries: str = None) -> int:
     return 8
 
 
-def execute(command: List, work_dir: Union[Path, str] = None, timeout: int = None) -> CompletedProcess:
+def execute(
+    command: List,
+    work_dir: Union[Path, str] = None,
+    timeout: int = None,
+    cancel_event: Optional[threading.Event] = None,
+) -> CompletedProcess:
     logger.info(f"{t('Running command')}: {' '.join(command)}")
+    if cancel_event is not None:
+        return execute_cancellable(command, work_dir, cancel_event)
     return run(
         command,
         stdout=PIPE,
@@ -156,6 +214,19 @@ def execute(command: List, work_dir: Union[Path, str] = None, timeout: int = Non
     )
 
 
+def execute_cancellable(command: List, work_dir: Union[Path, str], cancel_event: threading.Event) -> CompletedProcess:
+    """Run the command to completion, killing it as soon as the cancel event is set"""
+    process = Popen(command, stdout=PIPE, stderr=PIPE, stdin=DEVNULL, cwd=work_dir, encoding="utf-8")
+    while True:
+        try:
+            stdout, stderr = process.communicate(timeout=0.2)
+        except TimeoutExpired:
+            if cancel_event.is_set():
+                process.kill()
+        else:
+            return CompletedProcess(command, process.returncode, stdout, stderr)
+
+
 def ffmpeg_configuration(app, config: Config, **_):
     """Extract the version and libraries available from the specified version of FFmpeg"""
     res = execute([f"{config.ffmpeg}", "-version"])
@@ -189,7 +260,7 @@ def ffprobe_configuration(app, config: Config, **_):
     app.fastflix.ffprobe_version = version
 
 
-def probe(app: FastFlixApp, file: Path) -> Box:
+def probe(app: "FastFlixApp", file: Path) -> Box:
     """
     Run FFprobe on a file
     ffprobe -v quiet -loglevel panic -print_format json -show_format -show_streams
@@ -234,25 +305,47 @@ def get_all_concat_items(file):
     return items
 
 
-def get_concat_item(file, location=0):
-    all_items = get_all_concat_items(file)
-    if not all_items:
+def probe_duration(config: Config, file: Path) -> float:
+    result = execute(
+        [
+            f"{config.ffprobe}",
+            "-v",
+            "quiet",
+            "-loglevel",
+            "panic",
+            "-print_format",
+            "json",
+            "-show_entries",
+            "format=duration",
+            clean_file_string(file),
+        ]
+    )
+    try:
+        return float(Box.from_json(result.stdout).format.duration)
+    except (BoxError, AttributeError, KeyError, TypeError, ValueError):
+        # Still images have no duration
+        return 0.0
+
+
+def build_concat_index(config: Config, file: Path, workers: int = 4) -> ConcatIndex:
+    """Read the concat list once, probing how long every file in it is, a few at a time"""
+    items = get_all_concat_items(file)
+    if not items:
         raise FlixError("concat file must start with `file` on each line.")
-    if location == 0:
-        return all_items[0]
-    section = len(all_items) // 10
-    item_num = int((location * section)) - 1
-    if item_num >= len(all_items):
-        return all_items[-1]
-    return all_items[item_num]
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        durations = list(pool.map(lambda item: probe_duration(config, item), items))
+    return ConcatIndex.from_durations(items, durations)
 
 
-def parse(app: FastFlixApp, **_):
+def parse(app: "FastFlixApp", details: Optional[Box] = None, **_):
+    """Read the source's streams, details is its FFprobe output when it has already been probed"""
     source = app.fastflix.current_video.source
     if source.name.lower().endswith("txt"):
-        source = get_concat_item(source)
+        app.fastflix.current_video.concat_index = build_concat_index(app.fastflix.config, source)
+        source = Path(app.fastflix.current_video.concat_index.files[0])
         app.fastflix.current_video.concat = True
-    data = probe(app, source)
+        details = None
+    data = details if details is not None else probe(app, source)
     if "streams" not in data:
         raise FlixError(f"Not a video file, FFprobe output: {data}")
     streams = Box({"video": [], "audio": [], "subtitle": [], "attachment": [], "data": []})
@@ -280,54 +373,156 @@ def parse(app: FastFlixApp, **_):
     app.fastflix.current_video.video_settings.selected_track = streams.video[0].index
     app.fastflix.current_video.format = data.format
     app.fastflix.current_video.duration = float(data.format.get("duration", 0))
+    if app.fastflix.current_video.concat_index and app.fastflix.current_video.concat_index.duration:
+        app.fastflix.current_video.duration = app.fastflix.current_video.concat_index.duration
 
 
-def extract_attachments(app: FastFlixApp, **_):
-    if app.fastflix.config.disable_cover_extraction:
-        return
-    for track in app.fastflix.current_video.streams.attachment:
+cover_attachment_names = ("cover", "small_cover", "cover_land", "small_cover_land")
+
+
+def cover_attachments(streams: Box) -> List[Tuple[int, str]]:
+    """(stream index, file name) of every cover image attached to the source"""
+    covers = []
+    for track in streams.get("attachment", []):
         filename = track.get("tags", {}).get("filename", "")
-        if filename.rsplit(".", 1)[0] in ("cover", "small_cover", "cover_land", "small_cover_land"):
-            extract_attachment(
-                app.fastflix.config.ffmpeg,
-                app.fastflix.current_video.source,
-                track.index,
-                app.fastflix.current_video.work_path,
-                filename,
-            )
+        if filename.rsplit(".", 1)[0] in cover_attachment_names:
+            covers.append((track.index, filename))
+    return covers
 
 
-def extract_attachment(ffmpeg: Path, source: Path, stream: int, work_dir: Path, file_name: str):
-    try:
-        execute(
-            [
-                f"{ffmpeg}",
-                "-y",
-                "-i",
-                clean_file_string(source),
-                "-map",
-                f"0:{stream}",
-                "-c",
-                "copy",
-                "-vframes",
-                "1",
-                clean_file_string(file_name),
-            ],
-            work_dir=work_dir,
-            timeout=5,
-        )
-    except TimeoutExpired:
-        logger.warning(f"WARNING Timeout while extracting cover file {file_name}")
+def attachment_extraction_command(ffmpeg: Path, source: Path, attachments: List[Tuple[int, str]]) -> List[str]:
+    """Cover images are attached pictures, so each is mapped to its own single frame output of the same read"""
+    command = [str(ffmpeg), "-y", "-nostdin", "-loglevel", "error", "-i", clean_file_string(source)]
+    for stream, file_name in attachments:
+        command.extend(["-map", f"0:{stream}", "-c", "copy", "-frames:v", "1", clean_file_string(file_name)])
+    return command
+
+
+def extract_attachments(
+    ffmpeg: Path,
+    source: Path,
+    attachments: List[Tuple[int, str]],
+    work_dir: Path,
+    cache: Optional[FileCache] = None,
+    cancel_event: Optional[threading.Event] = None,
+) -> List[Path]:
+    """
+    Write the attachments into the work directory, all with the same ffmpeg call,
+    reusing any already extracted from this source. Returns the files written, nothing if cancelled.
+    """
+    work_dir = Path(work_dir)
+    work_dir.mkdir(parents=True, exist_ok=True)
+    source_id = source_identity(source)
+    keys = {stream: cache_key(source_id, stream, file_name) for stream, file_name in attachments}
+    extracted, missing = [], []
+    for stream, file_name in attachments:
+        cached = cache.get(keys[stream]) if cache is not None else None
+        if cached:
+            shutil.copyfile(cached, work_dir / file_name)
+            extracted.append(work_dir / file_name)
+        else:
+            missing.append((stream, file_name))
+    if not missing:
+        return extracted
+
+    command = attachment_extraction_command(ffmpeg, source, missing)
+    logger.info(f"{t('Running command')}: {' '.join(command)}")
+    process = Popen(command, stdout=PIPE, stderr=PIPE, cwd=work_dir)
+    # No time limit, the source may well be on slow network storage, but it can be given up on
+    while True:
+        try:
+            _, stderr = process.communicate(timeout=0.1)
+            break
+        except TimeoutExpired:
+            if cancel_event and cancel_event.is_set():
+                process.kill()
+                process.communicate()
+                return []
+    if process.returncode != 0:
+        logger.warning(f"{t('Could not extract covers')}: {stderr.decode('utf-8', errors='ignore')}")
+
+    for stream, file_name in missing:
+        path = work_dir / file_name
+        if path.exists() and path.stat().st_size:
+            extracted.append(path)
+            if cache is not None:
+                cache.add(keys[stream], path)
+    return extracted
+
+
+# Subtitle codecs that can be written to their own file, as (extension, output arguments)
+subtitle_extract_formats = {
+    "subrip": ("srt", ["-c", "srt", "-f", "srt"]),
+    "xsub": ("srt", ["-c", "srt", "-f", "srt"]),
+    "webvtt": ("srt", ["-c", "srt", "-f", "srt"]),
+    "mov_text": ("srt", ["-c", "srt", "-f", "srt"]),
+    "ass": ("ass", ["-c", "copy"]),
+    "ssa": ("ssa", ["-c", "copy"]),
+    "hdmv_pgs_subtitle": ("sup", ["-c", "copy"]),
+}
+
+
+def subtitle_extraction_command(ffmpeg: Path, source: Path, outputs: List[Tuple[int, str, str]]) -> List[str]:
+    """
+    A single read through the source that writes every subtitle track to its own file.
+    Outputs are (stream index, codec name, file name), progress is written to stdout.
+    """
+    command = [str(ffmpeg), "-y", "-nostats", "-loglevel", "error", "-progress", "pipe:1"]
+    command.extend(["-i", clean_file_string(source)])
+    for stream, codec_name, file_name in outputs:
+        command.extend(["-map", f"0:{stream}", *subtitle_extract_formats[codec_name][1], clean_file_string(file_name)])
+    return command
+
+
+def measure_loudness(
+    ffmpeg: Path,
+    source: Path,
+    tracks: List[AudioTrack],
+    cache: Optional[FileCache] = None,
+    cancel_event: Optional[threading.Event] = None,
+) -> Dict[int, LoudnessMeasurement]:
+    """
+    EBU R128 measurements of the given audio tracks by outdex, for two pass loudness normalization.
+    Any tracks not already in the cache are all measured together in a single audio only decode.
+    """
+    source_id = source_identity(source)
+    keys = {
+        track.outdex: cache_key(source_id, track.index, track_channel_layout(track), loudnorm_targets)
+        for track in tracks
+    }
+    measurements = {}
+    missing = []
+    for track in tracks:
+        cached = cache.read(keys[track.outdex]) if cache is not None else None
+        if cached:
+            measurements[track.outdex] = LoudnessMeasurement.model_validate_json(cached)
+        else:
+            missing.append(track)
+    if not missing:
+        return measurements
+
+    result = execute(loudness_analysis_command(ffmpeg, clean_file_string(source), missing), cancel_event=cancel_event)
+    if cancel_event and cancel_event.is_set():
+        raise FlixError(t("Cancelled"))
+    if result.returncode != 0:
+        raise FlixError(f"{t('Could not measure loudness')}: {result.stderr[-500:]}")
+    for outdex, measurement in parse_loudness(result.stderr, missing).items():
+        measurements[outdex] = measurement
+        if cache is not None:
+            cache.store(keys[outdex], measurement.model_dump_json().encode("utf-8"))
+    return measurements
 
 
 def generate_thumbnail_command(
     config: Config,
     source: Path,
-    output: Path,
+    output: Optional[Path],
     filters: str,
     start_time: float = 0,
     input_track: int = 0,
+    image_codec: str = "mjpeg",
 ) -> list[str]:
+    """Build the ffmpeg command for a single preview frame, written to stdout as `image_codec` if output is None"""
     command = [str(config.ffmpeg)]
 
     # Trim from start this many seconds
@@ -344,11 +539,45 @@ def generate_thumbnail_command(
     if "-map" not in filters:
         command += ["-map", f"0:{input_track}"]
 
-    command += ["-an", "-y", "-map_metadata", "-1", "-frames:v", "1", clean_file_string(output)]
+    command += ["-an", "-y", "-map_metadata", "-1", "-frames:v", "1"]
+
+    if output is None:
+        command += ["-f", "image2pipe", "-c:v", image_codec, "-"]
+    else:
+        command.append(clean_file_string(output))
 
     return command
 
 
+def generate_filmstrip_command(
+    config: Config,
+    source: Path,
+    tile_filters: List[str],
+    start_times: List[float],
+    image_codec: str = "mjpeg",
+) -> list[str]:
+    """
+    Build a single ffmpeg command that renders one frame per start time, placed side by side, to stdout.
+
+    Every start time is its own fast seeking input of the same source,
+    tile_filters[i] must be a raw filter chain reading from input i and ending in the label [v{i}].
+    """
+    command = [str(config.ffmpeg), "-loglevel", "warning"]
+    for start_time in start_times:
+        command += ["-ss", str(start_time), "-i", clean_file_string(source)]
+
+    labels = "".join(f"[v{i}]" for i in range(len(tile_filters)))
+    filter_complex = ";".join(tile_filters)
+    if len(tile_filters) > 1:
+        filter_complex += f";{labels}hstack=inputs={len(tile_filters)}[strip]"
+    else:
+        filter_complex += ";[v0]null[strip]"
+
+    command += ["-filter_complex", filter_complex, "-map", "[strip]"]
+    command += ["-an", "-y", "-map_metadata", "-1", "-frames:v", "1", "-f", "image2pipe", "-c:v", image_codec, "-"]
+    return command
+
+
 def get_auto_crop(
     config: Config,
     source: Path,
@@ -400,7 +629,29 @@ def get_auto_crop(
     result_list.append([video_width - width - x_crop, video_height - height - y_crop, x_crop, y_crop])
 
 
-def detect_interlaced(app: FastFlixApp, config: Config, source: Path, **_):
+def auto_crop_times(duration: float, points: int, start_time: float = 0) -> List[int]:
+    """Evenly spread times to look for black bars at, starting a tenth of the way in unless told otherwise"""
+    start_pos = start_time or duration // 10
+    blocks = max(math.ceil((duration - start_pos) / (points + 1)), 1)
+    return [x for x in range(int(start_pos), int(duration), blocks) if x < duration][:points]
+
+
+def select_auto_crop(result_list: List, video_width: int, video_height: int) -> Optional[List[int]]:
+    """The least cropping found of all the sample points, as [right, bottom, left, top]"""
+    if not result_list:
+        logger.warning("Autocrop did not return crop points, please use a ffmpeg version with cropdetect filter")
+        return None
+    right, bottom, left, top = selected = min(result_list, key=sum)
+    if top + bottom > video_height * 0.9 or right + left > video_width * 0.9:
+        logger.warning(
+            f"{t('Autocrop tried to crop too much')}"
+            f" ({t('left')} {left}, {t('top')} {top}, {t('right')} {right}, {t('bottom')} {bottom}), {t('ignoring')}"
+        )
+        return None
+    return selected
+
+
+def detect_interlaced(app: "FastFlixApp", config: Config, source: Path, **_):
     """http://www.aktau.be/2013/09/22/detecting-interlaced-video-with-ffmpeg/"""
     # Interlaced
     # [Parsed_idet_0 @ 00000] Repeated Fields: Neither:   815 Top:    88 Bottom:    98
@@ -515,7 +766,7 @@ def convert_mastering_display(data: Box) -> Tuple[Box, str]:
     return master_display, cll
 
 
-def parse_hdr_details(app: FastFlixApp, **_):
+def parse_hdr_details(app: "FastFlixApp", **_):
     streams = app.fastflix.current_video.streams
     video_track = app.fastflix.current_video.video_settings.selected_track
     if streams and streams.video:
@@ -592,7 +843,7 @@ def get_hdr10_parser_version(config: Config) -> version:
     return HDR10_parser_version
 
 
-def detect_hdr10_plus(app: FastFlixApp, config: Config, **_):
+def detect_hdr10_plus(app: "FastFlixApp", config: Config, **_):
     if not config.hdr10plus_parser or not config.hdr10plus_parser.exists():
         return
 
@@ -647,3 +898,97 @@ def detect_hdr10_plus(app: FastFlixApp, config: Config, **_):
 
     if hdr10plus_streams:
         app.fastflix.current_video.hdr10_plus = hdr10plus_streams
+
+
+def hdr10plus_extract_commands(config: Config, source: Path, track: int, output: Path) -> Tuple[List[str], List[str]]:
+    """The ffmpeg command that pulls out the raw HEVC stream, and the parser command reading it from stdin"""
+    ffmpeg_command = [
+        str(config.ffmpeg),
+        "-y",
+        "-nostdin",
+        "-nostats",
+        "-loglevel",
+        "error",
+        "-progress",
+        "pipe:2",
+        "-i",
+        clean_file_string(source),
+        "-map",
+        f"0:{track}",
+        "-c:v",
+        "copy",
+        "-bsf:v",
+        "hevc_mp4toannexb",
+        "-f",
+        "hevc",
+        "-",
+    ]
+    parser_command = [str(config.hdr10plus_parser), "-o", clean_file_string(output), "-"]
+    if get_hdr10_parser_version(config) >= version.parse("1.0.0"):
+        parser_command.insert(1, "extract")
+    return ffmpeg_command, parser_command
+
+
+def extract_hdr10plus_metadata(
+    config: Config,
+    source: Path,
+    track: int,
+    output: Path,
+    cache: Optional[FileCache] = None,
+    progress: Optional[Callable[[str], None]] = None,
+    cancel_event: Optional[threading.Event] = None,
+) -> Optional[Path]:
+    """
+    Write the HDR10+ dynamic metadata of a video track to output, returning it on success.
+    Results are kept per source and track, so the same title never has to be read through twice.
+    """
+    output = Path(output)
+    key = cache_key(source_identity(source), track, "hdr10plus")
+    if cache is not None and (cached := cache.get(key)):
+        logger.info(f"{t('Using previously extracted HDR10+ metadata for track')} {track}")
+        shutil.copyfile(cached, output)
+        return output
+
+    ffmpeg_command, parser_command = hdr10plus_extract_commands(config, source, track, output)
+    logger.info(f"{t('Running command')}: {' '.join(ffmpeg_command)} | {' '.join(parser_command)}")
+    process = Popen(ffmpeg_command, stdout=PIPE, stderr=PIPE, stdin=DEVNULL)
+    process_two = Popen(
+        parser_command, stdout=PIPE, stderr=PIPE, stdin=process.stdout, encoding="utf-8", cwd=str(output.parent)
+    )
+    # Only the parser should hold the pipe, so it sees the end of it
+    process.stdout.close()
+
+    # ffmpeg writes a block of key=value lines about twice a second, ending each with progress=
+    block = {}
+    errors = []
+    for line in iter(process.stderr.readline, b""):
+        line = line.decode("utf-8", errors="ignore").strip()
+        key_name, sep, value = line.partition("=")
+        if not sep or " " in key_name:
+            errors.append(line)
+            continue
+        block[key_name] = value
+        if key_name != "progress":
+            continue
+        if cancel_event and cancel_event.is_set():
+            process.kill()
+            process_two.kill()
+            break
+        if progress:
+            progress(
+                f"frame={block.get('frame', 0)} fps={block.get('fps', 0)} "
+                f"time={block.get('out_time', '')} speed={block.get('speed', '')}"
+            )
+        block = {}
+
+    returncode = process.wait()
+    stdout, stderr = process_two.communicate()
+    logger.debug(f"HDR10+ Extract: {stdout}")
+    if cancel_event and cancel_event.is_set():
+        return None
+    if returncode != 0 or process_two.returncode != 0 or not output.exists():
+        logger.error(f"{t('Could not extract HDR10+ metadata')}: {' '.join(errors[-5:])} {stderr}")
+        return None
+    if cache is not None:
+        cache.add(key, output)
+    return output
@@ -0,0 +1,153 @@
+# -*- coding: utf-8 -*-
+import bisect
+import logging
+import re
+import threading
+import time
+from pathlib import Path
+from subprocess import DEVNULL, PIPE
+from typing import List, Optional
+
+from psutil import Popen
+
+from fastflix.paths import clean_file_string
+
+logger = logging.getLogger("fastflix")
+
+__all__ = ["FrameServer"]
+
+pts_time_re = re.compile(r"pts_time:\s*(-?[\d.]+)")
+
+
+class FrameServer:
+    """
+    A long running ffmpeg process that walks through every keyframe of a source once,
+    pushing them through the preview filter chain and keeping the results in memory.
+
+    The ffmpeg CLI cannot be asked to seek again once started, so instead of decoding on request
+    the source is decoded only once, keyframes only, and requests are answered from the
+    index that builds up, in the order of the file, while it runs.
+    """
+
+    def __init__(
+        self,
+        ffmpeg: Path,
+        source: Path,
+        filters: str,
+        duration: float = 0,
+        max_frames: int = 1000,
+    ):
+        """filters must be a raw filter chain whose output is labeled [v], as from generate_filters(raw_filters=True)"""
+        self.ffmpeg = ffmpeg
+        self.source = source
+        self.filters = filters
+        self.min_interval = duration / max_frames if duration and max_frames else 0
+        self.process: Optional[Popen] = None
+        self.timestamps: List[float] = []
+        self.frames: List[bytes] = []
+        self.scanned_to = -1.0
+        self.finished = False
+        self._pending_times: List[float] = []
+        self._lock = threading.Lock()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def command(self) -> List[str]:
+        return [
+            str(self.ffmpeg),
+            "-hide_banner",
+            "-loglevel",
+            "info",
+            "-skip_frame",
+            "nokey",
+            "-i",
+            clean_file_string(self.source),
+            "-filter_complex",
+            f"{self.filters};[v]showinfo[shown]",
+            "-map",
+            "[shown]",
+            "-an",
+            "-sn",
+            "-dn",
+            "-fps_mode",
+            "passthrough",
+            "-f",
+            "image2pipe",
+            "-c:v",
+            "mjpeg",
+            "-",
+        ]
+
+    def start(self):
+        logger.debug(f"Starting preview frame server: {self.command}")
+        self.process = Popen(self.command, stdin=DEVNULL, stdout=PIPE, stderr=PIPE)
+        self._threads = [
+            threading.Thread(target=self._read_timestamps, daemon=True),
+            threading.Thread(target=self._read_frames, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            try:
+                self.process.kill()
+            except Exception:
+                pass
+
+    @property
+    def running(self) -> bool:
+        return bool(self.process and self.process.poll() is None)
+
+    def frame(self, timestamp: float) -> Optional[bytes]:
+        """Closest keyframe to the timestamp, None if the server has not made it that far into the source yet"""
+        with self._lock:
+            if not self.timestamps or (not self.finished and timestamp > self.scanned_to):
+                return None
+            index = bisect.bisect_left(self.timestamps, timestamp)
+            if index == len(self.timestamps) or (
+                index > 0 and timestamp - self.timestamps[index - 1] < self.timestamps[index] - timestamp
+            ):
+                index -= 1
+            return self.frames[index]
+
+    def _read_timestamps(self):
+        for line in iter(self.process.stderr.readline, b""):
+            line = line.decode("utf-8", errors="ignore")
+            if "showinfo" not in line:
+                continue
+            match = pts_time_re.search(line)
+            if match:
+                with self._lock:
+                    self._pending_times.append(float(match.group(1)))
+
+    def _read_frames(self):
+        buffer = b""
+        for chunk in iter(lambda: self.process.stdout.read(1 << 16), b""):
+            buffer += chunk
+            # Baseline JPEGs from ffmpeg's mjpeg encoder byte stuff their scan data, so the end of image marker is unique
+            while (end := buffer.find(b"\xff\xd9")) != -1:
+                self._add_frame(buffer[: end + 2])
+                buffer = buffer[end + 2 :]
+        # Only a complete run can answer for timestamps past the last keyframe seen
+        returncode = self.process.wait()
+        with self._lock:
+            self.finished = returncode == 0
+
+    def _add_frame(self, data: bytes):
+        # The showinfo line for a frame can arrive a little after the frame itself
+        timestamp = None
+        for _ in range(500):
+            with self._lock:
+                if self._pending_times:
+                    timestamp = self._pending_times.pop(0)
+                    break
+            time.sleep(0.01)
+        if timestamp is None:
+            return
+        with self._lock:
+            self.scanned_to = max(self.scanned_to, timestamp)
+            if self.timestamps and timestamp - self.timestamps[-1] < max(self.min_interval, 0.000001):
+                return
+            self.timestamps.append(timestamp)
+            self.frames.append(data)
@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+"""
+Run a saved queue without the GUI, for machines that only encode.
+
+Nothing here, or anything it imports, may import PySide6.
+"""
+import argparse
+import json
+import logging
+import sys
+import time
+from pathlib import Path
+from queue import Empty, Queue
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastflix import segments
+from fastflix.cache import FileCache
+from fastflix.command_graph import all_finished, finish_command, ready_commands
+from fastflix.command_runner import BackgroundRunner, priority_levels
+from fastflix.exceptions import FlixError
+from fastflix.ff_queue import get_queue, save_queue
+from fastflix.first_pass import first_pass_cache, reuse_first_pass, store_first_pass
+from fastflix.models.config import Config
+from fastflix.models.video import Video
+from fastflix.queue_scheduler import policies, queue_order
+
+logger = logging.getLogger("fastflix-core")
+
+__all__ = ["QueueRunner", "parse_progress", "run_queue"]
+
+
+def parse_progress(line: str) -> Optional[dict]:
+    """The values of an ffmpeg status line such as 'frame=  240 fps= 48 q=28.0 size=  1024kB time=00:00:10.01 ...'"""
+    if not line.startswith("frame="):
+        return None
+    values = {}
+    progress = {}
+    try:
+        # Values can be padded after the equals sign, so pair each key with the first word that follows it
+        parts = [part.strip().split() for part in line.split("=")]
+        for (*_, key), (value, *_) in zip(parts, parts[1:]):
+            values[key] = value
+        if "frame" in values:
+            progress["frame"] = int(values["frame"])
+        if "fps" in values:
+            progress["fps"] = float(values["fps"])
+        if values.get("time", "N/A") != "N/A":
+            hours, minutes, seconds = values["time"].lstrip("-").split(":")
+            progress["time"] = round(int(hours) * 3600 + int(minutes) * 60 + float(seconds), 2)
+        if values.get("speed", "N/A") != "N/A":
+            progress["speed"] = float(values["speed"].rstrip("x"))
+    except ValueError:
+        return None
+    if values.get("bitrate", "N/A") != "N/A":
+        progress["bitrate"] = values["bitrate"]
+    return progress
+
+
+class Slot:
+    """One command running at a time, with its output"""
+
+    def __init__(self, priority: str):
+        self.log_queue = Queue()
+        self.runner = BackgroundRunner(log_queue=self.log_queue)
+        self.priority = priority
+        self.video: Optional[Video] = None
+        self.index: Optional[int] = None
+        self.last_progress = 0.0
+
+    def start(self, video: Video, index: int):
+        self.video = video
+        self.index = index
+        command = video.video_settings.conversion_commands[index]
+        video.status.running = True
+        self.runner.start_exec(command.command, work_dir=str(video.work_path))
+        self.runner.change_priority(self.priority)
+
+    def output(self) -> List[str]:
+        lines = []
+        while True:
+            try:
+                lines.extend(self.log_queue.get_nowait().splitlines())
+            except Empty:
+                return lines
+
+
+class QueueRunner:
+    """
+    Encodes every ready video of a queue, running up to `workers` commands at a time. A video's commands run
+    in order, except those that say they only depend on some of the commands before them, which can run
+    side by side with them when there are free workers.
+
+    The queue is saved after every finished command so another run, or the GUI, picks up where this one
+    stopped. Progress is handed to `emit` as plain dicts, each with an "event" of
+    start, progress, command_complete, complete, error or done.
+    Videos encoded in segments carry on from the first segment that is missing or incomplete.
+    Given a `cache`, two pass encodes skip any first pass already run for the same source and settings.
+    Which ready video starts next is up to the queue `policy`, see fastflix.queue_scheduler.
+    """
+
+    def __init__(
+        self,
+        queue: List[Video],
+        save: Callable[[List[Video]], None],
+        emit: Callable[[dict], None],
+        workers: int = 1,
+        ignore_errors: bool = False,
+        priority: str = "Normal",
+        progress_interval: float = 1,
+        poll: float = 0.1,
+        config: Optional[Config] = None,
+        cache: Optional[FileCache] = None,
+        policy: str = "fifo",
+    ):
+        self.queue = queue
+        self.save = save
+        self.emit = emit
+        self.config = config
+        self.cache = cache
+        self.policy = policy
+        self.slots = [Slot(priority) for _ in range(max(workers, 1))]
+        self.ignore_errors = ignore_errors
+        self.progress_interval = progress_interval
+        self.poll = poll
+        self.failed = False
+        self.stopped = False
+        # Anything marked as running belonged to a run that is no longer around
+        for video in queue:
+            video.status.running = False
+
+    def running(self, video: Video) -> List[int]:
+        return [slot.index for slot in self.slots if slot.video is video]
+
+    def next_command(self) -> Optional[Tuple[Video, int]]:
+        """The next command to start, those of videos that are already running come first"""
+        if self.stopped or (self.failed and not self.ignore_errors):
+            return None
+        for video in self.queue:
+            if video.status.running and not video.status.error:
+                if ready := ready_commands(video, self.running(video)):
+                    return video, ready[0]
+        running = [video for video in self.queue if self.running(video)]
+        for video in queue_order(self.queue, self.policy, running):
+            self.prepare(video)
+            if ready := ready_commands(video):
+                return video, ready[0]
+        return None
+
+    def prepare(self, video: Video):
+        segments.resume(video, self.config)
+        if self.cache is not None:
+            reuse_first_pass(video, self.cache)
+
+    def event(self, event: str, video: Video, index: Optional[int] = None, **extra):
+        commands = len(video.video_settings.conversion_commands)
+        self.emit(
+            {
+                "event": event,
+                "video": video.uuid,
+                "source": str(video.source),
+                "output": str(video.video_settings.output_path),
+                "command": min((video.status.current_command if index is None else index) + 1, commands),
+                "commands": commands,
+                **extra,
+            }
+        )
+
+    def start(self, slot: Slot, video: Video, index: int):
+        slot.start(video, index)
+        slot.last_progress = 0
+        self.event("start", video, index)
+
+    def report(self, slot: Slot):
+        for line in slot.output():
+            progress = parse_progress(line)
+            if not progress or time.monotonic() - slot.last_progress < self.progress_interval:
+                continue
+            slot.last_progress = time.monotonic()
+            duration = slot.video.duration
+            if progress.get("time") is not None and duration:
+                progress["percent"] = round(min(progress["time"] / duration * 100, 100), 1)
+            self.event("progress", slot.video, slot.index, **progress)
+
+    def finish(self, slot: Slot):
+        video, index = slot.video, slot.index
+        slot.video, slot.index = None, None
+        video.status.running = bool(self.running(video))
+        # The output reader can still be catching up when the process ends, so check its exit code as well
+        if slot.runner.error_detected or (slot.runner.process and slot.runner.process.returncode):
+            if not video.status.error:
+                video.status.error = True
+                self.failed = True
+                self.event("error", video, index)
+        elif not video.status.error:
+            if self.cache is not None:
+                store_first_pass(video, index, self.cache)
+            finish_command(video, index)
+            if not all_finished(video):
+                self.event("command_complete", video, index)
+            else:
+                video.status.complete = True
+                segments.cleanup(video)
+                self.event("complete", video)
+        self.save(self.queue)
+
+    def stop(self):
+        """Kill the running encodes, they start over from their current command next time"""
+        self.stopped = True
+        for slot in self.slots:
+            if slot.video:
+                slot.runner.kill()
+                slot.video.status.running = False
+                slot.video, slot.index = None, None
+        self.save(self.queue)
+
+    def run(self) -> bool:
+        """Returns if every video that was run completed"""
+        while True:
+            for slot in self.slots:
+                if slot.video:
+                    self.report(slot)
+                    if not slot.runner.is_alive():
+                        # Collect what was written before it exited
+                        self.report(slot)
+                        self.finish(slot)
+                if not slot.video and (command := self.next_command()):
+                    self.start(slot, *command)
+            if not any(slot.video for slot in self.slots):
+                break
+            time.sleep(self.poll)
+        counts = {
+            "complete": sum(1 for video in self.queue if video.status.complete),
+            "error": sum(1 for video in self.queue if video.status.error),
+            "remaining": sum(1 for video in self.queue if video.status.ready),
+        }
+        self.emit({"event": "done", **counts})
+        return not self.failed
+
+
+def run_queue(args: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="fastflix run-queue", description="Encode a FastFlix queue without the GUI")
+    parser.add_argument("--queue", type=Path, required=True, help="queue.yaml saved by FastFlix")
+    parser.add_argument("--workers", type=int, default=1, help="commands to run at the same time")
+    parser.add_argument("--ignore-errors", action="store_true", help="keep going after a video fails")
+    parser.add_argument("--priority", choices=list(priority_levels), default="Normal")
+    parser.add_argument("--policy", choices=policies, default="fifo", help="which ready video to encode next")
+    parser.add_argument("--verbose", action="store_true", help="log encoder output to stderr")
+    parser.add_argument("--portable", action="store_true", help="use the config and workspace of a portable FastFlix")
+    options = parser.parse_args(args)
+
+    logging.basicConfig(
+        level=logging.INFO if options.verbose else logging.WARNING,
+        stream=sys.stderr,
+        format="%(asctime)s %(levelname)s %(message)s",
+    )
+    if not options.queue.exists():
+        parser.error(f"{options.queue} does not exist")
+    queue = get_queue(options.queue)
+    # The same config the GUI uses, for its FFprobe and the first pass statistics it has kept in its work folder
+    config = Config()
+    try:
+        config.load(portable_mode=options.portable)
+    except FlixError as err:
+        parser.error(f"Could not load the FastFlix config: {err}")
+
+    def emit(event: Dict):
+        print(json.dumps(event), flush=True)
+
+    runner = QueueRunner(
+        queue,
+        save=lambda videos: save_queue(videos, options.queue),
+        emit=emit,
+        workers=options.workers,
+        ignore_errors=options.ignore_errors,
+        priority=options.priority,
+        config=config,
+        cache=first_pass_cache(config.work_path),
+        policy=options.policy,
+    )
+    try:
+        return 0 if runner.run() else 1
+    except KeyboardInterrupt:
+        runner.stop()
+        emit({"event": "stopped"})
+        return 130
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+ABR ladders, where one queue item encodes its main output along with smaller renditions of it.
+
+All of the outputs come from a single FFmpeg process, so the source is decoded and run through the
+crop, de-interlace and tone map filters once before being split into the size of each rendition.
+Renditions are written next to the main output with their height added to the name, `movie_720p.mkv`,
+so each height can only be in the ladder once. Renditions taller than the source are left out rather than upscaled.
+"""
+import logging
+import re
+from pathlib import Path
+from types import ModuleType
+from typing import List, Optional
+
+from fastflix import segments
+from fastflix.encoders.common.helpers import Command
+from fastflix.models.fastflix import FastFlix
+from fastflix.models.video import Rendition, Video
+from fastflix.paths import clean_file_string
+from fastflix.sample_encode import apply_rate, rate_control
+
+logger = logging.getLogger("fastflix")
+
+__all__ = ["build", "ladder_text", "parse_ladder", "rendition_path"]
+
+# Encoders that are not FFmpeg's, or can not take a split of the filtered video as their input
+unsupported_encoders = ("GIF", "WebP", "Copy", "Modify", "AVIF (SVT AV1)")
+rendition_re = re.compile(r"^(\d+)p?\s+(\d+(?:\.\d+)?)([kKmM]?)$")
+
+
+def parse_ladder(text: str) -> List[Rendition]:
+    """Renditions from text such as "720p 24, 480p 1500k", a plain number is a quality value and k or M a bitrate"""
+    renditions = []
+    for item in filter(None, (part.strip() for part in text.split(","))):
+        match = rendition_re.match(item)
+        if not match:
+            logger.warning(f"Invalid rendition {item!r}, expected a height and a quality or bitrate like 720p 24")
+            continue
+        height, value, unit = match.groups()
+        if any(rendition.height == int(height) for rendition in renditions):
+            logger.warning(f"Skipping rendition {item!r}, there is already a {height}p rendition")
+            continue
+        if unit:
+            renditions.append(Rendition(height=int(height), bitrate=f"{value}{unit.lower() if unit in 'kK' else 'M'}"))
+        else:
+            quality = float(value)
+            renditions.append(Rendition(height=int(height), quality=int(quality) if quality.is_integer() else quality))
+    return renditions
+
+
+def ladder_text(renditions: List[Rendition]) -> str:
+    return ", ".join(f"{rendition.height}p {rendition.bitrate or f'{rendition.quality:g}'}" for rendition in renditions)
+
+
+def rendition_path(output_path: Path, height: int) -> Path:
+    return output_path.with_name(f"{output_path.stem}_{height}p{output_path.suffix}")
+
+
+def source_height(video: Video) -> int:
+    """Height of the video before it is scaled, after any crop and rotation, 0 if it is not known"""
+    crop = video.video_settings.crop
+    if crop and crop.height:
+        width, height = crop.width, crop.height
+    elif not video.streams:
+        return 0
+    else:
+        try:
+            width, height = video.width, video.height
+        except (AttributeError, KeyError):
+            return 0
+    return width if video.video_settings.rotate in (1, 3) else height
+
+
+def usable_renditions(video: Video) -> List[Rendition]:
+    """The ladder without repeated heights, which would write the same file, or heights that need upscaling"""
+    tallest = source_height(video)
+    renditions = []
+    for rendition in video.video_settings.ladder:
+        if any(kept.height == rendition.height for kept in renditions):
+            logger.warning(f"{video.source.name}: skipping the repeated {rendition.height}p rendition")
+        elif tallest and rendition.height > tallest:
+            logger.warning(f"{video.source.name}: skipping the {rendition.height}p rendition, the source is {tallest}p")
+        else:
+            renditions.append(rendition)
+    return renditions
+
+
+def unladderable(video: Video) -> Optional[str]:
+    """Why the video's ladder can not be encoded, if it can't"""
+    encoder_settings = video.video_settings.video_encoder_settings
+    if encoder_settings.name in unsupported_encoders or encoder_settings.name.startswith("VAAPI"):
+        return f"not {encoder_settings.name}"
+    if not video.video_settings.output_path:
+        return "an output file"
+    if any(rendition.quality is not None for rendition in video.video_settings.ladder) and not rate_control(
+        encoder_settings
+    ):
+        return f"bitrates for {encoder_settings.name}, it has no quality value to set"
+    return None
+
+
+def build(fastflix: FastFlix, encoder: ModuleType) -> List[Command]:
+    """
+    The encoder's commands for the current video, with every rendition of its ladder added as another output
+    of each command. Videos without a ladder, or whose ladder can't be encoded, are built as usual.
+    """
+    video = fastflix.current_video
+    renditions = usable_renditions(video)
+    if not renditions:
+        return segments.build(fastflix, encoder)
+    if reason := unladderable(video):
+        logger.warning(f"Encoding {video.source.name} without its renditions, ABR ladders need {reason}")
+        return segments.build(fastflix, encoder)
+    if video.video_settings.segment_length:
+        logger.warning(f"Encoding {video.source.name} in one piece, ABR ladders are not split into segments")
+
+    outputs = []
+    for i, rendition in enumerate([None, *renditions]):
+        part = video.model_copy(deep=True)
+        part.video_settings.ladder = [rendition.model_copy() for rendition in renditions]
+        part.video_settings.ladder_output = i
+        if rendition:
+            part.video_settings.output_path = rendition_path(video.video_settings.output_path, rendition.height)
+            if rendition.quality is not None:
+                apply_rate(part, rendition.quality)
+            elif rendition.bitrate:
+                part.video_settings.video_encoder_settings.bitrate = rendition.bitrate
+        outputs.append(encoder.build(fastflix=fastflix.model_copy(update={"current_video": part})))
+
+    # Each output's options start after the input, the first output also carries the filter graph they all share
+    source_input = f'-i "{clean_file_string(video.source)}"'
+    if any(command.exe != "ffmpeg" or source_input not in command.command for command in sum(outputs, [])):
+        logger.warning(f"Encoding {video.source.name} without its renditions, ABR ladders need an FFmpeg encoder")
+        return encoder.build(fastflix=fastflix)
+    passes = len(outputs[0])
+    if any(len(commands) != passes for commands in outputs):
+        logger.warning(
+            f"Encoding {video.source.name} without its renditions, "
+            "they have to use the same rate control mode and passes as the main output"
+        )
+        return encoder.build(fastflix=fastflix)
+
+    return [
+        Command(
+            command=" ".join(
+                [
+                    outputs[0][step].command,
+                    *(commands[step].command.partition(source_input)[2] for commands in outputs[1:]),
+                ]
+            ),
+            name=f"{outputs[0][step].name}, {len(outputs)} renditions",
+            exe="ffmpeg",
+        )
+        for step in range(passes)
+    ]
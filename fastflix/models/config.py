@@ -168,6 +168,17 @@ class Config(BaseModel):
 
     disable_cover_extraction: bool = False
 
+    # Megabytes of rendered preview thumbnails to keep in the work path
+    thumbnail_cache_size: int = 100
+    # Keep an ffmpeg process decoding the keyframes of the loaded source for instant preview scrubbing
+    preview_frame_server: bool = False
+    # Encode a few short samples of each queued video to predict its output size and encoding time
+    queue_estimates: bool = True
+    # Which ready video of the queue is encoded next: fifo, shortest, deadline or best-fit
+    queue_policy: str = "fifo"
+    # Directories whose new videos are added to the queue on their own, mapped to the profile to use for them
+    watch_folders: dict = Field(default_factory=dict)
+
     def encoder_opt(self, profile_name, profile_option_name):
         encoder_settings = getattr(self.profiles[self.selected_profile], profile_name)
         if encoder_settings:
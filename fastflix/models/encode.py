@@ -6,6 +6,16 @@ from pydantic import BaseModel, Field, field_validator, ConfigDict
 from box import Box
 
 
+class LoudnessMeasurement(BaseModel):
+    """First pass EBU R128 measurements of a track, as reported by ffmpeg's loudnorm filter"""
+
+    input_i: float
+    input_tp: float
+    input_lra: float
+    input_thresh: float
+    target_offset: float = 0
+
+
 class AudioTrack(BaseModel):
     index: int
     outdex: int
@@ -23,6 +33,8 @@ class AudioTrack(BaseModel):
     friendly_info: str = ""
     raw_info: Optional[Union[dict, Box]] = None
     dispositions: dict = Field(default_factory=dict)
+    normalize: bool = False
+    loudness: Optional[LoudnessMeasurement] = None
 
     model_config = ConfigDict(arbitrary_types_allowed=True)
 
@@ -599,6 +611,8 @@ class GIFSettings(EncoderSettings):
     dither: str = "sierra2_4a"
     max_colors: str = "256"
     stats_mode: str = "full"
+    # Opt in, as with the full statistics mode every frame is held in memory until the palette is done
+    single_pass: bool = False
 
     @field_validator("fps", mode="before")
     @classmethod
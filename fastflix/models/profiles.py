@@ -1,6 +1,6 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-from typing import Optional, Union
+from typing import List, Optional, Union
 
 from pydantic import field_validator, BaseModel, Field
 from enum import Enum
@@ -35,6 +35,7 @@ from fastflix.models.encode import (
     VAAPIVP9Settings,
     VAAPIMPEG2Settings,
 )
+from fastflix.models.video import Rendition
 
 
 __all__ = ["MatchItem", "MatchType", "AudioMatch", "Profile", "SubtitleMatch", "AdvancedOptions"]
@@ -121,6 +122,10 @@ class AdvancedOptions(BaseModel):
     denoise: Optional[str] = None
     denoise_type_index: int = 0
     denoise_strength_index: int = 0
+    target_quality: Optional[float] = None
+    target_quality_metric: str = "vmaf"
+    segment_length: Optional[int] = None
+    ladder: List[Rendition] = Field(default_factory=list)
 
 
 class Profile(BaseModel):
@@ -1,5 +1,7 @@
 # -*- coding: utf-8 -*-
+import bisect
 import uuid
+from datetime import datetime
 from pathlib import Path
 from typing import List, Optional, Union, Tuple
 
@@ -40,7 +42,7 @@ from fastflix.models.encode import (
     ModifySettings,
 )
 
-__all__ = ["VideoSettings", "Status", "Video", "Crop", "Status"]
+__all__ = ["VideoSettings", "Status", "Video", "Crop", "Status", "EncodeEstimate", "ConcatIndex"]
 
 
 def determine_rotation(streams, track: int = 0) -> Tuple[int, int]:
@@ -75,6 +77,14 @@ class Crop(BaseModel):
     height: int = 0
 
 
+class Rendition(BaseModel):
+    """An extra, smaller output of an ABR ladder, encoded from the same decode as the main output"""
+
+    height: int
+    quality: Optional[Union[int, float]] = None
+    bitrate: Optional[str] = None
+
+
 class VideoSettings(BaseModel):
     crop: Optional[Crop] = None
     start_time: Union[float, int] = 0
@@ -111,6 +121,12 @@ class VideoSettings(BaseModel):
     contrast: Optional[str] = None
     saturation: Optional[str] = None
     copy_data: bool = False
+    target_quality: Optional[float] = None
+    target_quality_metric: str = "vmaf"
+    segment_length: Optional[int] = None
+    ladder: List[Rendition] = Field(default_factory=list)
+    # Only set on the copies a ladder command is built from, which of its outputs the command is for
+    ladder_output: Optional[int] = None
     video_encoder_settings: Optional[
         Union[
             x265Settings,
@@ -176,12 +192,29 @@ class Status(BaseModel):
     complete: bool = False
     running: bool = False
     cancelled: bool = False
+    searching: bool = False
+    analyzing: bool = False
     subtitle_fixed: bool = False
     current_command: int = 0
+    # Commands after the current one that have finished, when they can run out of order
+    finished_commands: List[str] = Field(default_factory=list)
 
     @property
     def ready(self) -> bool:
-        return not self.success and not self.error and not self.complete and not self.running and not self.cancelled
+        return (
+            not self.success
+            and not self.error
+            and not self.complete
+            and not self.running
+            and not self.cancelled
+            and not self.searching
+            and not self.analyzing
+        )
+
+    @property
+    def preparing(self) -> bool:
+        """Still being measured or searched before it can be encoded"""
+        return self.searching or self.analyzing
 
     def clear(self):
         self.success = False
@@ -191,6 +224,51 @@ class Status(BaseModel):
         self.cancelled = False
         self.subtitle_fixed = False
         self.current_command = 0
+        self.finished_commands = []
+
+
+class EncodeEstimate(BaseModel):
+    """Predicted output size (bytes) and encoding time (seconds), with their 95% confidence bounds"""
+
+    size: int
+    size_low: int
+    size_high: int
+    seconds: float
+    seconds_low: float
+    seconds_high: float
+    samples: int = 0
+
+
+class ConcatIndex(BaseModel):
+    """Where each file of a concat list sits on the timeline of the whole list"""
+
+    files: List[str] = Field(default_factory=list)
+    durations: List[float] = Field(default_factory=list)
+    # Start time of each file within the whole list
+    offsets: List[float] = Field(default_factory=list)
+
+    @classmethod
+    def from_durations(cls, files: List[Union[Path, str]], durations: List[float]) -> "ConcatIndex":
+        offsets, total = [], 0.0
+        for duration in durations:
+            offsets.append(total)
+            total += duration
+        return cls(files=[str(x) for x in files], durations=durations, offsets=offsets)
+
+    @property
+    def duration(self) -> float:
+        return self.offsets[-1] + self.durations[-1] if self.files else 0
+
+    def locate(self, timestamp: float) -> Tuple[Path, float]:
+        """The file playing at a time on the timeline of the whole list, and the time within that file"""
+        index = max(bisect.bisect_right(self.offsets, timestamp) - 1, 0)
+        return Path(self.files[index]), min(max(timestamp - self.offsets[index], 0), self.durations[index])
+
+    def locate_fraction(self, fraction: float) -> Tuple[Path, float]:
+        """As locate, for a fraction of the way through the list, still picks a file for lists of still images"""
+        if self.duration:
+            return self.locate(fraction * self.duration)
+        return Path(self.files[min(int(fraction * len(self.files)), len(self.files) - 1)]), 0
 
 
 class Video(BaseModel):
@@ -202,6 +280,7 @@ class Video(BaseModel):
     format: Box = None
     interlaced: Union[str, bool] = False
     concat: bool = False
+    concat_index: Optional[ConcatIndex] = None
 
     hdr10_streams: list[Box] = Field(default_factory=list)
     hdr10_plus: list[int] = Field(default_factory=list)
@@ -212,6 +291,10 @@ class Video(BaseModel):
     attachment_tracks: list[AttachmentTrack] = Field(default_factory=list)
 
     status: Status = Field(default_factory=Status)
+    estimate: Optional[EncodeEstimate] = None
+    # Queue order, higher priority classes go first and a deadline asks to be done by then
+    priority: int = 0
+    deadline: Optional[datetime] = None
     uuid: str = Field(default_factory=lambda: str(uuid.uuid4()))
 
     @property
@@ -0,0 +1,36 @@
+# -*- coding: utf-8 -*-
+import logging
+
+import reusables
+from pathvalidate import sanitize_filepath
+
+logger = logging.getLogger("fastflix")
+
+__all__ = ["clean_file_string", "quoted_path", "sanitize"]
+
+
+def clean_file_string(source):
+    return str(source).strip().strip("'\"")
+
+
+def quoted_path(source):
+    cleaned_string = (
+        str(source)
+        .strip()
+        .replace("\\", "\\\\")
+        .replace(":", "\\:")
+        .replace("'", "'\\\\\\''")
+        .replace("\r\n", "")
+        .replace("\n", "")
+        .replace("\r", "")
+    )
+    if " " in cleaned_string[0:4]:
+        logger.warning(f"Unexpected space at start of quoted path, attempting to fix: {cleaned_string}")
+        cleaned_string = cleaned_string[0:4].replace(" ", "") + cleaned_string[4:]
+        logger.warning(f"New path set to: {cleaned_string}")
+    return cleaned_string
+
+
+def sanitize(source):
+    return str(sanitize_filepath(source, platform="Windows" if reusables.win_based else "Linux"))
+    # return str().replace("\\", "/")
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+import datetime
+import logging
+import secrets
+from pathlib import Path
+from types import SimpleNamespace
+from typing import List, Optional
+
+from box import Box
+from iso639.exceptions import InvalidLanguageValue
+
+from fastflix import ladder
+from fastflix.audio_processing import apply_audio_filters
+from fastflix.cache import FileCache
+from fastflix.exceptions import FlixError
+from fastflix.flix import (
+    auto_crop_times,
+    clean_file_string,
+    cover_attachments,
+    denoise_presets,
+    detect_hdr10_plus,
+    detect_interlaced,
+    extract_attachments,
+    ffmpeg_valid_color_primaries,
+    ffmpeg_valid_color_space,
+    ffmpeg_valid_color_transfers,
+    get_auto_crop,
+    parse,
+    parse_hdr_details,
+    select_auto_crop,
+    subtitle_types,
+)
+from fastflix.language import Language, t
+from fastflix.models.config import Config
+from fastflix.models.encode import AttachmentTrack, AudioTrack, SubtitleTrack, setting_types
+from fastflix.models.fastflix import FastFlix
+from fastflix.models.profiles import Profile
+from fastflix.models.video import Crop, Video, VideoSettings
+
+logger = logging.getLogger("fastflix")
+
+__all__ = ["analyze", "apply_profile", "build_video", "output_name"]
+
+denoise_strengths = ["weak", "moderate", "strong"]
+
+
+def output_name(config: Config, source: Path) -> str:
+    """Output file name, without directory or extension, from the configured name format"""
+    return (config.output_name_format or "{source}-fastflix-{rand_4}").format(
+        source=source.stem,
+        datetime=datetime.datetime.now().isoformat().replace(":", "-").split(".")[0],
+        rand_4=secrets.token_hex(2),
+        rand_8=secrets.token_hex(4),
+        ext="",
+    )
+
+
+def analyze(
+    fastflix: FastFlix,
+    source: Path,
+    work_path: Path,
+    profile: Profile,
+    attachment_cache: Optional[FileCache] = None,
+    details: Optional[Box] = None,
+) -> Video:
+    """
+    Everything read from a new source before any settings are applied, the same as loading it in the GUI:
+    probe, HDR details, HDR10+ and interlace detection, auto crop when the profile asks for it, and cover images.
+    The probe is skipped when its FFprobe output is given as details.
+    """
+    video = Video(source=source, work_path=work_path)
+    # The detection tasks only use app.fastflix, so each source gets its own copy to fill in
+    app = SimpleNamespace(fastflix=fastflix.model_copy(update={"current_video": video}))
+    config = fastflix.config
+    parse(app, details=details)
+    parse_hdr_details(app)
+    detect_hdr10_plus(app, config)
+    material = Path(video.concat_index.files[0]) if video.concat_index else video.source
+    if not config.disable_deinterlace_check:
+        detect_interlaced(app, config, source=material)
+    if profile.auto_crop:
+        video.video_settings.crop = auto_crop(config, video)
+    if not config.disable_cover_extraction and (covers := cover_attachments(video.streams)):
+        extract_attachments(config.ffmpeg, material, covers, work_path, cache=attachment_cache)
+    return video
+
+
+def auto_crop(config: Config, video: Video) -> Optional[Crop]:
+    result_list = []
+    for timestamp in auto_crop_times(video.duration, config.crop_detect_points):
+        source, start_time = video.concat_index.locate(timestamp) if video.concat_index else (video.source, timestamp)
+        get_auto_crop(
+            config,
+            source=source,
+            video_width=video.width,
+            video_height=video.height,
+            input_track=video.video_settings.selected_track,
+            start_time=start_time,
+            result_list=result_list,
+        )
+    selected = select_auto_crop(result_list, video.width, video.height)
+    if not selected or not sum(selected):
+        return None
+    right, bottom, left, top = selected
+    return Crop(
+        top=top,
+        left=left,
+        right=right,
+        bottom=bottom,
+        width=video.width - right - left,
+        height=video.height - bottom - top,
+    )
+
+
+def encoder_settings(profile: Profile, encoder_name: str):
+    for profile_name, settings_type in setting_types.items():
+        if settings_type.model_fields["name"].default == encoder_name:
+            settings = getattr(profile, profile_name, None) or settings_type()
+            return settings.model_copy(deep=True)
+    raise FlixError(f"{t('No settings available for encoder')} {encoder_name}")
+
+
+def source_hdr10(settings, video: Video):
+    """As the x265 panel does, the HDR10 options follow the source instead of the profile"""
+    if not hasattr(settings, "hdr10"):
+        return
+    hdr10 = (
+        not video.video_settings.remove_hdr
+        and not settings.pix_fmt.endswith("p")
+        and video.color_space.startswith("bt2020")
+        and bool(video.master_display or video.cll)
+    )
+    settings.hdr10 = settings.hdr10_opt = settings.repeat_headers = hdr10
+
+
+def unset(value: Optional[str]) -> Optional[str]:
+    if not value or value.lower() in ("none", "unspecified"):
+        return None
+    return value
+
+
+def number_string(value: Optional[str]) -> Optional[str]:
+    try:
+        return str(float(value)) if value and value.strip() else None
+    except ValueError:
+        logger.warning(f"Invalid number {value}")
+        return None
+
+
+def tag(tags: dict, name: str) -> str:
+    return next((v for k, v in tags.items() if k.lower() == name), "")
+
+
+def video_settings(video: Video, profile: Profile, output_path: Path) -> VideoSettings:
+    advanced = profile.advanced_options
+    denoise = None
+    if advanced.denoise_type_index:
+        denoise = list(denoise_presets.values())[advanced.denoise_type_index - 1][
+            denoise_strengths[advanced.denoise_strength_index]
+        ]
+    has_rate_limit = bool(advanced.maxrate and advanced.bufsize)
+    return VideoSettings(
+        crop=video.video_settings.crop,
+        selected_track=video.video_settings.selected_track,
+        deinterlace=video.video_settings.deinterlace,
+        resolution_method=profile.resolution_method,
+        resolution_custom=profile.resolution_custom,
+        fast_seek=profile.fast_seek,
+        rotate=profile.rotate,
+        vertical_flip=profile.vertical_flip,
+        horizontal_flip=profile.horizontal_flip,
+        output_path=output_path,
+        remove_metadata=profile.remove_metadata,
+        copy_chapters=profile.copy_chapters,
+        remove_hdr=profile.remove_hdr,
+        video_title=tag(video.format.get("tags", {}), "title"),
+        video_track_title=tag(video.streams.video[0].get("tags", {}), "title"),
+        video_speed=advanced.video_speed,
+        deblock=unset(advanced.deblock),
+        deblock_size=advanced.deblock_size,
+        tone_map=advanced.tone_map,
+        vsync=unset(advanced.vsync),
+        brightness=number_string(advanced.brightness),
+        saturation=number_string(advanced.saturation),
+        contrast=number_string(advanced.contrast),
+        maxrate=advanced.maxrate if has_rate_limit else None,
+        bufsize=advanced.bufsize if has_rate_limit else None,
+        source_fps=advanced.source_fps or None,
+        output_fps=advanced.output_fps or None,
+        denoise=denoise,
+        color_primaries=advanced.color_primaries
+        or (video.color_primaries if video.color_primaries in ffmpeg_valid_color_primaries else None),
+        color_transfer=advanced.color_transfer
+        or (video.color_transfer if video.color_transfer in ffmpeg_valid_color_transfers else None),
+        color_space=advanced.color_space
+        or (video.color_space if video.color_space in ffmpeg_valid_color_space else None),
+        target_quality=advanced.target_quality,
+        target_quality_metric=advanced.target_quality_metric,
+        segment_length=advanced.segment_length,
+        ladder=[rendition.model_copy() for rendition in advanced.ladder],
+    )
+
+
+def audio_track(stream: Box, outdex: int, **kwargs) -> AudioTrack:
+    tags = stream.get("tags", {})
+    friendly_info = f"{tags.get('title', '')} - {stream.codec_name}"
+    if "profile" in stream:
+        friendly_info += f" ({stream.profile})"
+    friendly_info += f" - {stream.channels} {t('channels')}"
+    return AudioTrack(
+        index=stream.index,
+        outdex=outdex,
+        title=tags.get("title", ""),
+        language=tags.get("language", ""),
+        profile=stream.get("profile"),
+        channels=stream.channels,
+        raw_info=stream,
+        friendly_info=friendly_info,
+        dispositions={k: bool(v) for k, v in stream.get("disposition", {}).items()},
+        **kwargs,
+    )
+
+
+def audio_tracks(video: Video, profile: Profile, original_only: bool = False) -> List[AudioTrack]:
+    """The audio panel's selection: every track when the profile has no filters, otherwise only the matching ones"""
+    tracks = [audio_track(stream, i, original=True) for i, stream in enumerate(video.streams.audio, start=1)]
+    if not (isinstance(profile.audio_filters, list) or profile.audio_filters is False):
+        return tracks
+    for track in tracks:
+        track.enabled = False
+
+    matches = apply_audio_filters(profile.audio_filters, original_tracks=video.streams.audio)
+    if profile.audio_filters is not False and tracks and not matches:
+        logger.warning(f"{t('No audio tracks matched for this profile, enable first track?')} {video.source}")
+        tracks[0].enabled = True
+        return tracks
+
+    originals = {track.index: track for track in tracks}
+    current_id = -1
+    for stream, match in matches:
+        # The first match of each source track sets up that track, any more matches add copies of it
+        if stream.index > current_id:
+            current_id = stream.index
+            track = originals[stream.index]
+            track.enabled = True
+        elif original_only:
+            continue
+        else:
+            track = audio_track(stream, len(tracks) + 1)
+            tracks.append(track)
+        if match.conversion:
+            track.conversion_codec = match.conversion
+        if match.bitrate:
+            track.conversion_bitrate = match.bitrate
+        if match.downmix:
+            track.downmix = match.downmix
+    return tracks
+
+
+def subtitle_tracks(video: Video, profile: Profile, config: Config) -> List[SubtitleTrack]:
+    """The subtitle panel's selection, from the subtitle options of the profile"""
+    first_selected = False
+
+    def lang_match(language: str, ignore_first: bool = False) -> bool:
+        nonlocal first_selected
+        if not profile.subtitle_select:
+            return False
+        if profile.subtitle_select_preferred_language:
+            try:
+                if Language(profile.subtitle_language) != Language(language):
+                    return False
+            except InvalidLanguageValue:
+                return True
+        if not ignore_first and profile.subtitle_select_first_matching and first_selected:
+            return False
+        first_selected = True
+        return True
+
+    tracks = []
+    for i, stream in enumerate(video.streams.subtitle):
+        subtitle_type = subtitle_types.get(stream.get("codec_name", "text"), "text")
+        tracks.append(
+            SubtitleTrack(
+                index=stream.index,
+                outdex=len(video.audio_tracks) + i + 1,
+                dispositions={k: bool(v) for k, v in stream.get("disposition", {}).items()},
+                language=stream.get("tags", {}).get("language", ""),
+                subtitle_type=subtitle_type,
+                enabled=lang_match(stream.get("tags", {}).get("language", "")),
+                long_name=stream.get("codec_long_name", f"{t('Subtitle Type')}:{subtitle_type}"),
+                raw_info=stream,
+            )
+        )
+
+    if profile.subtitle_automatic_burn_in and not config.disable_automatic_subtitle_burn_in:
+        for track in tracks:
+            if (track.dispositions.get("forced") or track.dispositions.get("default")) and lang_match(
+                track.language, ignore_first=True
+            ):
+                track.burn_in = True
+                break
+    return tracks
+
+
+def cover_tracks(video: Video) -> List[AttachmentTrack]:
+    """Covers of the source that were extracted to the work path are passed through, as the cover panel does"""
+    covers = {file_name.rsplit(".", 1)[0]: (index, file_name) for index, file_name in cover_attachments(video.streams)}
+    attachments = []
+    for name in ("cover", "cover_land", "small_cover", "small_cover_land"):
+        if name not in covers or not (video.work_path / covers[name][1]).exists():
+            continue
+        attachments.append(
+            AttachmentTrack(
+                index=covers[name][0],
+                outdex=0,
+                file_path=str(video.work_path / covers[name][1]),
+                filename=name,
+                attachment_type="cover",
+            )
+        )
+    return attachments
+
+
+def apply_profile(fastflix: FastFlix, video: Video, profile: Profile, output_path: Optional[Path] = None) -> Video:
+    """
+    Fill in the settings, tracks and conversion commands of an analyzed video from a profile,
+    following what the panels do when the same profile is selected in the GUI
+    """
+    if profile.encoder not in fastflix.encoders:
+        raise FlixError(f"{t('Encoder')} {profile.encoder} {t('is not available')}")
+    encoder = fastflix.encoders[profile.encoder]
+    if video.concat and not getattr(encoder, "enable_concat", False):
+        raise FlixError(f"{encoder.name} {t('does not support concatenating files together')}")
+
+    if not output_path:
+        extension = profile.output_type if profile.output_type in encoder.video_extensions else None
+        output_path = Path(
+            clean_file_string(
+                Path(
+                    fastflix.config.output_directory or video.source.parent,
+                    f"{output_name(fastflix.config, video.source)}{extension or encoder.video_extensions[0]}",
+                )
+            )
+        )
+
+    video.video_settings = video_settings(video, profile, output_path)
+    video.video_settings.video_encoder_settings = encoder_settings(profile, encoder.name)
+    source_hdr10(video.video_settings.video_encoder_settings, video)
+
+    video.audio_tracks = []
+    video.subtitle_tracks = []
+    video.attachment_tracks = []
+    if getattr(encoder, "enable_audio", False):
+        video.audio_tracks = audio_tracks(video, profile, getattr(encoder, "original_audio_tracks_only", False))
+    if getattr(encoder, "enable_subtitles", False):
+        video.subtitle_tracks = subtitle_tracks(video, profile, fastflix.config)
+        if any(track.burn_in for track in video.subtitle_tracks):
+            # Burning in subtitles needs an exact seek
+            video.video_settings.fast_seek = False
+    if getattr(encoder, "enable_attachments", False):
+        video.attachment_tracks = cover_tracks(video)
+
+    outdex = 1
+    for track in [*video.audio_tracks, *video.subtitle_tracks]:
+        if track.enabled:
+            track.outdex = outdex
+            outdex += 1
+    for track in video.attachment_tracks:
+        track.outdex = outdex
+        outdex += 1
+
+    video.video_settings.conversion_commands = ladder.build(
+        fastflix.model_copy(update={"current_video": video}), encoder
+    )
+    return video
+
+
+def build_video(
+    fastflix: FastFlix,
+    source: Path,
+    profile: Profile,
+    work_path: Path,
+    attachment_cache: Optional[FileCache] = None,
+    details: Optional[Box] = None,
+) -> Video:
+    """A queue ready video for a source and profile, without any widgets involved"""
+    video = analyze(fastflix, source, work_path, profile, attachment_cache=attachment_cache, details=details)
+    return apply_profile(fastflix, video, profile)
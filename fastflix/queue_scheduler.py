@@ -0,0 +1,73 @@
+# -*- coding: utf-8 -*-
+"""
+Which ready video of the queue is encoded next.
+
+Videos of a higher priority class always go before those of a lower one, the policy orders them within it:
+
+* fifo - in queue order
+* shortest - the shortest expected encode first, so quick clips are not stuck behind feature films
+* deadline - the earliest deadline first, then those without one in queue order
+* best-fit - while other videos are encoding, the longest that should be done before they all are,
+  so a free worker is kept busy without holding up the end of the run, otherwise in queue order
+
+How long an encode takes is taken from the queue estimates when every video being compared has one,
+and from the length of video to encode when they do not.
+"""
+import logging
+from typing import Callable, Dict, List, Optional, Sequence
+
+from fastflix.models.video import Video
+
+logger = logging.getLogger("fastflix")
+
+__all__ = ["next_video", "policies", "priority_classes", "queue_order"]
+
+policies = ("fifo", "shortest", "deadline", "best-fit")
+priority_classes = {"Low": -1, "Normal": 0, "High": 1, "Urgent": 2}
+
+
+def encode_length(video: Video) -> float:
+    """Seconds of video the encode covers"""
+    end = video.video_settings.end_time or video.duration
+    return max(end - video.video_settings.start_time, 0)
+
+
+def expected_seconds(videos: Sequence[Video]) -> Callable[[Video], float]:
+    if videos and all(video.estimate for video in videos):
+        return lambda video: video.estimate.seconds
+    return encode_length
+
+
+def remaining_seconds(video: Video, expected: Callable[[Video], float]) -> float:
+    commands = len(video.video_settings.conversion_commands) or 1
+    return expected(video) * max(commands - video.status.current_command, 0) / commands
+
+
+def queue_order(videos: Sequence[Video], policy: str = "fifo", running: Sequence[Video] = ()) -> List[Video]:
+    """The ready videos in the order they should start, given those already encoding"""
+    if policy not in policies:
+        logger.warning(f"Unknown queue policy {policy!r}, encoding in queue order")
+        policy = "fifo"
+    ready = [video for video in videos if video.status.ready]
+    expected = expected_seconds([*ready, *running])
+    position: Dict[str, int] = {video.uuid: i for i, video in enumerate(ready)}
+
+    horizon = None
+    if policy == "best-fit" and running:
+        horizon = max(remaining_seconds(video, expected) for video in running)
+
+    def policy_order(video: Video) -> tuple:
+        if policy == "shortest":
+            return (expected(video),)
+        if policy == "deadline":
+            return (video.deadline is None, video.deadline.timestamp() if video.deadline else 0)
+        if horizon is not None:
+            return (0, -expected(video)) if expected(video) <= horizon else (1, 0)
+        return ()
+
+    return sorted(ready, key=lambda video: (-video.priority, *policy_order(video), position[video.uuid]))
+
+
+def next_video(videos: Sequence[Video], policy: str = "fifo", running: Sequence[Video] = ()) -> Optional[Video]:
+    order = queue_order(videos, policy, running)
+    return order[0] if order else None
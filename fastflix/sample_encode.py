@@ -0,0 +1,542 @@
+# -*- coding: utf-8 -*-
+import logging
+import re
+import shlex
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from fractions import Fraction
+from pathlib import Path
+from subprocess import DEVNULL, PIPE
+from typing import Callable, Dict, List, NamedTuple, Optional, Union
+
+from psutil import Popen
+from pydantic import BaseModel, Field
+
+from fastflix.cache import cache_key, source_identity
+from fastflix.encoders.common.helpers import Command, generate_filters
+from fastflix.exceptions import FastFlixInternalException
+from fastflix.models.encode import AOMAV1Settings, SVTAV1Settings, VP9Settings, x264Settings, x265Settings
+from fastflix.models.fastflix import FastFlix
+from fastflix.models.video import EncodeEstimate, Video
+from fastflix.paths import clean_file_string
+
+logger = logging.getLogger("fastflix")
+
+__all__ = [
+    "SampleWindow",
+    "SampleResult",
+    "QualityReport",
+    "TargetQualityResult",
+    "sample_windows",
+    "quality_check",
+    "rate_control",
+    "apply_rate",
+    "target_quality_search",
+    "estimate_encode",
+]
+
+ssim_re = re.compile(r"SSIM .*All:\s*([\d.]+)")
+psnr_re = re.compile(r"PSNR .*average:\s*([\d.]+|inf)")
+vmaf_re = re.compile(r"VMAF score[:=]\s*([\d.]+)")
+
+metric_filters = {"vmaf": "libvmaf", "ssim": "ssim", "psnr": "psnr"}
+
+# Two sided 95% Student's t values by degrees of freedom, the sample counts used here are far too small for 1.96
+t_values = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365, 8: 2.306, 9: 2.262}
+
+
+class RateControl(NamedTuple):
+    attribute: str
+    low: int
+    high: int
+
+
+# Constant quality modes that can be searched, lower values are always higher quality
+rate_controls = {
+    x264Settings: RateControl("crf", 1, 51),
+    x265Settings: RateControl("crf", 1, 51),
+    SVTAV1Settings: RateControl("qp", 1, 63),
+    AOMAV1Settings: RateControl("crf", 1, 63),
+    VP9Settings: RateControl("crf", 1, 63),
+}
+
+
+class SampleWindow(BaseModel):
+    index: int
+    start: float
+    duration: float
+
+
+class SampleResult(BaseModel):
+    window: SampleWindow
+    output: Path
+    encode_seconds: float = 0
+    frames: int = 0
+    size: int = 0
+    ssim: Optional[float] = None
+    psnr: Optional[float] = None
+    vmaf: Optional[float] = None
+    error: Optional[str] = None
+
+    @property
+    def fps(self) -> float:
+        return self.frames / self.encode_seconds if self.encode_seconds else 0
+
+    @property
+    def bitrate(self) -> float:
+        """Bits per second of the encoded sample"""
+        return self.size * 8 / self.window.duration if self.window.duration else 0
+
+
+class TargetQualityResult(BaseModel):
+    metric: str
+    target: float
+    value: Union[int, float]
+    score: Optional[float] = None
+    scores: Dict[int, float] = Field(default_factory=dict)
+
+    @property
+    def reached(self) -> bool:
+        return self.score is not None and self.score >= self.target
+
+
+class QualityReport(BaseModel):
+    samples: List[SampleResult] = Field(default_factory=list)
+    wall_seconds: float = 0
+
+    @property
+    def successful(self) -> List[SampleResult]:
+        return [x for x in self.samples if not x.error]
+
+    def _mean(self, metric: str) -> Optional[float]:
+        values = [getattr(x, metric) for x in self.successful if getattr(x, metric) is not None]
+        return statistics.fmean(values) if values else None
+
+    @property
+    def ssim(self) -> Optional[float]:
+        return self._mean("ssim")
+
+    @property
+    def psnr(self) -> Optional[float]:
+        return self._mean("psnr")
+
+    @property
+    def vmaf(self) -> Optional[float]:
+        return self._mean("vmaf")
+
+    @property
+    def fps(self) -> float:
+        """Frames encoded per second of wall clock time, across all samples running at once"""
+        frames = sum(x.frames for x in self.successful)
+        return frames / self.wall_seconds if self.wall_seconds else 0
+
+    def summary(self) -> str:
+        def line(name, item):
+            scores = [
+                f"{label} {value:.4f}" if label == "SSIM" else f"{label} {value:.2f}"
+                for label, value in (("SSIM", item.ssim), ("PSNR", item.psnr), ("VMAF", item.vmaf))
+                if value is not None
+            ]
+            return f"{name}: {' | '.join(scores) or 'no scores'}"
+
+        lines = []
+        for sample in self.samples:
+            name = f"Sample {sample.window.index + 1} @ {sample.window.start:.1f}s"
+            if sample.error:
+                lines.append(f"{name}: {sample.error}")
+            else:
+                lines.append(f"{line(name, sample)} | {sample.fps:.2f} fps | {sample.bitrate / 1000:.0f} kbps")
+        lines.append(f"{line('Average', self)} | {self.fps:.2f} fps overall")
+        return "\n".join(lines)
+
+
+def frame_rate_number(frame_rate: str, default: float = 24.0) -> float:
+    try:
+        return float(Fraction(frame_rate))
+    except (ValueError, ZeroDivisionError, TypeError):
+        return default
+
+
+def sample_windows(
+    duration: float, count: int = 4, length: float = 5.0, start: float = 0, end: float = 0
+) -> List[SampleWindow]:
+    """Evenly spread sample windows over the part of the source that will be encoded"""
+    end = end or duration
+    span = end - start
+    if span <= 0:
+        return []
+    if span <= count * length:
+        return [SampleWindow(index=0, start=start, duration=span)]
+    step = span / count
+    return [
+        SampleWindow(index=i, start=round(start + step * i + (step - length) / 2, 3), duration=length)
+        for i in range(count)
+    ]
+
+
+def sample_video(video: Video, window: SampleWindow, output: Path, work_dir: Path, keep_audio: bool = False) -> Video:
+    """Copy of the video that only encodes the window, video track only unless keep_audio, to its own file"""
+    sample = video.model_copy(deep=True)
+    sample.work_path = work_dir
+    if not keep_audio:
+        sample.audio_tracks = []
+    sample.subtitle_tracks = []
+    sample.attachment_tracks = []
+    sample.video_settings.start_time = window.start
+    sample.video_settings.end_time = round(window.start + window.duration, 3)
+    sample.video_settings.fast_seek = True
+    sample.video_settings.copy_chapters = False
+    sample.video_settings.copy_data = False
+    sample.video_settings.output_path = output
+    sample.video_settings.conversion_commands = []
+    return sample
+
+
+def build_sample_commands(fastflix: FastFlix, build: Callable, sample: Video) -> List[Command]:
+    sample_flix = fastflix.model_copy(update={"current_video": sample})
+    commands = build(fastflix=sample_flix)
+    if not commands:
+        raise FastFlixInternalException("Encoder did not return any commands for the sample")
+    return commands
+
+
+def quality_command(
+    fastflix: FastFlix, video: Video, sample: SampleResult, metrics: List[str], pix_fmt: str = "yuv420p"
+) -> List[str]:
+    """Compare an encoded sample with the same window of the source, run through the same filters"""
+    settings = video.video_settings.model_dump()
+    settings.update(burn_in_subtitle_track=None, enable_opencl=False)
+    reference = generate_filters(
+        source=video.source,
+        scale=video.scale,
+        raw_filters=True,
+        input_index=1,
+        output_label="filtered",
+        **settings,
+    ) or f"[1:{video.video_settings.selected_track}]null[filtered]"
+
+    align = f"format={pix_fmt},settb=AVTB,setpts=PTS-STARTPTS"
+    chain = [
+        reference,
+        f"[filtered]{align},split={len(metrics)}{''.join(f'[ref{i}]' for i in range(len(metrics)))}",
+        f"[0:v:0]{align}[dist0]",
+    ]
+    for i, metric in enumerate(metrics):
+        chain.append(f"[dist{i}][ref{i}]{metric}[dist{i + 1}]")
+
+    return [
+        str(fastflix.config.ffmpeg),
+        "-hide_banner",
+        "-nostats",
+        "-i",
+        clean_file_string(sample.output),
+        "-ss",
+        str(sample.window.start),
+        "-t",
+        str(sample.window.duration),
+        "-i",
+        clean_file_string(video.source),
+        "-filter_complex",
+        ";".join(chain),
+        "-map",
+        f"[dist{len(metrics)}]",
+        "-f",
+        "null",
+        "-",
+    ]
+
+
+def parse_scores(output: str) -> dict:
+    scores = {}
+    for name, regex in (("ssim", ssim_re), ("psnr", psnr_re), ("vmaf", vmaf_re)):
+        matches = regex.findall(output)
+        if matches:
+            scores[name] = float(matches[-1]) if matches[-1] != "inf" else 100.0
+    return scores
+
+
+def run_command(command, work_dir: Path, cancel_event: Optional[threading.Event] = None, shell: bool = False):
+    """Run a command to completion, or until cancelled, returning the return code and error output"""
+    if isinstance(command, str) and not shell:
+        command = shlex.split(command.replace("\\", "\\\\"))
+    process = Popen(command, shell=shell, cwd=work_dir, stdin=DEVNULL, stdout=DEVNULL, stderr=PIPE)
+    stderr = []
+    reader = threading.Thread(target=lambda: stderr.append(process.stderr.read()), daemon=True)
+    reader.start()
+    while process.poll() is None:
+        if cancel_event and cancel_event.is_set():
+            process.kill()
+        time.sleep(0.1)
+    reader.join()
+    return process.returncode, b"".join(stderr).decode("utf-8", errors="ignore")
+
+
+def encode_sample(
+    fastflix: FastFlix,
+    build: Callable,
+    window: SampleWindow,
+    work_dir: Path,
+    metrics: List[str],
+    cancel_event: Optional[threading.Event] = None,
+    suffix: str = ".mkv",
+    tag: str = "",
+    keep_audio: bool = False,
+) -> SampleResult:
+    video = fastflix.current_video
+    output = work_dir / f"sample_{window.index}_{int(window.start * 1000)}{tag}{suffix}"
+    result = SampleResult(window=window, output=output)
+    result.frames = round(window.duration * frame_rate_number(video.average_frame_rate or video.frame_rate))
+
+    commands = build_sample_commands(fastflix, build, sample_video(video, window, output, work_dir, keep_audio))
+    start = time.perf_counter()
+    for command in commands:
+        if cancel_event and cancel_event.is_set():
+            result.error = "Cancelled"
+            return result
+        returncode, stderr = run_command(command.command, work_dir, cancel_event, shell=command.shell)
+        if returncode != 0:
+            result.error = "Cancelled" if cancel_event and cancel_event.is_set() else f"Encode failed: {stderr[-300:]}"
+            return result
+    result.encode_seconds = time.perf_counter() - start
+
+    if not output.exists():
+        result.error = "Encode did not create the sample file"
+        return result
+    result.size = output.stat().st_size
+    if not metrics:
+        return result
+
+    pix_fmt = getattr(video.video_settings.video_encoder_settings, "pix_fmt", None) or "yuv420p"
+    returncode, stderr = run_command(quality_command(fastflix, video, result, metrics, pix_fmt), work_dir, cancel_event)
+    if returncode != 0:
+        result.error = f"Could not compare sample: {stderr[-300:]}"
+        return result
+    for name, score in parse_scores(stderr).items():
+        setattr(result, name, score)
+    return result
+
+
+def quality_check(
+    fastflix: FastFlix,
+    build: Callable,
+    work_dir: Path,
+    count: int = 4,
+    length: float = 5.0,
+    workers: int = 2,
+    cancel_event: Optional[threading.Event] = None,
+    windows: Optional[List[SampleWindow]] = None,
+) -> QualityReport:
+    """
+    Encode short windows of the current video with the current encoder settings, in parallel,
+    and score each against the source with ssim and psnr, plus libvmaf when FFmpeg has it.
+    """
+    video = fastflix.current_video
+    if windows is None:
+        windows = sample_windows(
+            video.duration,
+            count=count,
+            length=length,
+            start=video.video_settings.start_time,
+            end=video.video_settings.end_time,
+        )
+    if not windows:
+        raise FastFlixInternalException("Nothing to sample, the selected time range is empty")
+
+    metrics = ["ssim", "psnr"]
+    if "libvmaf" in (fastflix.ffmpeg_config or []):
+        metrics.append("libvmaf")
+
+    suffix = video.video_settings.output_path.suffix if video.video_settings.output_path else ".mkv"
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        futures = [
+            pool.submit(encode_sample, fastflix, build, window, work_dir, metrics, cancel_event, suffix or ".mkv")
+            for window in windows
+        ]
+        samples = []
+        for window, future in zip(windows, futures):
+            try:
+                samples.append(future.result())
+            except Exception as err:
+                logger.exception(f"Sample {window.index} failed")
+                samples.append(SampleResult(window=window, output=work_dir, error=str(err)))
+    return QualityReport(samples=samples, wall_seconds=time.perf_counter() - start)
+
+
+def rate_control(encoder_settings) -> Optional[RateControl]:
+    return rate_controls.get(type(encoder_settings))
+
+
+def apply_rate(video: Video, value: Union[int, float]):
+    """Switch the video's encoder settings to the constant quality mode at the given value"""
+    settings = video.video_settings.video_encoder_settings
+    control = rate_control(settings)
+    if not control:
+        raise FastFlixInternalException(f"{settings.name} does not support a target quality search")
+    setattr(settings, control.attribute, value)
+    settings.bitrate = None
+
+
+def target_quality_search(
+    fastflix: FastFlix,
+    build: Callable,
+    work_dir: Path,
+    target: float,
+    metric: str = "vmaf",
+    count: int = 4,
+    length: float = 3.0,
+    workers: int = 2,
+    cancel_event: Optional[threading.Event] = None,
+    cache: Optional[dict] = None,
+) -> TargetQualityResult:
+    """
+    Bisect the constant quality value of the current encoder over sample windows of the video,
+    finding the lowest quality (highest CRF / QP) whose average metric score still meets the target.
+
+    Scores are stored in cache per sample window and value, passing the same dict to later searches
+    of the same source and settings will skip any sample encodes that have already been done.
+    """
+    video = fastflix.current_video
+    control = rate_control(video.video_settings.video_encoder_settings)
+    if not control:
+        raise FastFlixInternalException(
+            f"{video.video_settings.video_encoder_settings.name} does not support a target quality search"
+        )
+    if metric not in metric_filters:
+        raise FastFlixInternalException(f"Unknown quality metric {metric}")
+    if metric == "vmaf" and "libvmaf" not in (fastflix.ffmpeg_config or []):
+        raise FastFlixInternalException("FFmpeg was not built with libvmaf, cannot search for a VMAF target")
+
+    windows = sample_windows(
+        video.duration,
+        count=count,
+        length=length,
+        start=video.video_settings.start_time,
+        end=video.video_settings.end_time,
+    )
+    if not windows:
+        raise FastFlixInternalException("Nothing to sample, the selected time range is empty")
+
+    cache = {} if cache is None else cache
+    suffix = (video.video_settings.output_path.suffix if video.video_settings.output_path else "") or ".mkv"
+    settings_identity = (
+        video.video_settings.model_dump_json(
+            exclude={"output_path", "conversion_commands", "video_encoder_settings", "video_title"}
+        ),
+        video.video_settings.video_encoder_settings.model_dump_json(exclude={control.attribute, "bitrate"}),
+    )
+    source = source_identity(video.source)
+    work_dir.mkdir(parents=True, exist_ok=True)
+
+    def score(value: int) -> float:
+        sample = video.model_copy(deep=True)
+        apply_rate(sample, value)
+        sample_flix = fastflix.model_copy(update={"current_video": sample})
+        keys = [
+            cache_key(source, *settings_identity, metric, window.start, window.duration, value) for window in windows
+        ]
+        missing = [window for window, key in zip(windows, keys) if key not in cache]
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            results = list(
+                pool.map(
+                    lambda window: encode_sample(
+                        sample_flix,
+                        build,
+                        window,
+                        work_dir,
+                        [metric_filters[metric]],
+                        cancel_event,
+                        suffix,
+                        tag=f"_{value}",
+                    ),
+                    missing,
+                )
+            )
+        for result in results:
+            result.output.unlink(missing_ok=True)
+            if result.error or getattr(result, metric) is None:
+                raise FastFlixInternalException(result.error or f"No {metric} score was found for the sample")
+            cache[cache_key(source, *settings_identity, metric, result.window.start, result.window.duration, value)] = (
+                getattr(result, metric)
+            )
+        return statistics.fmean(cache[key] for key in keys)
+
+    scores = {}
+    best = None
+    low, high = control.low, control.high
+    while low <= high:
+        if cancel_event and cancel_event.is_set():
+            raise FastFlixInternalException("Target quality search cancelled")
+        middle = (low + high) // 2
+        scores[middle] = score(middle)
+        logger.debug(f"Target quality search {control.attribute} {middle}: {metric} {scores[middle]:.4f}")
+        if scores[middle] >= target:
+            best = middle
+            low = middle + 1
+        else:
+            high = middle - 1
+
+    if best is None:
+        # Even the highest quality tried was not good enough, so go with the highest quality possible
+        best = control.low
+    return TargetQualityResult(metric=metric, target=target, value=best, score=scores.get(best), scores=scores)
+
+
+def confidence_bounds(values: List[float]):
+    """Mean of the values with the bounds of its 95% confidence interval"""
+    mean = statistics.fmean(values)
+    if len(values) < 2:
+        return mean, mean, mean
+    margin = t_values.get(len(values) - 1, 1.96) * statistics.stdev(values) / len(values) ** 0.5
+    return mean, max(mean - margin, 0), mean + margin
+
+
+def estimate_encode(
+    fastflix: FastFlix,
+    build: Callable,
+    work_dir: Path,
+    count: int = 4,
+    length: float = 4.0,
+    cancel_event: Optional[threading.Event] = None,
+) -> EncodeEstimate:
+    """
+    Predict the output size and encoding time of the current video by encoding short windows of it,
+    audio included, with its exact encoder settings and extrapolating their rates over the whole encode.
+
+    Samples are encoded one at a time so each gets the machine the way the real encode will.
+    """
+    video = fastflix.current_video
+    span_start = video.video_settings.start_time
+    span_end = video.video_settings.end_time or video.duration
+    windows = sample_windows(video.duration, count=count, length=length, start=span_start, end=span_end)
+    if not windows:
+        raise FastFlixInternalException("Nothing to sample, the selected time range is empty")
+
+    suffix = (video.video_settings.output_path.suffix if video.video_settings.output_path else "") or ".mkv"
+    work_dir.mkdir(parents=True, exist_ok=True)
+    samples = []
+    for window in windows:
+        result = encode_sample(fastflix, build, window, work_dir, [], cancel_event, suffix, keep_audio=True)
+        result.output.unlink(missing_ok=True)
+        if result.error:
+            raise FastFlixInternalException(result.error)
+        samples.append(result)
+
+    total = span_end - span_start
+    size, size_low, size_high = confidence_bounds([x.size / x.window.duration * total for x in samples])
+    seconds, seconds_low, seconds_high = confidence_bounds(
+        [x.encode_seconds / x.window.duration * total for x in samples]
+    )
+    return EncodeEstimate(
+        size=round(size),
+        size_low=round(size_low),
+        size_high=round(size_high),
+        seconds=seconds,
+        seconds_low=seconds_low,
+        seconds_high=seconds_high,
+        samples=len(samples),
+    )
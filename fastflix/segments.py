@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+"""
+Resumable encodes, where the video is encoded in fixed length segments that are joined at the end.
+
+Each segment is its own queue command, so a stopped or crashed encode picks up at the segment it was on
+instead of the first frame. A manifest in the video's work folder records every segment that was
+checked to be complete, and any that went missing or are cut short are encoded again before the join.
+"""
+import json
+import logging
+import shutil
+from pathlib import Path
+from types import ModuleType
+from typing import List, Optional, Tuple
+
+from fastflix.encoders.common.attachments import build_attachments
+from fastflix.encoders.common.audio import build_audio
+from fastflix.encoders.common.helpers import Command, generate_ending
+from fastflix.encoders.common.subtitles import build_subtitle
+from fastflix.flix import probe_duration
+from fastflix.models.config import Config
+from fastflix.models.fastflix import FastFlix
+from fastflix.models.video import Video
+from fastflix.paths import clean_file_string
+
+logger = logging.getLogger("fastflix")
+
+__all__ = ["build", "cleanup", "is_segmented", "resume", "segment_bounds"]
+
+segment_item = "segment"
+join_item = "segment join"
+# Encoders whose output can not be cut and joined again without re-encoding
+unsupported_encoders = ("GIF", "WebP", "Copy", "Modify", "AVIF (SVT AV1)")
+
+
+def segment_bounds(start: float, end: float, length: float) -> List[Tuple[float, float]]:
+    """Start and end times of each segment, a short leftover is added to the last one"""
+    bounds = []
+    position = start
+    while end - position > length * 1.25:
+        bounds.append((round(position, 3), round(position + length, 3)))
+        position += length
+    bounds.append((round(position, 3), round(end, 3)))
+    return bounds
+
+
+def segment_folder(video: Video) -> Path:
+    return video.work_path / "segments"
+
+
+def is_segmented(video: Video) -> bool:
+    return any(command.item == join_item for command in video.video_settings.conversion_commands)
+
+
+def unsegmentable(video: Video, commands: List[Command]) -> Optional[str]:
+    """Why the video can not be encoded in segments, if it can't"""
+    settings = video.video_settings
+    if len(commands) != 1 or commands[0].exe != "ffmpeg":
+        return "only single pass FFmpeg encodes"
+    if settings.video_encoder_settings.name in unsupported_encoders:
+        return f"not {settings.video_encoder_settings.name}"
+    if video.concat or not video.duration or not video.work_path:
+        return "not concat or unprobed sources"
+    if settings.video_speed != 1:
+        return "not with the speed changed"
+    if any(track.burn_in and track.enabled for track in video.subtitle_tracks):
+        return "not with burned in subtitles"
+    if getattr(settings.video_encoder_settings, "hdr10plus_metadata", None):
+        # The dynamic metadata is numbered from the first frame of the whole video
+        return "not with HDR10+ metadata"
+    return None
+
+
+def build(fastflix: FastFlix, encoder: ModuleType) -> List[Command]:
+    """The encoder's commands for the current video, split into segments and a join if it asks to be resumable"""
+    commands = encoder.build(fastflix=fastflix)
+    video = fastflix.current_video
+    length = video.video_settings.segment_length
+    if not length or not commands:
+        return commands
+    if reason := unsegmentable(video, commands):
+        logger.warning(f"Encoding {video.source.name} in one piece, resumable segments work with {reason}")
+        return commands
+
+    bounds = segment_bounds(video.video_settings.start_time, video.video_settings.end_time or video.duration, length)
+    if len(bounds) < 2:
+        return commands
+
+    folder = segment_folder(video)
+    segments = []
+    for i, (start, end) in enumerate(bounds):
+        part = video.model_copy(deep=True)
+        part.audio_tracks, part.subtitle_tracks, part.attachment_tracks = [], [], []
+        part.video_settings.start_time = start
+        part.video_settings.end_time = end
+        part.video_settings.fast_seek = True
+        part.video_settings.output_path = folder / f"segment_{i:04d}.mkv"
+        part.video_settings.remove_metadata = True
+        part.video_settings.copy_chapters = False
+        part.video_settings.copy_data = False
+        part.video_settings.video_title = ""
+        (command,) = encoder.build(fastflix=fastflix.model_copy(update={"current_video": part}))
+        name = f"Segment {i + 1} of {len(bounds)}"
+        # Segments don't need each other, so runners with room for more than one encode can run them side by side
+        segments.append(Command(command=command.command, item=segment_item, name=name, exe="ffmpeg", depends_on=[]))
+    join = Command(
+        command=join_command(fastflix, video),
+        item=join_item,
+        name="Join segments",
+        exe="ffmpeg",
+        depends_on=[segment.uuid for segment in segments],
+    )
+    return [*segments, join]
+
+
+def join_command(fastflix: FastFlix, video: Video) -> str:
+    """Copies the joined segments' video into the output, along with the usual audio, subtitles and covers"""
+    settings = video.video_settings
+    start = f"-ss {settings.start_time}" if settings.start_time else ""
+    end = f"-to {settings.end_time}" if settings.end_time else ""
+    title = settings.video_title.replace('"', '\\"')
+    track_title = settings.video_track_title.replace('"', '\\"')
+    subtitles, _, _ = build_subtitle(video.subtitle_tracks)
+    ending, _ = generate_ending(
+        audio=build_audio(video.audio_tracks),
+        subtitles=subtitles,
+        cover=build_attachments(video.attachment_tracks),
+        output_video=settings.output_path,
+        **{**settings.model_dump(), "output_fps": None},
+    )
+    parts = [
+        f'"{clean_file_string(fastflix.config.ffmpeg)}" -y',
+        start,
+        end,
+        f'-i "{clean_file_string(video.source)}"',
+        f'-f concat -safe 0 -i "{clean_file_string(segment_folder(video) / "segments.txt")}"',
+        "-map 1:v -c:v copy",
+        f'-metadata title="{title}"' if title else "",
+        f'-metadata:s:v:0 title="{track_title}"' if track_title else "",
+    ]
+    return " ".join(filter(None, parts)) + ending
+
+
+def load_manifest(folder: Path) -> dict:
+    try:
+        return json.loads((folder / "manifest.json").read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+
+def resume(video: Video, config: Optional[Config] = None) -> int:
+    """
+    Gets a segmented video ready to run its current command. The segments marked as finished are checked,
+    and it is moved back to the first one that is missing or cut short. Returns the command to run next.
+
+    Segments are checked with FFprobe the first time, and after that by their size in the manifest.
+    Without a config to find FFprobe with, segments the queue says are finished are trusted.
+    """
+    if not is_segmented(video):
+        return video.status.current_command
+    settings = video.video_settings
+    bounds = segment_bounds(settings.start_time, settings.end_time or video.duration, settings.segment_length)
+    folder = segment_folder(video)
+    folder.mkdir(parents=True, exist_ok=True)
+    files = [folder / f"segment_{i:04d}.mkv" for i in range(len(bounds))]
+    (folder / "segments.txt").write_text("".join(f"file '{file.name}'\n" for file in files), encoding="utf-8")
+
+    commands = settings.conversion_commands
+    verified = load_manifest(folder).get("verified", {})
+    complete = set()
+    for i, (file, (start, end)) in enumerate(zip(files, bounds)):
+        if i >= video.status.current_command and commands[i].uuid not in video.status.finished_commands:
+            continue
+        size = file.stat().st_size if file.exists() else 0
+        if verified.get(file.name) == size and size:
+            complete.add(i)
+            continue
+        if not size or (config and abs(probe_duration(config, file) - (end - start)) > 1):
+            logger.warning(f"{video.source.name} segment {i + 1} is not complete, encoding it again")
+            continue
+        complete.add(i)
+        if config:
+            verified[file.name] = size
+
+    # Segments can finish out of order, the current command is the first one that hasn't
+    current = 0
+    while current in complete:
+        current += 1
+    video.status.current_command = current
+    video.status.finished_commands = [commands[i].uuid for i in sorted(complete) if i > current]
+    verified = {name: size for name, size in verified.items() if name in {file.name for file in files}}
+    (folder / "manifest.json").write_text(
+        json.dumps({"source": str(video.source), "segments": bounds, "verified": verified}, indent=2), encoding="utf-8"
+    )
+    return video.status.current_command
+
+
+def cleanup(video: Video):
+    """Remove the segments once the video is complete"""
+    if is_segmented(video):
+        shutil.rmtree(segment_folder(video), ignore_errors=True)
@@ -13,7 +13,6 @@ from platformdirs import user_data_dir
 import importlib.resources
 import requests
 import reusables
-from pathvalidate import sanitize_filepath
 
 
 try:
@@ -28,6 +27,7 @@ except AttributeError:
 from PySide6 import QtCore, QtGui, QtWidgets
 
 from fastflix.language import t
+from fastflix.paths import clean_file_string, quoted_path, sanitize  # noqa: F401
 from fastflix.resources import get_bool_env
 
 DEVMODE = get_bool_env("DEVMODE")
@@ -311,33 +311,6 @@ def timedelta_to_str(delta):
     return output_string
 
 
-def clean_file_string(source):
-    return str(source).strip().strip("'\"")
-
-
-def quoted_path(source):
-    cleaned_string = (
-        str(source)
-        .strip()
-        .replace("\\", "\\\\")
-        .replace(":", "\\:")
-        .replace("'", "'\\\\\\''")
-        .replace("\r\n", "")
-        .replace("\n", "")
-        .replace("\r", "")
-    )
-    if " " in cleaned_string[0:4]:
-        logger.warning(f"Unexpected space at start of quoted path, attempting to fix: {cleaned_string}")
-        cleaned_string = cleaned_string[0:4].replace(" ", "") + cleaned_string[4:]
-        logger.warning(f"New path set to: {cleaned_string}")
-    return cleaned_string
-
-
-def sanitize(source):
-    return str(sanitize_filepath(source, platform="Windows" if reusables.win_based else "Linux"))
-    # return str().replace("\\", "/")
-
-
 def get_config(portable_mode=False):
     config = os.getenv("FF_CONFIG")
     if config:
@@ -0,0 +1,137 @@
+# -*- coding: utf-8 -*-
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from box import Box
+
+logger = logging.getLogger("fastflix")
+
+__all__ = ["FolderWatcher", "ignored_file", "has_video"]
+
+# Names used by browsers, download managers and copy tools while a file is still being written
+ignored_suffixes = (".part", ".partial", ".tmp", ".temp", ".crdownload", ".download", ".filepart", ".!qb", ".!ut")
+ignored_names = ("Thumbs.db", "desktop.ini")
+
+
+def ignored_file(path: Path) -> bool:
+    return path.name.startswith(".") or path.name in ignored_names or path.suffix.lower() in ignored_suffixes
+
+
+def has_video(details: Box) -> bool:
+    return any(
+        stream.get("codec_type") == "video" and not stream.get("disposition", {}).get("attached_pic")
+        for stream in details.get("streams", [])
+    )
+
+
+class FolderWatcher:
+    """
+    Watches directories for new media, handing each file over once it has finished being written.
+
+    Copies and downloads fill the file in place, so a file only counts as finished once its size and
+    modification time have stayed the same for `settle` seconds. Folders are scanned every `interval`
+    seconds, or right away when `wake` is called from a file system notification, so polling alone still
+    works where notifications are not available, such as on network shares.
+
+    Finished files are probed a few at a time in the background, and the ones with a video stream
+    are passed to `found` along with the name of the profile of their folder.
+    Files already in the folders when the watcher starts are left alone.
+    """
+
+    def __init__(
+        self,
+        folders: Dict[Path, str],
+        probe_file: Callable[[Path], Box],
+        found: Callable[[Path, str, Box], None],
+        interval: float = 10,
+        settle: float = 5,
+        workers: int = 2,
+    ):
+        self.folders = folders
+        self.probe_file = probe_file
+        self.found = found
+        self.interval = interval
+        self.settle = settle
+        self.seen: Set[Path] = set()
+        # path: ((size, mtime), time it was last seen changing)
+        self.pending: Dict[Path, Tuple[Tuple[int, int], float]] = {}
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="watch_folder")
+
+    def start(self):
+        for folder in self.folders:
+            self.seen.update(self._files(folder))
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def wake(self):
+        self._wake.set()
+
+    def scan(self, now: Optional[float] = None) -> List[Tuple[Path, str]]:
+        """New files that have stopped changing, each one returned only once"""
+        now = time.monotonic() if now is None else now
+        ready = []
+        present = set()
+        for folder, profile in self.folders.items():
+            for path in self._files(folder):
+                present.add(path)
+                if path in self.seen:
+                    continue
+                try:
+                    stat = path.stat()
+                except OSError:
+                    continue
+                state = (stat.st_size, stat.st_mtime_ns)
+                previous = self.pending.get(path)
+                if not previous or previous[0] != state:
+                    self.pending[path] = (state, now)
+                elif stat.st_size and now - previous[1] >= self.settle:
+                    del self.pending[path]
+                    self.seen.add(path)
+                    ready.append((path, profile))
+        # Forget removed files, so the same name showing up again counts as new
+        self.seen &= present
+        for path in set(self.pending) - present:
+            del self.pending[path]
+        return ready
+
+    def _files(self, folder: Path) -> List[Path]:
+        try:
+            return [path for path in folder.iterdir() if not ignored_file(path) and path.is_file()]
+        except OSError as err:
+            logger.debug(f"Could not scan watch folder {folder}: {err}")
+            return []
+
+    def _run(self):
+        while not self._stop.is_set():
+            for path, profile in self.scan():
+                self._pool.submit(self._probe, path, profile)
+            # Notifications arrive for every write while a file is copied, so scan at most once a second
+            self._stop.wait(1)
+            self._wake.wait(max(self.settle if self.pending else self.interval, 1) - 1)
+            self._wake.clear()
+
+    def _probe(self, path: Path, profile: str):
+        if self._stop.is_set():
+            return
+        try:
+            details = self.probe_file(path)
+        except Exception as err:
+            logger.info(f"Watch folder skipping {path}, not a media file: {err}")
+            return
+        if not has_video(details):
+            logger.info(f"Watch folder skipping {path}, it has no video track")
+            return
+        logger.info(f"Watch folder found new video {path}")
+        self.found(path, profile, details)
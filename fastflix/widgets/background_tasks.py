@@ -2,168 +2,527 @@
 # -*- coding: utf-8 -*-
 import logging
 import os
+import shutil
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from subprocess import PIPE, STDOUT, Popen, run, check_output
-from packaging import version
+from typing import Callable, List, Optional, Tuple
+from subprocess import PIPE, Popen
 
-from PySide6 import QtCore
+import psutil
+import reusables
+from PySide6 import QtCore, QtGui
 from ffmpeg_normalize import FFmpegNormalize
 
+from fastflix import segments
+from fastflix.encoders.common.audio import normalized
+from fastflix.flix import (
+    extract_attachments,
+    extract_hdr10plus_metadata,
+    measure_loudness,
+    subtitle_extract_formats,
+    subtitle_extraction_command,
+)
 from fastflix.language import t
+from fastflix.models.encode import SubtitleTrack
 from fastflix.models.fastflix_app import FastFlixApp
-from fastflix.shared import clean_file_string
+from fastflix.models.profiles import Profile
+from fastflix.planner import build_video
+from fastflix.sample_encode import estimate_encode, quality_check, target_quality_search
 
 logger = logging.getLogger("fastflix")
 
-__all__ = ["ThumbnailCreator", "ExtractSubtitleSRT", "ExtractHDR10"]
+__all__ = [
+    "PreviewScheduler",
+    "ThumbnailPrefetcher",
+    "QualityCheck",
+    "TargetQualitySearch",
+    "EstimateEncode",
+    "LoudnessAnalysis",
+    "ExtractSubtitles",
+    "ExtractCovers",
+    "BatchAdd",
+    "ExtractHDR10",
+    "ResumeSegments",
+]
+
+
+def lower_process_priority(pid: int):
+    try:
+        psutil.Process(pid).nice(psutil.BELOW_NORMAL_PRIORITY_CLASS if reusables.win_based else 10)
+    except Exception:
+        logger.debug(f"Could not lower priority of process {pid}")
+
+
+class PreviewJob:
+    def __init__(self, job_id: int, command: list, key: Optional[str] = None):
+        self.job_id = job_id
+        self.command = command
+        self.key = key
+        self.process: Optional[Popen] = None
+        self.returncode: Optional[int] = None
+        self.data = b""
+        self.image: Optional[QtGui.QImage] = None
+        self.stderr = ""
+        self.cancelled = False
+
+    def kill(self):
+        self.cancelled = True
+        if self.process and self.process.poll() is None:
+            try:
+                self.process.kill()
+            except OSError:
+                pass
+
+
+class PreviewWorker(QtCore.QThread):
+    def __init__(self, parent, job: PreviewJob):
+        super().__init__(parent)
+        self.job = job
+
+    def run(self):
+        if self.job.cancelled:
+            return
+        try:
+            self.job.process = Popen(self.job.command, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+        except OSError as err:
+            self.job.returncode, self.job.stderr = 1, str(err)
+            return
+        if self.job.cancelled:
+            self.job.kill()
+        stdout, stderr = self.job.process.communicate()
+        self.job.returncode = self.job.process.returncode
+        self.job.stderr = stderr.decode(encoding="utf-8", errors="ignore")
+        if self.job.returncode == 0 and stdout and not self.job.cancelled:
+            # Decoding here keeps large previews from stalling the GUI thread, QImage is safe to use across threads
+            self.job.data = stdout
+            self.job.image = QtGui.QImage.fromData(stdout)
+
+
+class PreviewScheduler(QtCore.QObject):
+    """
+    Renders previews for a single preview surface, newest request wins.
+
+    Images are read from the ffmpeg process' stdout, nothing is written to disk.
+    Only one ffmpeg process runs at a time. Submitting a new job kills the running one and
+    replaces anything still waiting, so only the result of the latest request is ever reported
+    through `completed` as (status, job). Status is 1 on success, 0 on failure and 2 if OpenCL failed.
+    """
+
+    completed = QtCore.Signal(int, object)
+
+    def __init__(self, parent, name: str = "thumbnail"):
+        super().__init__(parent)
+        self.name = name
+        self._job_id = 0
+        self._running: Optional[PreviewWorker] = None
+        self._pending: Optional[PreviewJob] = None
+
+    def submit(self, command: list, key: Optional[str] = None) -> PreviewJob:
+        self._job_id += 1
+        job = PreviewJob(self._job_id, command, key)
+        self._pending = job
+        if self._running:
+            self._running.job.kill()
+        else:
+            self._start_pending()
+        return job
+
+    def cancel(self):
+        self._pending = None
+        if self._running:
+            self._running.job.kill()
+
+    def is_latest(self, job: PreviewJob) -> bool:
+        return job.job_id == self._job_id
+
+    def _start_pending(self):
+        job, self._pending = self._pending, None
+        if not job:
+            return
+        logger.debug(f"{t('Generating thumbnail')} ({self.name}): {job.command}")
+        self._running = PreviewWorker(self, job)
+        self._running.finished.connect(self._job_finished)
+        self._running.start()
+
+    def _job_finished(self):
+        worker, self._running = self._running, None
+        job = worker.job
+        worker.deleteLater()
+        if not job.cancelled and self.is_latest(job):
+            self.completed.emit(self._job_status(job), job)
+        self._start_pending()
+
+    def _job_status(self, job: PreviewJob) -> int:
+        if job.returncode == 0 and job.image and not job.image.isNull():
+            return 1
+        if "No such filter: 'zscale'" in job.stderr:
+            logger.error(
+                f"Could not generate {self.name} because you are using an outdated FFmpeg! "
+                "Please use FFmpeg 4.3+ built against the latest zimg libraries. "
+                "Static builds available at https://ffmpeg.org/download.html "
+            )
+        if "OpenCL mapping not usable" in job.stderr:
+            logger.error(f"ERROR trying to use OpenCL for {self.name} generation")
+            return 2
+        logger.error(f"{t('Could not generate thumbnail')}: {job.stderr}")
+        return 0
+
 
+class ThumbnailPrefetcher(QtCore.QThread):
+    """Render thumbnails the user is likely to ask for next, straight into the thumbnail cache"""
 
-class ThumbnailCreator(QtCore.QThread):
-    def __init__(self, main, command=""):
+    def __init__(self, main, cache, jobs):
         super().__init__(main)
         self.main = main
-        self.command = command
+        self.cache = cache
+        self.jobs = jobs
+        self.process: Optional[Popen] = None
+
+    def stop(self):
+        self.requestInterruption()
+        if self.process and self.process.poll() is None:
+            try:
+                self.process.kill()
+            except OSError:
+                pass
 
     def run(self):
-        self.main.thread_logging_signal.emit(f"DEBUG:{t('Generating thumbnail')}: {self.command}")
-        result = run(self.command, stdin=PIPE, stdout=PIPE, stderr=STDOUT)
-        if result.returncode > 0:
-            if "No such filter: 'zscale'" in result.stdout.decode(encoding="utf-8", errors="ignore"):
-                self.main.thread_logging_signal.emit(
-                    "ERROR:Could not generate thumbnail because you are using an outdated FFmpeg! "
-                    "Please use FFmpeg 4.3+ built against the latest zimg libraries. "
-                    "Static builds available at https://ffmpeg.org/download.html "
-                )
-            if "OpenCL mapping not usable" in result.stdout.decode(encoding="utf-8", errors="ignore"):
-                self.main.thread_logging_signal.emit("ERROR trying to use OpenCL for thumbnail generation")
-                self.main.thumbnail_complete.emit(2)
-            else:
-                self.main.thread_logging_signal.emit(f"ERROR:{t('Could not generate thumbnail')}: {result.stdout}")
+        for key, command in self.jobs:
+            if self.isInterruptionRequested():
+                return
+            if key in self.cache:
+                continue
+            try:
+                self.process = Popen(command, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+            except OSError:
+                return
+            lower_process_priority(self.process.pid)
+            image, _ = self.process.communicate()
+            if self.process.returncode == 0 and image and not self.isInterruptionRequested():
+                self.cache.store(key, image)
+
+
+class QualityCheck(QtCore.QThread):
+    """Encode and score sample windows of the current video with the current settings"""
+
+    def __init__(self, main, fastflix, build, work_dir: Path, signal, workers: int = 2):
+        super().__init__(main)
+        self.main = main
+        self.fastflix = fastflix
+        self.build = build
+        self.work_dir = work_dir
+        self.signal = signal
+        self.workers = workers
+        self.cancel_event = threading.Event()
 
-            self.main.thumbnail_complete.emit(0)
+    def stop(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            report = quality_check(
+                self.fastflix,
+                self.build,
+                self.work_dir,
+                workers=self.workers,
+                cancel_event=self.cancel_event,
+            )
+        except Exception as err:
+            logger.exception(f"{t('Quality check failed')}: {err}")
+            self.signal.emit(None)
         else:
-            self.main.thumbnail_complete.emit(1)
+            self.signal.emit(report)
+        finally:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
 
+class TargetQualitySearch(QtCore.QThread):
+    """Find the constant quality value that meets a queued video's target score"""
 
-class ExtractSubtitleSRT(QtCore.QThread):
-    def __init__(self, app: FastFlixApp, main, index, signal, language):
+    def __init__(self, main, fastflix, build, work_dir: Path, signal, cache: dict, workers: int = 2):
         super().__init__(main)
         self.main = main
-        self.app = app
-        self.index = index
+        self.fastflix = fastflix
+        self.build = build
+        self.work_dir = work_dir
         self.signal = signal
-        self.language = language
+        self.cache = cache
+        self.workers = workers
+        self.cancel_event = threading.Event()
+
+    def stop(self):
+        self.cancel_event.set()
 
     def run(self):
-        subtitle_format = self._get_subtitle_format()
-        if subtitle_format is None:
-            self.main.thread_logging_signal.emit(
-                f"WARNING:{t('Could not determine subtitle format for track')} {self.index}, {t('skipping extraction')}"
+        video = self.fastflix.current_video
+        try:
+            result = target_quality_search(
+                self.fastflix,
+                self.build,
+                self.work_dir,
+                target=video.video_settings.target_quality,
+                metric=video.video_settings.target_quality_metric,
+                workers=self.workers,
+                cancel_event=self.cancel_event,
+                cache=self.cache,
             )
-            self.signal.emit()
-            return
+        except Exception as err:
+            logger.error(f"{t('Target quality search failed')}: {err}")
+            self.signal.emit(video.uuid, str(err))
+        else:
+            self.signal.emit(video.uuid, result)
+        finally:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class EstimateEncode(QtCore.QThread):
+    """Predict a queued video's output size and encoding time from a few sample encodes"""
+
+    def __init__(self, main, fastflix, build, work_dir: Path, signal):
+        super().__init__(main)
+        self.main = main
+        self.fastflix = fastflix
+        self.build = build
+        self.work_dir = work_dir
+        self.signal = signal
+        self.cancel_event = threading.Event()
 
-        if subtitle_format == "srt":
-            extension = "srt"
-            output_args = ["-c", "srt", "-f", "srt"]
-        elif subtitle_format == "ass":
-            extension = "ass"
-            output_args = ["-c", "copy"]
-        elif subtitle_format == "ssa":
-            extension = "ssa"
-            output_args = ["-c", "copy"]
-        elif subtitle_format == "pgs":
-            extension = "sup"
-            output_args = ["-c", "copy"]
+    def stop(self):
+        self.cancel_event.set()
+
+    def run(self):
+        video = self.fastflix.current_video
+        try:
+            estimate = estimate_encode(self.fastflix, self.build, self.work_dir, cancel_event=self.cancel_event)
+        except Exception as err:
+            logger.warning(f"{t('Could not estimate encode for')} {video.video_settings.output_path.name}: {err}")
+            self.signal.emit(video.uuid, None)
         else:
-            self.main.thread_logging_signal.emit(
-                f"WARNING:{t('Subtitle Track')} {self.index} {t('is not in supported format (SRT, ASS, SSA, PGS), skipping extraction')}: {subtitle_format}"
-            )
-            self.signal.emit()
-            return
+            # A stopped estimate only had some of its samples, so is not kept
+            self.signal.emit(video.uuid, None if self.cancel_event.is_set() else estimate)
+        finally:
+            shutil.rmtree(self.work_dir, ignore_errors=True)
+
+
+class LoudnessAnalysis(QtCore.QThread):
+    """First loudness normalization pass over every normalized audio track of a queued video"""
 
-        # filename = str(
-        # Path(self.main.output_video).parent / f"{self.main.output_video}.{self.index}.{self.language}.srt"
-        # ).replace("\\", "/")
-        filename = str(
-            Path(self.main.output_video).parent / f"{self.main.output_video}.{self.index}.{self.language}.{extension}"
-        ).replace("\\", "/")
-        self.main.thread_logging_signal.emit(f"INFO:{t('Extracting subtitles to')} {filename}")
+    def __init__(self, main, ffmpeg: Path, video, cache, signal):
+        super().__init__(main)
+        self.main = main
+        self.ffmpeg = ffmpeg
+        self.video = video
+        self.cache = cache
+        self.signal = signal
+        self.cancel_event = threading.Event()
 
+    def stop(self):
+        self.cancel_event.set()
+
+    def run(self):
+        tracks = [track for track in self.video.audio_tracks if normalized(track)]
         try:
-            result = run(
-                [
-                    self.app.fastflix.config.ffmpeg,
-                    "-y",
-                    "-i",
-                    self.main.input_video,
-                    "-map",
-                    f"0:s:{self.index}",
-                    *output_args,
-                    filename,
-                ],
-                stdout=PIPE,
-                stderr=STDOUT,
+            measurements = measure_loudness(
+                self.ffmpeg, self.video.source, tracks, self.cache, cancel_event=self.cancel_event
             )
         except Exception as err:
-            self.main.thread_logging_signal.emit(f"ERROR:{t('Could not extract subtitle track')} {self.index} - {err}")
+            if self.cancel_event.is_set():
+                # Measured again the next time the queue is loaded
+                return
+            logger.error(f"{t('Could not measure loudness')}: {err}")
+            self.signal.emit(self.video.uuid, str(err))
         else:
-            if result.returncode != 0:
-                self.main.thread_logging_signal.emit(
-                    f"WARNING:{t('Could not extract subtitle track')} "
-                    f"{self.index}: {result.stdout.decode('utf-8', errors='ignore')}"
-                )
-            else:
-                self.main.thread_logging_signal.emit(f"INFO:{t('Extracted subtitles successfully')}")
-        self.signal.emit()
+            self.signal.emit(self.video.uuid, measurements)
 
-    def _get_subtitle_format(self):
+
+class ResumeSegments(QtCore.QThread):
+    """Check which segments of a resumable encode are already done before it is sent to the worker"""
+
+    def __init__(self, main, video, config, signal):
+        super().__init__(main)
+        self.main = main
+        # Its own status, so the queued video only changes once the check is done
+        self.video = video.model_copy(update={"status": video.status.model_copy(deep=True)})
+        self.config = config
+        self.signal = signal
+        self.cancel_event = threading.Event()
+
+    def stop(self):
+        self.cancel_event.set()
+
+    def run(self):
         try:
-            result = run(
-                [
-                    self.app.fastflix.config.ffprobe,
-                    "-v",
-                    "error",
-                    "-select_streams",
-                    f"s:{self.index}",
-                    "-show_entries",
-                    "stream=codec_name",
-                    "-of",
-                    "default=noprint_wrappers=1:nokey=1",
-                    self.main.input_video,
-                ],
-                stdout=PIPE,
-                stderr=STDOUT,
-                text=True,
-            )
+            segments.resume(self.video, self.config)
+        except Exception:
+            logger.exception(f"{self.video.source.name}: {t('Could not check the finished segments')}")
+        if not self.cancel_event.is_set():
+            self.signal.emit(self.video.uuid, self.video.status)
 
-            if result.returncode != 0:
-                self.main.thread_logging_signal.emit(
-                    f"WARNING:{t('Could not probe subtitle track')} {self.index}: {result.stdout}"
-                )
-                return None
-
-            codec_name = result.stdout.strip().lower()
-            if codec_name in ["subrip", "xsub", "webvtt", "mov_text"]:
-                return "srt"
-            elif codec_name == "ass":
-                return "ass"
-            elif codec_name == "ssa":
-                return "ssa"
-            elif codec_name == "hdmv_pgs_subtitle":
-                return "pgs"
-            else:
+
+class ExtractSubtitles(QtCore.QThread):
+    """
+    Write any number of subtitle tracks out to their own files with a single read through the source,
+    using the codecs already found when the source was probed
+    """
+
+    def __init__(self, app: FastFlixApp, main, tracks: List[Tuple[int, SubtitleTrack]], signals: List):
+        super().__init__(main)
+        self.main = main
+        self.app = app
+        # (position in the subtitle list, track)
+        self.tracks = tracks
+        self.signals = signals
+
+    def run(self):
+        try:
+            self.extract()
+        finally:
+            for signal in self.signals:
+                signal.emit()
+
+    def extract(self):
+        outputs = []
+        for position, track in self.tracks:
+            codec_name = (track.raw_info or {}).get("codec_name", "").lower()
+            if codec_name not in subtitle_extract_formats:
                 self.main.thread_logging_signal.emit(
-                    f"WARNING:{t('Subtitle Track')} {self.index} {t('is not in supported format (SRT, ASS, SSA, PGS), skipping extraction')}: {codec_name}"
+                    f"WARNING:{t('Subtitle Track')} {position} "
+                    f"{t('is not in supported format (SRT, ASS, SSA, PGS), skipping extraction')}: {codec_name}"
                 )
-                return None
+                continue
+            extension = subtitle_extract_formats[codec_name][0]
+            filename = str(
+                Path(self.main.output_video).parent / f"{self.main.output_video}.{position}.{track.language}.{extension}"
+            ).replace("\\", "/")
+            self.main.thread_logging_signal.emit(f"INFO:{t('Extracting subtitles to')} {filename}")
+            outputs.append((track.index, codec_name, filename))
+        if not outputs:
+            return
 
+        command = subtitle_extraction_command(self.app.fastflix.config.ffmpeg, self.main.input_video, outputs)
+        logger.debug(f"Extracting subtitles: {command}")
+        duration = self.app.fastflix.current_video.duration if self.app.fastflix.current_video else 0
+        try:
+            process = Popen(command, stdout=PIPE, stderr=PIPE, stdin=PIPE, text=True, errors="ignore")
+            reported = 0
+            for line in process.stdout:
+                if not line.startswith("out_time_us=") or not duration:
+                    continue
+                try:
+                    percent = int(int(line.split("=", 1)[1]) / 10_000 / duration)
+                except ValueError:
+                    continue
+                # Subtitle timestamps are sparse, so only log every tenth of the way through
+                if percent // 10 > reported // 10 and percent < 100:
+                    reported = percent
+                    self.main.thread_logging_signal.emit(f"INFO:{t('Extracting subtitles')} {percent}%")
+            errors = process.stderr.read()
+            returncode = process.wait()
         except Exception as err:
-            self.main.thread_logging_signal.emit(
-                f"WARNING:{t('Error checking subtitle format for track')} {self.index} - {err}"
+            self.main.thread_logging_signal.emit(f"ERROR:{t('Could not extract subtitle tracks')} - {err}")
+            return
+        if returncode != 0:
+            self.main.thread_logging_signal.emit(f"WARNING:{t('Could not extract subtitle tracks')}: {errors}")
+        else:
+            self.main.thread_logging_signal.emit(f"INFO:{t('Extracted subtitles successfully')}")
+
+
+class ExtractCovers(QtCore.QThread):
+    """Pull the cover images out of a newly loaded source without holding up the rest of the load"""
+
+    def __init__(
+        self, main, ffmpeg: Path, source: Path, attachments: List[Tuple[int, str]], work_dir: Path, cache, signal
+    ):
+        super().__init__(main)
+        self.main = main
+        self.ffmpeg = ffmpeg
+        self.source = source
+        self.attachments = attachments
+        self.work_dir = work_dir
+        self.cache = cache
+        self.signal = signal
+        self.cancel_event = threading.Event()
+
+    def stop(self):
+        self.cancel_event.set()
+
+    def run(self):
+        try:
+            extracted = extract_attachments(
+                self.ffmpeg, self.source, self.attachments, self.work_dir, self.cache, self.cancel_event
             )
+        except Exception as err:
+            logger.warning(f"{t('Could not extract covers')}: {err}")
+            extracted = []
+        if not self.cancel_event.is_set():
+            self.signal.emit(str(self.work_dir), extracted)
+
+
+class BatchAdd(QtCore.QThread):
+    """
+    Turn many sources into queue ready videos with one profile, loading several at once.
+    Finished videos are handed back in source order, a batch at a time, so the queue is saved
+    and redrawn once per batch instead of once per video.
+    """
+
+    def __init__(
+        self,
+        main,
+        fastflix,
+        paths: List[Path],
+        profile: Profile,
+        work_path: Callable[[], Path],
+        cache,
+        batch_signal,
+        progress_signal,
+        workers: int = 4,
+        batch_size: int = 25,
+    ):
+        super().__init__(main)
+        self.main = main
+        self.fastflix = fastflix
+        self.paths = paths
+        self.profile = profile
+        self.work_path = work_path
+        self.cache = cache
+        self.batch_signal = batch_signal
+        self.progress_signal = progress_signal
+        self.workers = workers
+        self.batch_size = batch_size
+        self.cancel_event = threading.Event()
+
+    def stop(self):
+        self.cancel_event.set()
+
+    def load(self, path: Path):
+        if self.cancel_event.is_set():
+            return None
+        try:
+            return build_video(self.fastflix, path, self.profile, self.work_path(), attachment_cache=self.cache)
+        except Exception:
+            logger.exception(f"{t('Could not load video')} {path}")
             return None
 
+    def run(self):
+        batch = []
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="batch_add") as pool:
+            futures = [pool.submit(self.load, path) for path in self.paths]
+            for done, future in enumerate(futures, start=1):
+                if self.cancel_event.is_set():
+                    for pending in futures:
+                        pending.cancel()
+                    return
+                video = future.result()
+                if video:
+                    batch.append(video)
+                if len(batch) >= self.batch_size:
+                    self.batch_signal.emit(batch)
+                    batch = []
+                self.progress_signal.emit(int(done / len(futures) * 100))
+        if batch:
+            self.batch_signal.emit(batch)
+
 
 class AudioNoramlize(QtCore.QThread):
     def __init__(self, app: FastFlixApp, main, audio_type, signal):
@@ -198,6 +557,10 @@ class ExtractHDR10(QtCore.QThread):
         self.app = app
         self.signal = signal
         self.ffmpeg_signal = ffmpeg_signal
+        self.cancel_event = threading.Event()
+
+    def stop(self):
+        self.cancel_event.set()
 
     def run(self):
         if not self.app.fastflix.current_video.hdr10_plus:
@@ -217,61 +580,16 @@ class ExtractHDR10(QtCore.QThread):
 
         self.ffmpeg_signal.emit("Extracting HDR10+ metadata")
 
-        hdr10_parser_version_output = check_output(
-            [str(self.app.fastflix.config.hdr10plus_parser), "--version"], encoding="utf-8"
-        )
-        _, version_string = hdr10_parser_version_output.rsplit(sep=" ", maxsplit=1)
-        hdr10_parser_version = version.parse(version_string)
-        self.main.thread_logging_signal.emit(f"Using HDR10 parser version {str(hdr10_parser_version).strip()}")
-
-        ffmpeg_command = [
-            str(self.app.fastflix.config.ffmpeg),
-            "-y",
-            "-i",
-            clean_file_string(self.app.fastflix.current_video.source),
-            "-map",
-            f"0:{track}",
-            "-c:v",
-            "copy",
-            "-bsf:v",
-            "hevc_mp4toannexb",
-            "-f",
-            "hevc",
-            "-",
-        ]
-
-        hdr10_parser_command = [str(self.app.fastflix.config.hdr10plus_parser), "-o", clean_file_string(output), "-"]
-        if hdr10_parser_version >= version.parse("1.0.0"):
-            hdr10_parser_command.insert(1, "extract")
-
-        self.main.thread_logging_signal.emit(
-            f"Running command: {' '.join(ffmpeg_command)} | {' '.join(hdr10_parser_command)}"
-        )
-
-        process = Popen(
-            ffmpeg_command,
-            stdout=PIPE,
-            stderr=open(self.app.fastflix.current_video.work_path / "hdr10extract_out.txt", "wb"),
-            # stdin=PIPE,  # FFmpeg can try to read stdin and wrecks havoc
-        )
-
-        process_two = Popen(
-            hdr10_parser_command,
-            stdout=PIPE,
-            stderr=PIPE,
-            stdin=process.stdout,
-            encoding="utf-8",
-            cwd=str(self.app.fastflix.current_video.work_path),
-        )
-
-        with open(self.app.fastflix.current_video.work_path / "hdr10extract_out.txt", "r", encoding="utf-8") as f:
-            while True:
-                if process.poll() is not None or process_two.poll() is not None:
-                    break
-                if line := f.readline().rstrip():
-                    if line.startswith("frame"):
-                        self.ffmpeg_signal.emit(line)
-
-        stdout, stderr = process_two.communicate()
-        self.main.thread_logging_signal.emit(f"DEBUG: HDR10+ Extract: {stdout}")
+        try:
+            extract_hdr10plus_metadata(
+                self.app.fastflix.config,
+                self.app.fastflix.current_video.source,
+                track,
+                output,
+                cache=getattr(self.main, "hdr10plus_cache", None),
+                progress=self.ffmpeg_signal.emit,
+                cancel_event=self.cancel_event,
+            )
+        except Exception as err:
+            self.main.thread_logging_signal.emit(f"ERROR:{t('Could not extract HDR10+ metadata')}: {err}")
         self.signal.emit(str(output))
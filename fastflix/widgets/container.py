@@ -38,6 +38,7 @@ from fastflix.widgets.progress_bar import ProgressBar, Task
 from fastflix.widgets.settings import Settings
 from fastflix.widgets.windows.concat import ConcatWindow
 from fastflix.widgets.windows.multiple_files import MultipleFilesWindow
+from fastflix.widgets.windows.watch_folders import WatchFoldersWindow
 
 # from fastflix.widgets.windows.hdr10plus_inject import HDR10PlusInjectWindow
 
@@ -152,8 +153,10 @@ class Container(QtWidgets.QMainWindow):
                 a0.ignore()
                 return
 
+        # Queued videos can be resumed later, so keep what they have in their work folders
+        queued = {video.work_path for video in self.app.fastflix.conversion_list if not video.status.complete}
         for item in self.app.fastflix.config.work_path.iterdir():
-            if item.is_dir() and item.stem.startswith("temp_"):
+            if item.is_dir() and item.stem.startswith("temp_") and item not in queued:
                 try:
                     date_part = item.stem.split("_")[1]
                     if is_date_older_than_7days(parse_filesafe_datetime(date_part)):
@@ -230,6 +233,14 @@ class Container(QtWidgets.QMainWindow):
         concat_action.triggered.connect(self.show_concat)
         tools_menu.addAction(concat_action)
 
+        quality_check_action = QAction(self.si(QtWidgets.QStyle.SP_DialogApplyButton), t("Quick Quality Check"), self)
+        quality_check_action.triggered.connect(lambda: self.main.quality_check())
+        tools_menu.addAction(quality_check_action)
+
+        watch_folders_action = QAction(self.si(QtWidgets.QStyle.SP_DirLinkIcon), t("Watch Folders"), self)
+        watch_folders_action.triggered.connect(self.show_watch_folders)
+        tools_menu.addAction(watch_folders_action)
+
         # hdr10p_inject_action = QAction(
         #     QtGui.QIcon(get_icon("onyx-queue", self.app.fastflix.config.theme)), t("HDR10+ Inject"), self
         # )
@@ -297,6 +308,10 @@ class Container(QtWidgets.QMainWindow):
         self.concat = ConcatWindow(app=self.app, main=self.main)
         self.concat.show()
 
+    def show_watch_folders(self):
+        self.watch_folders = WatchFoldersWindow(app=self.app, main=self.main)
+        self.watch_folders.show()
+
     # def show_hdr10p_inject(self):
     #     self.hdr10p_inject = HDR10PlusInjectWindow(app=self.app, main=self.main)
     #     self.hdr10p_inject.show()
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+from typing import List, TYPE_CHECKING
+
+from PySide6 import QtCore, QtGui, QtWidgets
+
+if TYPE_CHECKING:
+    from fastflix.widgets.main import Main
+
+__all__ = ["FilmStrip"]
+
+
+class FilmStrip(QtWidgets.QLabel):
+    """Row of evenly spaced thumbnails across the source, clicking one jumps the preview slider to it"""
+
+    def __init__(self, parent: "Main", height: int = 36):
+        super().__init__()
+        self.main = parent
+        self.tiles: List[QtGui.QImage] = []
+        self.positions: List[int] = []
+        self.setFixedHeight(height)
+        self.setMinimumWidth(200)
+        self.setSizePolicy(QtWidgets.QSizePolicy.Ignored, QtWidgets.QSizePolicy.Fixed)
+        self.setAlignment(QtCore.Qt.AlignCenter)
+        self.setCursor(QtGui.QCursor(QtCore.Qt.PointingHandCursor))
+
+    def set_tiles(self, tiles: List[QtGui.QImage], positions: List[int]):
+        self.tiles = tiles
+        self.positions = positions
+        self.draw()
+
+    def clear(self):
+        self.tiles = []
+        self.positions = []
+        super().clear()
+
+    def draw(self):
+        if not self.tiles:
+            super().clear()
+            return
+        tile_width = self.width() // len(self.tiles)
+        strip = QtGui.QPixmap(tile_width * len(self.tiles), self.height())
+        strip.fill(QtCore.Qt.black)
+        painter = QtGui.QPainter(strip)
+        for i, tile in enumerate(self.tiles):
+            scaled = tile.scaled(tile_width, self.height(), QtCore.Qt.KeepAspectRatio, QtCore.Qt.SmoothTransformation)
+            painter.drawImage(
+                i * tile_width + (tile_width - scaled.width()) // 2, (self.height() - scaled.height()) // 2, scaled
+            )
+        painter.end()
+        self.setPixmap(strip)
+
+    def resizeEvent(self, event: QtGui.QResizeEvent):
+        super().resizeEvent(event)
+        self.draw()
+
+    def mousePressEvent(self, event: QtGui.QMouseEvent):
+        if not self.positions:
+            return
+        index = min(int(event.position().x() * len(self.positions) / max(self.width(), 1)), len(self.positions) - 1)
+        self.main.select_thumbnail_position(self.positions[index])
+        super().mousePressEvent(event)
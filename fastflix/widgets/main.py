@@ -1,13 +1,12 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-import datetime
 import logging
-import math
 import os
 import random
 import secrets
 import shutil
 import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
 from pathlib import Path
 from typing import Tuple, Union, Optional
@@ -19,21 +18,32 @@ from box import Box
 from pydantic import ConfigDict, BaseModel, Field
 from PySide6 import QtCore, QtGui, QtWidgets
 
+from fastflix import ladder, segments
+from fastflix.cache import FileCache, cache_key, source_identity
+from fastflix.command_graph import all_finished, finish_command
 from fastflix.encoders.common import helpers
 from fastflix.exceptions import FastFlixInternalException, FlixError
+from fastflix.first_pass import first_pass_cache, reuse_first_pass, store_first_pass
+from fastflix.ff_queue import save_queue
+from fastflix.frame_server import FrameServer
 from fastflix.flix import (
+    auto_crop_times,
     detect_hdr10_plus,
     detect_interlaced,
-    extract_attachments,
+    cover_attachments,
+    generate_filmstrip_command,
     generate_thumbnail_command,
     get_auto_crop,
     parse,
     parse_hdr_details,
-    get_concat_item,
+    probe,
+    select_auto_crop,
 )
 from fastflix.language import t
 from fastflix.models.fastflix_app import FastFlixApp
 from fastflix.models.video import Status, Video, VideoSettings, Crop
+from fastflix.planner import build_video, output_name
+from fastflix.queue_scheduler import next_video
 from fastflix.resources import (
     get_icon,
     group_box_style,
@@ -42,6 +52,7 @@ from fastflix.resources import (
     onyx_queue_add_icon,
     get_text_color,
 )
+from fastflix.sample_encode import TargetQualityResult, apply_rate
 from fastflix.shared import (
     error_message,
     message,
@@ -50,14 +61,30 @@ from fastflix.shared import (
     clean_file_string,
     get_filesafe_datetime,
 )
+from fastflix.watch_folder import FolderWatcher
 from fastflix.windows_tools import prevent_sleep_mode, allow_sleep_mode
-from fastflix.widgets.background_tasks import ThumbnailCreator
+from fastflix.widgets.background_tasks import (
+    PreviewScheduler,
+    EstimateEncode,
+    QualityCheck,
+    TargetQualitySearch,
+    LoudnessAnalysis,
+    ExtractCovers,
+    ExtractHDR10,
+    ResumeSegments,
+    BatchAdd,
+    ThumbnailPrefetcher,
+    lower_process_priority,
+)
+from fastflix.widgets.film_strip import FilmStrip
 from fastflix.widgets.progress_bar import ProgressBar, Task
 from fastflix.widgets.video_options import VideoOptions
 from fastflix.widgets.windows.large_preview import LargePreview
 
 logger = logging.getLogger("fastflix")
 
+filmstrip_tiles = 10
+
 root = os.path.abspath(os.path.dirname(__file__))
 
 only_int = QtGui.QIntValidator()
@@ -133,6 +160,7 @@ class MainWidgets(BaseModel):
     remove_hdr: QtWidgets.QCheckBox = None
     profile_box: QtWidgets.QComboBox = None
     thumb_time: QtWidgets.QSlider = None
+    film_strip: FilmStrip = None
     thumb_key: QtWidgets.QCheckBox = None
     resolution_drop_down: QtWidgets.QComboBox = None
     resolution_custom: QtWidgets.QLineEdit = None
@@ -158,10 +186,18 @@ class MainWidgets(BaseModel):
 
 class Main(QtWidgets.QWidget):
     completed = QtCore.Signal(int)
-    thumbnail_complete = QtCore.Signal(int)
     close_event = QtCore.Signal()
     status_update_signal = QtCore.Signal(tuple)
     thread_logging_signal = QtCore.Signal(str)
+    quality_check_signal = QtCore.Signal(object)
+    target_quality_signal = QtCore.Signal(str, object)
+    estimate_signal = QtCore.Signal(str, object)
+    loudness_signal = QtCore.Signal(str, object)
+    segments_signal = QtCore.Signal(str, object)
+    covers_signal = QtCore.Signal(str, object)
+    queue_video_signal = QtCore.Signal(object, bool)
+    batch_add_signal = QtCore.Signal(object)
+    remote_request_signal = QtCore.Signal(tuple)
 
     def __init__(self, parent, app: FastFlixApp):
         super().__init__(parent)
@@ -246,7 +282,34 @@ class Main(QtWidgets.QWidget):
 
         self.buttons = []
 
-        self.thumb_file = Path(self.app.fastflix.config.work_path, "thumbnail_preview.jpg")
+        self.thumbnail_cache = self.create_thumbnail_cache()
+        self.thumbnail_prefetcher = None
+        self.preview_scheduler = PreviewScheduler(self, name="thumbnail")
+        self.preview_scheduler.completed.connect(self.thumbnail_generated)
+        self.filmstrip_scheduler = PreviewScheduler(self, name="filmstrip")
+        self.filmstrip_scheduler.completed.connect(self.filmstrip_generated)
+        self.filmstrip_keys = []
+        self.cover_extractor = None
+        self.queued_cover_tracks = None
+        self.attachment_cache = FileCache(self.app.fastflix.config.work_path / "attachment_cache", 50_000_000)
+        self.first_pass_cache = first_pass_cache(self.app.fastflix.config.work_path)
+        self.hdr10plus_cache = FileCache(
+            self.app.fastflix.config.work_path / "hdr10plus_cache", 500_000_000, suffix=".json"
+        )
+        self.frame_server: Optional[FrameServer] = None
+        self.current_thumb_key = None
+        # Set before the queue panel is created, as it restarts any searches left in the saved queue
+        self.target_quality_worker = None
+        self.target_quality_pending = []
+        self.target_quality_cache = {}
+        self.estimate_worker = None
+        self.estimate_pending = []
+        self.loudness_worker = None
+        self.segment_checker = None
+        self.loudness_pending = []
+        self.loudness_cache = FileCache(
+            self.app.fastflix.config.work_path / "loudness_cache", 1_000_000, suffix=".json"
+        )
 
         self.video_options = VideoOptions(
             self,
@@ -257,9 +320,25 @@ class Main(QtWidgets.QWidget):
         # self.completed.connect(self.conversion_complete)
         # self.cancelled.connect(self.conversion_cancelled)
         self.close_event.connect(self.close)
-        self.thumbnail_complete.connect(self.thumbnail_generated)
         self.status_update_signal.connect(self.status_update)
         self.thread_logging_signal.connect(self.thread_logger)
+        self.quality_check_signal.connect(self.quality_check_complete)
+        self.quality_checker = None
+        self.target_quality_signal.connect(self.target_quality_complete)
+        self.estimate_signal.connect(self.estimate_complete)
+        self.loudness_signal.connect(self.loudness_complete)
+        self.segments_signal.connect(self.segments_checked)
+        self.covers_signal.connect(self.covers_extracted)
+        self.folder_watcher = None
+        self.watch_folder_notifier = QtCore.QFileSystemWatcher(self)
+        self.watch_folder_notifier.directoryChanged.connect(self.wake_folder_watcher)
+        # Sources added through the control API are loaded here, a couple at a time
+        self.remote_loader = ThreadPoolExecutor(max_workers=2, thread_name_prefix="remote_add")
+        self.queue_video_signal.connect(self.queue_loaded_video)
+        self.batch_adder = None
+        self.batch_progress = None
+        self.batch_add_signal.connect(self.batch_added)
+        self.remote_request_signal.connect(self.remote_request)
         self.encoding_worker = None
         self.command_runner = None
         self.side_data = Box()
@@ -296,6 +375,7 @@ class Main(QtWidgets.QWidget):
         self.initialized = True
         self.loading_video = False
         self.last_page_update = time.time()
+        self.start_folder_watch()
 
     def fade_loop(self, percent=90):
         if self.input_video:
@@ -395,6 +475,8 @@ class Main(QtWidgets.QWidget):
         return top_bar_right
 
     def init_thumb_time_selector(self):
+        self.widgets.film_strip = FilmStrip(self)
+
         layout = QtWidgets.QHBoxLayout()
 
         self.widgets.thumb_key = QtWidgets.QCheckBox("Keyframe")
@@ -409,6 +491,7 @@ class Main(QtWidgets.QWidget):
         self.widgets.thumb_time.setTickInterval(1)
         self.widgets.thumb_time.setAutoFillBackground(False)
         self.widgets.thumb_time.sliderReleased.connect(self.thumb_time_change)
+        self.widgets.thumb_time.sliderMoved.connect(self.thumb_time_scrub)
 
         spacer = QtWidgets.QLabel()
         spacer.setFixedWidth(4)
@@ -417,11 +500,30 @@ class Main(QtWidgets.QWidget):
         layout.addWidget(spacer)
         layout.addWidget(self.widgets.thumb_time)
         layout.addWidget(spacer)
-        return layout
+
+        selector = QtWidgets.QVBoxLayout()
+        selector.addWidget(self.widgets.film_strip)
+        selector.addLayout(layout)
+        return selector
 
     def thumb_time_change(self):
         self.generate_thumbnail()
 
+    def thumb_time_scrub(self, thumb_time: int):
+        """While dragging, show the closest keyframe the preview frame server already has"""
+        server = self.preview_frame_server()
+        if not server:
+            return
+        frame = server.frame(self.thumbnail_source(thumb_time)[1])
+        if frame:
+            pixmap = QtGui.QPixmap()
+            pixmap.loadFromData(frame)
+            self.set_preview_pixmap(pixmap)
+
+    def select_thumbnail_position(self, thumb_time: int):
+        self.widgets.thumb_time.setValue(thumb_time)
+        self.generate_thumbnail()
+
     def get_temp_work_path(self):
         new_temp = self.app.fastflix.config.work_path / f"temp_{get_filesafe_datetime()}_{secrets.token_hex(8)}"
         if new_temp.exists():
@@ -443,8 +545,17 @@ class Main(QtWidgets.QWidget):
             self.widgets.pause_resume.setStyleSheet("background-color: orange;")
             logger.info("Resuming FFmpeg conversion")
 
+    def create_thumbnail_cache(self) -> FileCache:
+        return FileCache(
+            Path(self.app.fastflix.config.work_path, "thumbnail_cache"),
+            max_size=self.app.fastflix.config.thumbnail_cache_size * 1024 * 1024,
+            suffix=".jpg",
+        )
+
     def config_update(self):
-        self.thumb_file = Path(self.app.fastflix.config.work_path, "thumbnail_preview.jpg")
+        self.stop_thumbnail_prefetch()
+        self.stop_frame_server()
+        self.thumbnail_cache = self.create_thumbnail_cache()
         self.change_output_types()
         self.page_update(build_thumbnail=True)
 
@@ -1141,6 +1252,13 @@ class Main(QtWidgets.QWidget):
         self.page_update()
 
     def open_many(self, paths: list):
+        """
+        Add every video to the queue with the selected profile. They are loaded and
+        have their commands built in the background, a few at a time, without using the main window.
+        """
+        if self.batch_adder and self.batch_adder.isRunning():
+            error_message(t("Videos are still being added to the queue"))
+            return
         if self.app.fastflix.current_video:
             discard = yes_no_message(
                 f"{t('There is already a video being processed')}<br>{t('Are you sure you want to discard it?')}",
@@ -1148,42 +1266,163 @@ class Main(QtWidgets.QWidget):
             )
             if not discard:
                 return
+            self.clear_current_video()
 
-        def open_em(signal, stop_signal, paths, **_):
-            stop = False
+        profile_name = self.app.fastflix.config.selected_profile
+        logger.info(f"Adding {len(paths)} videos to the queue with profile {profile_name}")
 
-            def stop_me():
-                nonlocal stop
-                stop = True
+        self.batch_progress = ProgressBar(self.app, [], signal_task=True, auto_run=False, can_cancel=True)
+        self.batch_progress.status.setText(t("Loading Videos"))
+        self.batch_adder = BatchAdd(
+            self,
+            self.app.fastflix,
+            paths,
+            self.app.fastflix.config.profiles[profile_name],
+            work_path=self.get_temp_work_path,
+            cache=self.attachment_cache,
+            batch_signal=self.batch_add_signal,
+            progress_signal=self.batch_progress.progress_signal,
+            workers=min(4, os.cpu_count() or 1),
+        )
+        self.batch_progress.progress_signal.connect(self.batch_progress.update_progress)
+        self.batch_progress.stop_signal.connect(self.batch_adder.stop)
+        self.batch_adder.finished.connect(self.batch_add_done)
+        self.batch_adder.start()
+
+    def batch_added(self, videos: list):
+        """Commit a batch of loaded videos to the queue, saving and redrawing it once for the whole batch"""
+        queueable = []
+        for video in videos:
+            try:
+                self.video_options.queue.check_queueable(video)
+                if any(video.video_settings.output_path == other.video_settings.output_path for other in queueable):
+                    raise FastFlixInternalException(
+                        f"{video.video_settings.output_path} {t('out file is already in queue')}"
+                    )
+            except FastFlixInternalException as err:
+                logger.warning(f"{t('Not adding')} {video.source}: {err}")
+            else:
+                queueable.append(video)
+        if not queueable:
+            return
+        self.video_options.queue.enqueue(queueable)
+        self.video_options.update_queue()
+        self.video_options.show_queue()
 
-            stop_signal.connect(stop_me)
+    def batch_add_done(self):
+        if self.batch_progress:
+            self.batch_progress.close()
+            self.batch_progress = None
+        self.batch_adder = None
+
+    def start_folder_watch(self):
+        """(Re)start watching the configured watch folders, called again whenever they are changed"""
+        self.stop_folder_watch()
+        folders = {}
+        for folder, profile in self.app.fastflix.config.watch_folders.items():
+            if not Path(folder).is_dir():
+                logger.warning(f"Watch folder {folder} does not exist, skipping it")
+                continue
+            folders[Path(folder)] = profile
+        if not folders:
+            return
+        self.folder_watcher = FolderWatcher(
+            folders,
+            probe_file=lambda path: probe(self.app, path),
+            found=self.watched_video_found,
+        )
+        self.folder_watcher.start()
+        # Scans straight away on native notifications where there are any, the watcher still polls either way
+        self.watch_folder_notifier.addPaths([str(folder) for folder in folders])
+        logger.info(f"Watching for new videos in {', '.join(str(folder) for folder in folders)}")
+
+    def stop_folder_watch(self):
+        if self.folder_watcher:
+            self.folder_watcher.stop()
+            self.folder_watcher = None
+        if self.watch_folder_notifier.directories():
+            self.watch_folder_notifier.removePaths(self.watch_folder_notifier.directories())
+
+    def wake_folder_watcher(self, _):
+        if self.folder_watcher:
+            self.folder_watcher.wake()
+
+    def watched_video_found(self, path: Path, profile: str, details: Box):
+        """Called in the folder watcher's pool, so the video is built there from the probe it already made"""
+        # Our own encodes can be set to land in a watched folder
+        outputs = {video.video_settings.output_path.resolve() for video in list(self.app.fastflix.conversion_list)}
+        if path.resolve() in outputs:
+            return
+        self.load_for_queue(path, profile, details=details)
 
-            total_items = len(paths)
-            for i, path in enumerate(paths):
-                if stop:
-                    return
-                self.input_video = path
-                self.source_video_path_widget.setText(str(self.input_video))
-                self.video_path_widget.setText(str(self.input_video))
-                try:
-                    self.update_video_info(hide_progress=True)
-                except Exception:
-                    logger.exception(f"Could not load video {self.input_video}")
-                else:
-                    self.page_update(build_thumbnail=False)
-                    self.add_to_queue()
-                signal.emit(int((i / total_items) * 100))
+    def load_for_queue(
+        self,
+        path: Path,
+        profile: str,
+        start: bool = False,
+        schedule: Optional[dict] = None,
+        details: Optional[Box] = None,
+    ):
+        """Build a queue ready video away from the GUI thread, it is added to the queue by queue_loaded_video"""
+        if self.app.fastflix.shutting_down:
+            return
+        config = self.app.fastflix.config
+        if profile not in config.profiles:
+            logger.warning(f'Profile "{profile}" no longer exists, adding {path} with "{config.selected_profile}"')
+            profile = config.selected_profile
+        try:
+            video = build_video(
+                self.app.fastflix,
+                path,
+                config.profiles[profile],
+                self.get_temp_work_path(),
+                attachment_cache=self.attachment_cache,
+                details=details,
+            )
+        except Exception:
+            logger.exception(f"{t('Could not load video')} {path}")
+            return
+        for name, value in (schedule or {}).items():
+            setattr(video, name, value)
+        self.queue_video_signal.emit(video, start)
 
-        self.disable_all()
-        ProgressBar(self.app, [Task(t("Loading Videos"), open_em, {"paths": paths})], signal_task=True, can_cancel=True)
-        self.enable_all()
+    def queue_loaded_video(self, video: Video, start: bool):
+        """Add a video built by load_for_queue, leaving whatever is open in the window as it is"""
+        try:
+            self.video_options.queue.check_queueable(video)
+        except FastFlixInternalException as err:
+            logger.warning(f"{t('Not adding')} {video.source}: {err}")
+            return
+        logger.info(f"Added {video.source} to the queue")
+        self.video_options.queue.enqueue([video])
+        self.video_options.update_queue()
+        if start:
+            self.start_queue()
+
+    def remote_request(self, request: tuple):
+        """Requests made through the control API, which are passed along by the worker process"""
+        if request[0] == "enqueue":
+            _, path, profile, start, schedule = request
+            logger.info(f"Adding {path} to the queue from the control API")
+            # The queue is only started once the video is in it, so a source that fails to load starts nothing
+            self.remote_loader.submit(
+                self.load_for_queue, Path(path), profile or self.app.fastflix.config.selected_profile, start, schedule
+            )
+        elif request[0] == "start queue":
+            self.start_queue()
+        elif request[0] in ("pause encode", "resume encode"):
+            self.video_options.queue.set_encode_paused(request[0] == "pause encode")
+
+    def start_queue(self):
+        """Start converting the queue if it is not already, without asking anything"""
+        if self.app.fastflix.currently_encoding or self.app.fastflix.conversion_paused:
+            return
+        if self.send_next_video():
+            self.disable_all()
+            self.video_options.show_status()
 
     @property
     def generate_output_filename(self):
-        source = self.input_video.stem
-        iso_datetime = datetime.datetime.now().isoformat().replace(":", "-").split(".")[0]
-        rand_4 = secrets.token_hex(2)
-        rand_8 = secrets.token_hex(4)
         out_loc = f"{Path('~').expanduser()}{os.sep}"
         if tx := self.widgets.output_directory.text():
             out_loc = f"{tx}{os.sep}"
@@ -1192,9 +1431,7 @@ class Main(QtWidgets.QWidget):
         if self.app.fastflix.config.output_directory:
             out_loc = f"{self.app.fastflix.config.output_directory}{os.sep}"
 
-        gen_string = self.app.fastflix.config.output_name_format or "{source}-fastflix-{rand_4}"
-
-        return out_loc, gen_string.format(source=source, datetime=iso_datetime, rand_4=rand_4, rand_8=rand_8, ext="")
+        return out_loc, output_name(self.app.fastflix.config, self.input_video)
 
     @property
     def output_video(self):
@@ -1231,20 +1468,9 @@ class Main(QtWidgets.QWidget):
         if not self.input_video or not self.initialized or self.loading_video:
             return
 
-        start_pos = self.start_time or self.app.fastflix.current_video.duration // 10
-
-        blocks = math.ceil(
-            (self.app.fastflix.current_video.duration - start_pos) / (self.app.fastflix.config.crop_detect_points + 1)
+        times = auto_crop_times(
+            self.app.fastflix.current_video.duration, self.app.fastflix.config.crop_detect_points, self.start_time
         )
-        if blocks < 1:
-            blocks = 1
-
-        times = [
-            x
-            for x in range(int(start_pos), int(self.app.fastflix.current_video.duration), blocks)
-            if x < self.app.fastflix.current_video.duration
-        ][: self.app.fastflix.config.crop_detect_points]
-
         if not times:
             return
 
@@ -1255,11 +1481,11 @@ class Main(QtWidgets.QWidget):
                 f"{t('Auto Crop - Finding black bars at')} {self.number_to_time(x)}",
                 get_auto_crop,
                 dict(
-                    source=self.source_material,
+                    source=self.source_at(x)[0],
                     video_width=self.app.fastflix.current_video.width,
                     video_height=self.app.fastflix.current_video.height,
                     input_track=self.original_video_track,
-                    start_time=x,
+                    start_time=self.source_at(x)[1],
                     end_time=self.end_time,
                     result_list=result_list,
                 ),
@@ -1267,26 +1493,14 @@ class Main(QtWidgets.QWidget):
             for x in times
         ]
         ProgressBar(self.app, tasks)
-        if not result_list:
-            logger.warning("Autocrop did not return crop points, please use a ffmpeg version with cropdetect filter")
+        selected = select_auto_crop(
+            result_list, self.app.fastflix.current_video.width, self.app.fastflix.current_video.height
+        )
+        if not selected:
             return
 
-        smallest = (self.app.fastflix.current_video.height + self.app.fastflix.current_video.width) * 2
-        selected = result_list[0]
-        for result in result_list:
-            if (total := sum(result)) < smallest:
-                selected = result
-                smallest = total
-
         r, b, l, tp = selected  # noqa: E741
 
-        if tp + b > self.app.fastflix.current_video.height * 0.9 or r + l > self.app.fastflix.current_video.width * 0.9:
-            logger.warning(
-                f"{t('Autocrop tried to crop too much')}"
-                f" ({t('left')} {l}, {t('top')} {tp}, {t('right')} {r}, {t('bottom')} {b}), {t('ignoring')}"
-            )
-            return
-
         # Hack to stop thumb gen
         self.loading_video = True
         self.widgets.crop.top.setText(str(tp))
@@ -1385,6 +1599,7 @@ class Main(QtWidgets.QWidget):
 
     def clear_current_video(self):
         self.loading_video = True
+        self.stop_cover_extraction()
         self.app.fastflix.current_video = None
         self.input_video = None
         self.source_video_path_widget.setText("")
@@ -1415,6 +1630,14 @@ class Main(QtWidgets.QWidget):
         # self.widgets.scale.width.setText("0")
         # self.widgets.scale.height.setText("Auto")
         self.widgets.preview.setPixmap(QtGui.QPixmap())
+        self.stop_thumbnail_prefetch()
+        self.preview_scheduler.cancel()
+        self.filmstrip_scheduler.cancel()
+        self.large_preview.preview_scheduler.cancel()
+        self.current_thumb_key = None
+        self.filmstrip_keys = []
+        self.widgets.film_strip.clear()
+        self.stop_frame_server()
         self.video_options.clear_tracks()
         self.disable_all()
         self.loading_video = False
@@ -1433,7 +1656,8 @@ class Main(QtWidgets.QWidget):
 
         self.app.fastflix.current_video = video
         self.app.fastflix.current_video.work_path.mkdir(parents=True, exist_ok=True)
-        extract_attachments(app=self.app)
+        # Straight from the cache when the source has not changed since it was queued
+        self.start_cover_extraction(queued_tracks=[track.model_copy() for track in video.attachment_tracks])
         self.input_video = video.source
         self.source_video_path_widget.setText(str(self.input_video))
         hdr10_indexes = [x.index for x in self.app.fastflix.current_video.hdr10_streams]
@@ -1501,9 +1725,61 @@ class Main(QtWidgets.QWidget):
         self.loading_video = False
         self.page_update(build_thumbnail=True, force_build_thumbnail=True)
 
+    def start_cover_extraction(self, queued_tracks: Optional[list] = None):
+        """Extract the source's covers in the background, queued_tracks are the cover choices of a reloaded video"""
+        self.stop_cover_extraction()
+        self.queued_cover_tracks = queued_tracks
+        if self.app.fastflix.config.disable_cover_extraction:
+            return
+        covers = cover_attachments(self.app.fastflix.current_video.streams)
+        if not covers:
+            return
+        self.cover_extractor = ExtractCovers(
+            self,
+            self.app.fastflix.config.ffmpeg,
+            self.app.fastflix.current_video.source,
+            covers,
+            self.app.fastflix.current_video.work_path,
+            self.attachment_cache,
+            self.covers_signal,
+        )
+        self.cover_extractor.start()
+
+    def stop_cover_extraction(self):
+        if self.cover_extractor and self.cover_extractor.isRunning():
+            self.cover_extractor.stop()
+        self.cover_extractor = None
+
+    def stop_hdr10plus_extraction(self):
+        # Started by the encoder settings panels, which parent them to this window
+        for extractor in self.findChildren(ExtractHDR10):
+            if extractor.isRunning():
+                extractor.stop()
+                extractor.wait(2000)
+
+    def covers_extracted(self, work_path: str, files):
+        # Only still wanted if the same source is loaded
+        if (
+            not files
+            or not self.app.fastflix.current_video
+            or str(self.app.fastflix.current_video.work_path) != work_path
+            or not getattr(self.current_encoder, "enable_attachments", False)
+        ):
+            return
+        if self.queued_cover_tracks is not None:
+            # Passthrough covers can only be picked again now their images exist
+            self.video_options.attachments.reload_from_queue(
+                self.app.fastflix.current_video.streams, self.queued_cover_tracks
+            )
+        else:
+            self.video_options.attachments.new_source(self.app.fastflix.current_video.streams.attachment)
+        self.video_options.attachments.update_cover_settings()
+        self.page_update(build_thumbnail=False)
+
     @reusables.log_exception("fastflix", show_traceback=False)
     def update_video_info(self, hide_progress=False):
         self.loading_video = True
+        self.stop_cover_extraction()
         folder, name = self.generate_output_filename
         self.output_video_path_widget.setText(name)
         self.widgets.output_directory.setText(folder.rstrip("/").rstrip("\\"))
@@ -1512,7 +1788,6 @@ class Main(QtWidgets.QWidget):
         self.app.fastflix.current_video = Video(source=self.input_video, work_path=self.get_temp_work_path())
         tasks = [
             Task(t("Parse Video details"), parse),
-            Task(t("Extract covers"), extract_attachments),
             Task(t("Determine HDR details"), parse_hdr_details),
             Task(t("Detect HDR10+"), detect_hdr10_plus),
         ]
@@ -1586,6 +1861,7 @@ class Main(QtWidgets.QWidget):
 
         logger.info("Updating video info")
         self.video_options.new_source()
+        self.start_cover_extraction()
         self.enable_all()
         # self.widgets.convert_button.setDisabled(False)
         # self.widgets.convert_button.setStyleSheet("background-color:green;")
@@ -1648,11 +1924,7 @@ class Main(QtWidgets.QWidget):
         ticks = self.app.fastflix.current_video.duration / 100
         return (self.widgets.thumb_time.value() - 1) * ticks
 
-    @reusables.log_exception("fastflix", show_traceback=False)
-    def generate_thumbnail(self):
-        if not self.input_video or self.loading_video:
-            return
-
+    def thumbnail_filters(self, **filter_options) -> str:
         settings = self.app.fastflix.current_video.video_settings.model_dump()
 
         if (
@@ -1668,33 +1940,187 @@ class Main(QtWidgets.QWidget):
         # if self.app.fastflix.current_video.color_transfer == "arib-std-b67":
         #     custom_filters += ",select=eq(pict_type\\,I)"
 
-        filters = helpers.generate_filters(
+        return helpers.generate_filters(
             start_filters="select=eq(pict_type\\,I)" if self.widgets.thumb_key.isChecked() else None,
             custom_filters=custom_filters,
             enable_opencl=False,
+            **filter_options,
             **settings,
         )
 
+    def source_at(self, timestamp: float) -> Tuple[Path, float]:
+        """The file to read, and the time within it, for a time on the timeline of the whole source"""
+        if self.app.fastflix.current_video.concat and self.app.fastflix.current_video.concat_index:
+            return self.app.fastflix.current_video.concat_index.locate(timestamp)
+        return self.input_video, timestamp
+
+    def thumbnail_source(self, thumb_time: int) -> Tuple[Path, Optional[float]]:
+        if self.app.fastflix.current_video.concat and self.app.fastflix.current_video.concat_index:
+            return self.app.fastflix.current_video.concat_index.locate_fraction((thumb_time - 1) / 100)
+        return self.input_video, (thumb_time - 1) * self.app.fastflix.current_video.duration / 100
+
+    def thumbnail_key(self, source: Path, filters: str, start_time: Optional[float]) -> str:
+        input_track = self.app.fastflix.current_video.video_settings.selected_track
+        return cache_key(source_identity(source), filters, start_time, input_track)
+
+    def thumbnail_job(self, thumb_time: int) -> Tuple[str, list]:
+        """Cache key and ffmpeg command to render the preview for a given slider position"""
+        filters = self.thumbnail_filters()
+        source, start_time = self.thumbnail_source(thumb_time)
+
         thumb_command = generate_thumbnail_command(
             config=self.app.fastflix.config,
-            source=self.source_material,
-            output=self.thumb_file,
+            source=source,
+            output=None,
             filters=filters,
-            start_time=self.preview_place if not self.app.fastflix.current_video.concat else None,
+            start_time=start_time,
             input_track=self.app.fastflix.current_video.video_settings.selected_track,
         )
+        return self.thumbnail_key(source, filters, start_time), thumb_command
+
+    def preview_frame_server(self) -> Optional[FrameServer]:
+        if (
+            not self.app.fastflix.config.preview_frame_server
+            or not self.input_video
+            or self.loading_video
+            or self.app.fastflix.current_video.concat
+        ):
+            return None
+        filters = self.thumbnail_filters(raw_filters=True)
+        if self.frame_server and self.frame_server.source == self.input_video and self.frame_server.filters == filters:
+            return self.frame_server
+
+        # Any change to the filters means every keyframe has to go through the new chain
+        self.stop_frame_server()
+        self.frame_server = FrameServer(
+            ffmpeg=self.app.fastflix.config.ffmpeg,
+            source=self.input_video,
+            filters=filters,
+            duration=self.app.fastflix.current_video.duration,
+        )
         try:
-            self.thumb_file.unlink()
+            self.frame_server.start()
         except OSError:
-            pass
-        worker = ThumbnailCreator(self, thumb_command)
-        worker.start()
+            logger.exception("Could not start the preview frame server")
+            self.frame_server = None
+            return None
+        lower_process_priority(self.frame_server.process.pid)
+        return self.frame_server
+
+    def stop_frame_server(self):
+        if self.frame_server:
+            self.frame_server.stop()
+            self.frame_server = None
+
+    def filmstrip_positions(self) -> list:
+        low, high = self.widgets.thumb_time.minimum(), self.widgets.thumb_time.maximum()
+        return [round(low + i * (high - low) / (filmstrip_tiles - 1)) for i in range(filmstrip_tiles)]
+
+    def generate_filmstrip(self):
+        # Concatenated sources can change resolution between items, so they cannot be stacked together
+        if not self.input_video or self.loading_video or self.app.fastflix.current_video.concat:
+            self.filmstrip_scheduler.cancel()
+            self.filmstrip_keys = []
+            self.widgets.film_strip.clear()
+            return
+
+        positions = self.filmstrip_positions()
+        filters = self.thumbnail_filters()
+        start_times = [self.thumbnail_source(position)[1] for position in positions]
+        keys = [self.thumbnail_key(self.input_video, filters, start_time) for start_time in start_times]
+        if keys == self.filmstrip_keys:
+            return
+        self.filmstrip_keys = keys
+
+        # Tiles share their cache entries with the regular thumbnails, so a filmstrip is often already rendered
+        cached = [self.thumbnail_cache.read(key) for key in keys]
+        if all(cached):
+            self.filmstrip_scheduler.cancel()
+            self.widgets.film_strip.set_tiles([QtGui.QImage.fromData(tile) for tile in cached], positions)
+            return
+
+        tile_filters = [
+            self.thumbnail_filters(raw_filters=True, input_index=i, output_label=f"v{i}") for i in range(len(keys))
+        ]
+        command = generate_filmstrip_command(
+            config=self.app.fastflix.config,
+            source=self.input_video,
+            tile_filters=tile_filters,
+            start_times=start_times,
+        )
+        self.filmstrip_scheduler.submit(command)
+
+    @reusables.log_exception("fastflix", show_traceback=False)
+    def filmstrip_generated(self, status=0, job=None):
+        if status != 1 or not self.filmstrip_keys:
+            self.filmstrip_keys = []
+            self.widgets.film_strip.clear()
+            return
+
+        tile_width = job.image.width() // len(self.filmstrip_keys)
+        tiles = []
+        for i, key in enumerate(self.filmstrip_keys):
+            tile = job.image.copy(i * tile_width, 0, tile_width, job.image.height())
+            if key not in self.thumbnail_cache:
+                data = QtCore.QByteArray()
+                buffer = QtCore.QBuffer(data)
+                buffer.open(QtCore.QIODevice.WriteOnly)
+                tile.save(buffer, "JPG")
+                self.thumbnail_cache.store(key, bytes(data))
+            tiles.append(tile)
+        self.widgets.film_strip.set_tiles(tiles, self.filmstrip_positions())
+
+    @reusables.log_exception("fastflix", show_traceback=False)
+    def generate_thumbnail(self):
+        if not self.input_video or self.loading_video:
+            return
+
+        self.generate_filmstrip()
+
+        thumb_time = self.widgets.thumb_time.value()
+        key, thumb_command = self.thumbnail_job(thumb_time)
+        self.current_thumb_key = key
+
+        if key in self.thumbnail_cache:
+            self.preview_scheduler.cancel()
+            self.thumbnail_generated(1)
+            return
+
+        self.stop_thumbnail_prefetch()
+        self.preview_scheduler.submit(thumb_command, key=key)
+
+        server = self.preview_frame_server()
+        if server:
+            frame = server.frame(self.thumbnail_source(thumb_time)[1])
+            if frame:
+                # Closest keyframe as a stand in until the exact frame is rendered
+                pixmap = QtGui.QPixmap()
+                pixmap.loadFromData(frame)
+                self.set_preview_pixmap(pixmap)
+
+    def prefetch_thumbnails(self):
+        if not self.input_video or self.loading_video:
+            return
+        self.stop_thumbnail_prefetch()
+        thumb_time = self.widgets.thumb_time.value()
+        jobs = []
+        for neighbour in (thumb_time + 1, thumb_time - 1):
+            if self.widgets.thumb_time.minimum() <= neighbour <= self.widgets.thumb_time.maximum():
+                job = self.thumbnail_job(neighbour)
+                if job[0] not in self.thumbnail_cache:
+                    jobs.append(job)
+        if not jobs:
+            return
+        self.thumbnail_prefetcher = ThumbnailPrefetcher(self, self.thumbnail_cache, jobs)
+        self.thumbnail_prefetcher.start(QtCore.QThread.LowestPriority)
+
+    def stop_thumbnail_prefetch(self):
+        if self.thumbnail_prefetcher and self.thumbnail_prefetcher.isRunning():
+            self.thumbnail_prefetcher.stop()
 
     @property
     def source_material(self):
-        if self.app.fastflix.current_video.concat:
-            return get_concat_item(self.input_video, self.widgets.thumb_time.value())
-        return self.input_video
+        return self.thumbnail_source(self.widgets.thumb_time.value())[0]
 
     @staticmethod
     def thread_logger(text):
@@ -1705,18 +2131,31 @@ class Main(QtWidgets.QWidget):
             logger.warning(text)
 
     @reusables.log_exception("fastflix", show_traceback=False)
-    def thumbnail_generated(self, status=0):
+    def thumbnail_generated(self, status=0, job=None):
         if status == 2:
             self.app.fastflix.opencl_support = False
             self.generate_thumbnail()
             return
-        if status == 0 or not status or not self.thumb_file.exists():
+        if status == 0 or not status:
             self.widgets.preview.setText(t("Error Updating Thumbnail"))
             return
 
-        pixmap = QtGui.QPixmap(str(self.thumb_file))
-        pixmap = pixmap.scaled(420, 260, QtCore.Qt.KeepAspectRatio)
-        self.widgets.preview.setPixmap(pixmap)
+        if job:
+            self.thumbnail_cache.store(job.key, job.data)
+            pixmap = QtGui.QPixmap.fromImage(job.image)
+        else:
+            image = self.thumbnail_cache.read(self.current_thumb_key)
+            if not image:
+                self.widgets.preview.setText(t("Error Updating Thumbnail"))
+                return
+            pixmap = QtGui.QPixmap()
+            pixmap.loadFromData(image)
+
+        self.set_preview_pixmap(pixmap)
+        self.prefetch_thumbnails()
+
+    def set_preview_pixmap(self, pixmap: QtGui.QPixmap):
+        self.widgets.preview.setPixmap(pixmap.scaled(420, 260, QtCore.Qt.KeepAspectRatio))
 
     def resolution_method(self):
         return resolutions[self.widgets.resolution_drop_down.currentText()]["method"]
@@ -1778,13 +2217,235 @@ class Main(QtWidgets.QWidget):
             error_message(str(err))
             return False
 
-        commands = self.current_encoder.build(fastflix=self.app.fastflix)
+        commands = ladder.build(self.app.fastflix, self.current_encoder)
         if not commands:
             return False
         self.video_options.commands.update_commands(commands)
         self.app.fastflix.current_video.video_settings.conversion_commands = commands
         return True
 
+    def quality_check(self):
+        if self.quality_checker and self.quality_checker.isRunning():
+            if yes_no_message(t("A quality check is already running, stop it?"), title="Quality Check"):
+                self.quality_checker.stop()
+            return
+        if not self.input_video:
+            error_message(t("Have to select a video first"))
+            return
+        if not self.build_commands():
+            return
+        # Work from a snapshot so changing settings or loading another video cannot affect the running samples
+        fastflix = self.app.fastflix.model_copy(
+            update={"current_video": self.app.fastflix.current_video.model_copy(deep=True)}
+        )
+        self.quality_checker = QualityCheck(
+            self,
+            fastflix,
+            self.current_encoder.build,
+            self.temp_dir / f"quality_check_{secrets.token_hex(4)}",
+            self.quality_check_signal,
+        )
+        logger.info(t("Running quality check on sample windows of the current video"))
+        self.quality_checker.start()
+
+    def quality_check_complete(self, report):
+        if self.app.fastflix.shutting_down:
+            return
+        if not report:
+            error_message(t("Quality check failed, please check the logs for more details"))
+            return
+        logger.info(f"Quality check results:\n{report.summary()}")
+        message(report.summary(), title=t("Quality Check"))
+
+    def queue_target_quality(self, video: Video):
+        video.status.searching = True
+        self.target_quality_pending.append(video.uuid)
+        QtCore.QTimer.singleShot(0, self.start_target_quality_search)
+
+    def start_target_quality_search(self):
+        # One search at a time, each already runs its sample encodes in parallel
+        if self.target_quality_worker and self.target_quality_worker.isRunning():
+            return
+        while self.target_quality_pending:
+            try:
+                video = self.find_video(self.target_quality_pending.pop(0))
+            except FlixError:
+                continue
+            fastflix = self.app.fastflix.model_copy(update={"current_video": video.model_copy(deep=True)})
+            self.target_quality_worker = TargetQualitySearch(
+                self,
+                fastflix,
+                self.app.fastflix.encoders[video.video_settings.video_encoder_settings.name].build,
+                self.temp_dir / f"target_quality_{secrets.token_hex(4)}",
+                self.target_quality_signal,
+                self.target_quality_cache,
+            )
+            logger.info(f"{t('Searching for target quality of')} {video.video_settings.output_path.name}")
+            self.target_quality_worker.start()
+            return
+
+    def target_quality_complete(self, video_uuid: str, result):
+        if self.app.fastflix.shutting_down:
+            return
+        try:
+            video = self.find_video(video_uuid)
+        except FlixError:
+            # Removed from the queue while searching
+            self.start_target_quality_search()
+            return
+
+        video.status.searching = False
+        if isinstance(result, TargetQualityResult):
+            apply_rate(video, result.value)
+            video.video_settings.conversion_commands = ladder.build(
+                self.app.fastflix.model_copy(update={"current_video": video}),
+                self.app.fastflix.encoders[video.video_settings.video_encoder_settings.name],
+            )
+            self.queue_estimate(video)
+            if not result.reached:
+                logger.warning(
+                    f"{video.video_settings.output_path.name}: {t('could not reach')} {result.metric} {result.target}, "
+                    f"{t('using the highest quality value')} {result.value}"
+                )
+            logger.info(
+                f"{video.video_settings.output_path.name}: {t('target quality')} {result.metric} {result.target} "
+                f"-> {result.value} ({result.metric} {result.score})"
+            )
+        else:
+            video.status.error = True
+            self.thread_logging_signal.emit(f"ERROR:{t('Target quality search failed')}: {result}")
+
+        save_queue(self.app.fastflix.conversion_list, self.app.fastflix.queue_path, self.app.fastflix.config)
+        self.video_options.update_queue(video)
+        self.start_target_quality_search()
+        self.resume_waiting_queue(video)
+
+    def resume_waiting_queue(self, video: Video):
+        """The queue may be idle, waiting on this video to finish preparing"""
+        if not self.app.fastflix.currently_encoding or any(x.status.running for x in self.app.fastflix.conversion_list):
+            return
+        if video.status.error and not self.video_options.queue.ignore_errors.isChecked():
+            self.end_encoding()
+            self.conversion_complete(success=False)
+            return
+        if self.app.fastflix.conversion_paused:
+            return self.end_encoding()
+        if queued := next_video(self.app.fastflix.conversion_list, self.app.fastflix.config.queue_policy):
+            self.send_video_request_to_worker_queue(queued)
+            self.disable_all()
+            return
+        if not any(x.status.preparing for x in self.app.fastflix.conversion_list):
+            self.end_encoding()
+            self.conversion_complete(success=True)
+
+    def queue_loudness(self, video: Video):
+        video.status.analyzing = True
+        self.loudness_pending.append(video.uuid)
+        QtCore.QTimer.singleShot(0, self.start_loudness)
+
+    def start_loudness(self):
+        if self.loudness_worker and self.loudness_worker.isRunning():
+            return
+        while self.loudness_pending:
+            try:
+                video = self.find_video(self.loudness_pending.pop(0))
+            except FlixError:
+                continue
+            self.loudness_worker = LoudnessAnalysis(
+                self,
+                self.app.fastflix.config.ffmpeg,
+                video.model_copy(deep=True),
+                self.loudness_cache,
+                self.loudness_signal,
+            )
+            logger.info(f"{t('Measuring loudness of')} {video.video_settings.output_path.name}")
+            self.loudness_worker.start()
+            return
+
+    def loudness_complete(self, video_uuid: str, result):
+        if self.app.fastflix.shutting_down:
+            return
+        try:
+            video = self.find_video(video_uuid)
+        except FlixError:
+            self.start_loudness()
+            return
+
+        video.status.analyzing = False
+        if isinstance(result, dict):
+            for track in video.audio_tracks:
+                track.loudness = result.get(track.outdex)
+            video.video_settings.conversion_commands = ladder.build(
+                self.app.fastflix.model_copy(update={"current_video": video}),
+                self.app.fastflix.encoders[video.video_settings.video_encoder_settings.name],
+            )
+            # Searches and estimates encode samples, so should hear the normalized audio
+            if video.video_settings.target_quality is not None:
+                self.queue_target_quality(video)
+            else:
+                self.queue_estimate(video)
+        else:
+            video.status.error = True
+            self.thread_logging_signal.emit(f"ERROR:{t('Could not measure loudness')}: {result}")
+
+        save_queue(self.app.fastflix.conversion_list, self.app.fastflix.queue_path, self.app.fastflix.config)
+        self.video_options.update_queue(video)
+        self.start_loudness()
+        self.resume_waiting_queue(video)
+
+    def queue_estimate(self, video: Video):
+        if not self.app.fastflix.config.queue_estimates:
+            return
+        video.estimate = None
+        self.estimate_pending.append(video.uuid)
+        QtCore.QTimer.singleShot(0, self.start_estimate)
+
+    def start_estimate(self):
+        # Sample encodes would compete with the queue for the encoder, slowing it and skewing their own timings
+        if self.app.fastflix.currently_encoding or (self.estimate_worker and self.estimate_worker.isRunning()):
+            return
+        while self.estimate_pending:
+            try:
+                video = self.find_video(self.estimate_pending.pop(0))
+            except FlixError:
+                continue
+            if not video.status.ready:
+                continue
+            fastflix = self.app.fastflix.model_copy(update={"current_video": video.model_copy(deep=True)})
+            self.estimate_worker = EstimateEncode(
+                self,
+                fastflix,
+                self.app.fastflix.encoders[video.video_settings.video_encoder_settings.name].build,
+                self.temp_dir / f"estimate_{secrets.token_hex(4)}",
+                self.estimate_signal,
+            )
+            self.estimate_worker.start()
+            return
+
+    def pause_estimates(self):
+        """Stop the running estimate while the queue encodes, it starts over once the queue is done"""
+        if self.estimate_worker and self.estimate_worker.isRunning() and not self.estimate_worker.cancel_event.is_set():
+            self.estimate_pending.insert(0, self.estimate_worker.fastflix.current_video.uuid)
+            self.estimate_worker.stop()
+
+    def estimate_complete(self, video_uuid: str, estimate):
+        if self.app.fastflix.shutting_down:
+            return
+        try:
+            video = self.find_video(video_uuid)
+        except FlixError:
+            pass
+        else:
+            if estimate:
+                video.estimate = estimate
+                logger.info(
+                    f"{video.video_settings.output_path.name}: {t('estimated')} {estimate.size / 1_000_000:.1f}MB "
+                    f"({estimate.size_low / 1_000_000:.1f}-{estimate.size_high / 1_000_000:.1f}MB), "
+                    f"{estimate.seconds:.0f}s ({estimate.seconds_low:.0f}-{estimate.seconds_high:.0f}s)"
+                )
+                self.video_options.update_queue(video)
+        self.start_estimate()
+
     def interlace_update(self):
         if self.loading_video:
             return
@@ -1849,6 +2510,29 @@ class Main(QtWidgets.QWidget):
                 shutil.rmtree(self.temp_dir, ignore_errors=True)
             except Exception:
                 pass
+        self.stop_thumbnail_prefetch()
+        self.preview_scheduler.cancel()
+        self.filmstrip_scheduler.cancel()
+        self.large_preview.preview_scheduler.cancel()
+        self.stop_frame_server()
+        if self.quality_checker:
+            self.quality_checker.stop()
+        if self.target_quality_worker:
+            self.target_quality_worker.stop()
+        if self.estimate_worker:
+            self.estimate_worker.stop()
+        if self.loudness_worker:
+            self.loudness_worker.stop()
+            self.loudness_worker.wait(2000)
+        self.stop_cover_extraction()
+        self.stop_hdr10plus_extraction()
+        if self.segment_checker:
+            self.segment_checker.stop()
+            self.segment_checker.wait(2000)
+        self.stop_folder_watch()
+        self.remote_loader.shutdown(wait=False, cancel_futures=True)
+        if self.batch_adder:
+            self.batch_adder.stop()
         self.video_options.cleanup()
         self.notifier.terminate()
         super().close()
@@ -1908,6 +2592,18 @@ class Main(QtWidgets.QWidget):
             if not sure:
                 return
             logger.info(t("Canceling current encode"))
+            if video := self.stop_segment_check():
+                # Nothing was sent to the worker yet
+                video.status.running = False
+                video.status.cancelled = True
+                self.end_encoding()
+                self.conversion_cancelled(video)
+                self.video_options.update_queue(video)
+                return
+            if not any(x.status.running for x in self.app.fastflix.conversion_list):
+                # Only waiting on target quality searches, there is no encode to cancel
+                self.end_encoding()
+                return
             self.app.fastflix.worker_queue.put(["cancel"])
             self.video_options.queue.reset_pause_encode()
             return
@@ -1923,11 +2619,14 @@ class Main(QtWidgets.QWidget):
                 if not self.add_to_queue():
                     return
 
-        for video in self.app.fastflix.conversion_list:
-            if video.status.ready:
-                video_to_send: Video = video
-                break
-        else:
+        video_to_send = next_video(self.app.fastflix.conversion_list, self.app.fastflix.config.queue_policy)
+        if not video_to_send:
+            if any(x.status.preparing for x in self.app.fastflix.conversion_list):
+                logger.info(t("Waiting for queued videos to finish preparing before encoding"))
+                self.app.fastflix.currently_encoding = True
+                self.set_convert_button()
+                self.video_options.show_status()
+                return
             error_message(t("There are no videos to start converting"))
             return
 
@@ -2056,21 +2755,24 @@ class Main(QtWidgets.QWidget):
                     video.status.cancelled = True
                     self.end_encoding()
                     self.conversion_cancelled(video)
-                    self.video_options.update_queue()
+                    self.video_options.update_queue(video)
                     return
 
                 if response.status == "complete":
-                    video.status.current_command += 1
-                    if len(video.video_settings.conversion_commands) > video.status.current_command:
+                    store_first_pass(video, video.status.current_command, self.first_pass_cache)
+                    finish_command(video, video.status.current_command)
+                    if not all_finished(video):
                         same_video = True
                         video_to_send = video
                         break
                     else:
                         video.status.complete = True
+                        segments.cleanup(video)
 
                 if response.status == "error":
                     video.status.error = True
                     errored = True
+                self.video_options.update_queue(video)
                 break
 
         if errored and not self.video_options.queue.ignore_errors.isChecked():
@@ -2079,13 +2781,12 @@ class Main(QtWidgets.QWidget):
             return
 
         if not video_to_send:
-            for video in self.app.fastflix.conversion_list:
-                if video.status.ready:
-                    video_to_send = video
-                    # TODO ensure command int is in command list?
-                    break
+            video_to_send = next_video(self.app.fastflix.conversion_list, self.app.fastflix.config.queue_policy)
 
         if not video_to_send:
+            if any(x.status.preparing for x in self.app.fastflix.conversion_list):
+                logger.info(t("Waiting for queued videos to finish preparing before encoding"))
+                return
             self.end_encoding()
             self.conversion_complete(success=True)
             return
@@ -2098,6 +2799,7 @@ class Main(QtWidgets.QWidget):
 
     def end_encoding(self):
         self.app.fastflix.currently_encoding = False
+        QtCore.QTimer.singleShot(0, self.start_estimate)
         allow_sleep_mode()
         self.video_options.queue.run_after_done()
         self.video_options.update_queue()
@@ -2105,23 +2807,55 @@ class Main(QtWidgets.QWidget):
 
     def send_next_video(self) -> bool:
         if not self.app.fastflix.currently_encoding:
-            for video in self.app.fastflix.conversion_list:
-                if video.status.ready:
-                    video.status.running = True
-                    self.send_video_request_to_worker_queue(video)
-                    self.app.fastflix.currently_encoding = True
-                    prevent_sleep_mode()
-                    self.set_convert_button()
-                    return True
+            if video := next_video(self.app.fastflix.conversion_list, self.app.fastflix.config.queue_policy):
+                video.status.running = True
+                self.send_video_request_to_worker_queue(video)
+                self.app.fastflix.currently_encoding = True
+                prevent_sleep_mode()
+                self.set_convert_button()
+                return True
         self.app.fastflix.currently_encoding = False
         allow_sleep_mode()
         self.set_convert_button()
         return False
 
     def send_video_request_to_worker_queue(self, video: Video):
-        command = video.video_settings.conversion_commands[video.status.current_command]
         self.app.fastflix.currently_encoding = True
+        self.pause_estimates()
         prevent_sleep_mode()
+        if segments.is_segmented(video):
+            # Unseen segment files are checked with FFprobe, which is too slow to wait on here
+            video.status.running = True
+            self.video_options.update_queue(video)
+            self.segment_checker = ResumeSegments(self, video, self.app.fastflix.config, self.segments_signal)
+            self.segment_checker.start()
+            return
+        self.send_command(video)
+
+    def segments_checked(self, video_uuid: str, status: Status):
+        self.segment_checker = None
+        try:
+            video = self.find_video(video_uuid)
+        except FlixError:
+            return
+        if not video.status.running:
+            return
+        video.status.current_command = status.current_command
+        video.status.finished_commands = status.finished_commands
+        self.send_command(video)
+
+    def stop_segment_check(self) -> Optional[Video]:
+        """Stop a segment check that is still running, returning the video it was for"""
+        if not self.segment_checker or not self.segment_checker.isRunning():
+            return None
+        self.segment_checker.stop()
+        video = next((x for x in self.app.fastflix.conversion_list if x.uuid == self.segment_checker.video.uuid), None)
+        self.segment_checker = None
+        return video
+
+    def send_command(self, video: Video):
+        reuse_first_pass(video, self.first_pass_cache)
+        command = video.video_settings.conversion_commands[video.status.current_command]
 
         # logger.info(f"Sending video {video.uuid} command {command.uuid} called from {inspect.stack()}")
 
@@ -2136,7 +2870,7 @@ class Main(QtWidgets.QWidget):
             )
         )
         video.status.running = True
-        self.video_options.update_queue()
+        self.video_options.update_queue(video)
 
     def find_video(self, uuid) -> Video:
         for video in self.app.fastflix.conversion_list:
@@ -2174,5 +2908,8 @@ class Notifier(QtCore.QThread):
                 finally:
                     self.main.close_event.emit()
                 return
+            if status[0] in ("enqueue", "start queue", "pause encode", "resume encode"):
+                self.main.remote_request_signal.emit(status)
+                continue
             self.main.status_update_signal.emit(status)
             self.app.processEvents()
@@ -6,12 +6,18 @@ import logging
 from box import Box
 from PySide6 import QtCore, QtGui, QtWidgets
 
+from fastflix.ladder import ladder_text, parse_ladder
 from fastflix.language import t
 from fastflix.models.fastflix_app import FastFlixApp
 from fastflix.models.video import VideoSettings
 from fastflix.resources import get_icon
 from fastflix.models.profiles import AdvancedOptions
-from fastflix.flix import ffmpeg_valid_color_primaries, ffmpeg_valid_color_transfers, ffmpeg_valid_color_space
+from fastflix.flix import (
+    denoise_presets,
+    ffmpeg_valid_color_primaries,
+    ffmpeg_valid_color_transfers,
+    ffmpeg_valid_color_space,
+)
 
 logger = logging.getLogger("fastflix")
 
@@ -34,30 +40,11 @@ video_speeds = {
     "100x": 0.01,
 }
 
-denoise_presets = {
-    "nlmeans": {
-        "weak": "nlmeans=s=1.0:p=3:r=9",
-        "moderate": "nlmeans=s=1.0:p=7:r=15",
-        "strong": "nlmeans=s=10.0:p=13:r=25",
-    },
-    "atadenoise": {
-        "weak": "atadenoise=0a=0.01:0b=0.02:1a=0.01:1b=0.02:2a=0.01:2b=0.02:s=9",
-        "moderate": "atadenoise=0a=0.02:0b=0.04:1a=0.02:1b=0.04:2a=0.02:2b=0.04:s=9",
-        "strong": "atadenoise=0a=0.04:0b=0.12:1a=0.04:1b=0.12:2a=0.04:2b=0.12:s=9",
-    },
-    "hqdn3d": {
-        "weak": "hqdn3d=luma_spatial=2:chroma_spatial=1.5:luma_tmp=3:chroma_tmp=2.25",
-        "moderate": "hqdn3d=luma_spatial=4:chroma_spatial=3:luma_tmp=6:chroma_tmp=4.5",
-        "strong": "hqdn3d=luma_spatial=10:chroma_spatial=7.5:luma_tmp=15:chroma_tmp=11.25",
-    },
-    "vaguedenoiser": {
-        "weak": "vaguedenoiser=threshold=1:method=soft:nsteps=5",
-        "moderate": "vaguedenoiser=threshold=3:method=soft:nsteps=5",
-        "strong": "vaguedenoiser=threshold=6:method=soft:nsteps=5",
-    },
-}
 
 vsync = ["auto", "passthrough", "cfr", "vfr", "drop"]
+target_quality_metrics = {"VMAF": "vmaf", "SSIM": "ssim"}
+
+segment_lengths = {"Off": None, "1 minute": 60, "5 minutes": 300, "10 minutes": 600, "30 minutes": 1800}
 tone_map_items = ["none", "clip", "linear", "gamma", "reinhard", "hable", "mobius"]
 
 
@@ -108,6 +95,10 @@ class AdvancedPanel(QtWidgets.QWidget):
         self.add_spacer()
         self.init_vbv()
         self.add_spacer()
+        self.init_target_quality()
+        self.init_segments()
+        self.init_ladder()
+        self.add_spacer()
         self.layout.setRowStretch(self.last_row, True)
         self.init_hw_message()
         self.init_titles()
@@ -340,6 +331,81 @@ class AdvancedPanel(QtWidgets.QWidget):
         self.layout.addWidget(self.bufsize_widget, self.last_row, 4)
         self.layout.addWidget(QtWidgets.QLabel(t("Both must have values to be enabled")), self.last_row, 5, 1, 2)
 
+    def init_target_quality(self):
+        self.last_row += 1
+        self.target_quality_metric_widget = QtWidgets.QComboBox()
+        self.target_quality_metric_widget.addItems(list(target_quality_metrics.keys()))
+        self.target_quality_metric_widget.currentIndexChanged.connect(lambda: self.page_update())
+
+        self.target_quality_widget = QtWidgets.QLineEdit()
+        self.target_quality_widget.setValidator(QtGui.QDoubleValidator())
+        self.target_quality_widget.setToolTip(t("Examples: VMAF 93, SSIM 0.98"))
+        self.target_quality_widget.textChanged.connect(lambda: self.page_update())
+
+        self.add_row_label(t("Target Quality"), self.last_row)
+        self.layout.addWidget(QtWidgets.QLabel(t("Metric")), self.last_row, 1, alignment=QtCore.Qt.AlignRight)
+        self.layout.addWidget(self.target_quality_metric_widget, self.last_row, 2)
+        self.layout.addWidget(QtWidgets.QLabel(t("Score")), self.last_row, 3, alignment=QtCore.Qt.AlignRight)
+        self.layout.addWidget(self.target_quality_widget, self.last_row, 4)
+        self.layout.addWidget(
+            QtWidgets.QLabel(t("Searches CRF when queued (x264, x265, SVT-AV1, AOM AV1, VP9)")),
+            self.last_row,
+            5,
+            1,
+            2,
+        )
+
+    def init_segments(self):
+        self.last_row += 1
+        self.segment_length_widget = QtWidgets.QComboBox()
+        self.segment_length_widget.addItems([t(name) for name in segment_lengths])
+        self.segment_length_widget.currentIndexChanged.connect(lambda: self.page_update())
+
+        self.add_row_label(t("Resumable"), self.last_row)
+        self.layout.addWidget(QtWidgets.QLabel(t("Segments")), self.last_row, 1, alignment=QtCore.Qt.AlignRight)
+        self.layout.addWidget(self.segment_length_widget, self.last_row, 2)
+        self.layout.addWidget(
+            QtWidgets.QLabel(t("Encodes in segments so a stopped encode continues where it was (single pass FFmpeg)")),
+            self.last_row,
+            3,
+            1,
+            4,
+        )
+
+    def init_ladder(self):
+        self.last_row += 1
+        self.ladder_widget = QtWidgets.QLineEdit()
+        self.ladder_widget.setPlaceholderText("720p 24, 480p 1500k")
+        self.ladder_widget.setToolTip(
+            t("Smaller outputs encoded alongside the main one, each a height and a quality value or bitrate")
+        )
+        self.ladder_widget.editingFinished.connect(lambda: self.page_update())
+
+        self.add_row_label(t("ABR Ladder"), self.last_row)
+        self.layout.addWidget(QtWidgets.QLabel(t("Renditions")), self.last_row, 1, alignment=QtCore.Qt.AlignRight)
+        self.layout.addWidget(self.ladder_widget, self.last_row, 2, 1, 2)
+        self.layout.addWidget(
+            QtWidgets.QLabel(t("Decodes and filters the source once for every output (FFmpeg encoders)")),
+            self.last_row,
+            4,
+            1,
+            3,
+        )
+
+    def segment_length(self):
+        return list(segment_lengths.values())[self.segment_length_widget.currentIndex()]
+
+    def set_segment_length(self, length):
+        lengths = list(segment_lengths.values())
+        self.segment_length_widget.setCurrentIndex(lengths.index(length) if length in lengths else 0)
+
+    def target_quality(self):
+        try:
+            return float(self.target_quality_widget.text()) if self.target_quality_widget.text().strip() else None
+        except ValueError:
+            logger.warning("Invalid target quality value")
+            return None
+
     # def vbv_check_changed(self):
     #     self.bufsize_widget.setEnabled(self.vbv_checkbox.isChecked())
     #     self.maxrate_widget.setEnabled(self.vbv_checkbox.isChecked())
@@ -456,6 +522,13 @@ class AdvancedPanel(QtWidgets.QWidget):
             self.app.fastflix.current_video.video_settings.maxrate = None
             self.app.fastflix.current_video.video_settings.bufsize = None
 
+        self.app.fastflix.current_video.video_settings.target_quality = self.target_quality()
+        self.app.fastflix.current_video.video_settings.target_quality_metric = target_quality_metrics[
+            self.target_quality_metric_widget.currentText()
+        ]
+        self.app.fastflix.current_video.video_settings.segment_length = self.segment_length()
+        self.app.fastflix.current_video.video_settings.ladder = parse_ladder(self.ladder_widget.text())
+
         self.updating = False
 
     def get_settings(self):
@@ -517,6 +590,10 @@ class AdvancedPanel(QtWidgets.QWidget):
             denoise=denoise,
             denoise_type_index=self.denoise_type_widget.currentIndex(),
             denoise_strength_index=self.denoise_strength_widget.currentIndex(),
+            target_quality=self.target_quality(),
+            target_quality_metric=target_quality_metrics[self.target_quality_metric_widget.currentText()],
+            segment_length=self.segment_length(),
+            ladder=parse_ladder(self.ladder_widget.text()),
             # first_pass_filters=self.first_filters.text() or None,
             # second_pass_filters=self.second_filters.text() or None,
         )
@@ -566,6 +643,10 @@ class AdvancedPanel(QtWidgets.QWidget):
                 else:
                     self.color_primaries_widget.setCurrentIndex(0)
 
+    def set_target_quality(self, target_quality, metric):
+        self.target_quality_widget.setText("" if target_quality is None else f"{target_quality:g}")
+        self.target_quality_metric_widget.setCurrentText(get_key(target_quality_metrics, metric) or "VMAF")
+
     def page_update(self, build_thumbnail=False):
         self.main.page_update(build_thumbnail=build_thumbnail)
 
@@ -613,6 +694,10 @@ class AdvancedPanel(QtWidgets.QWidget):
                 self.maxrate_widget.setText("")
                 self.bufsize_widget.setText("")
 
+            self.set_target_quality(settings.target_quality, settings.target_quality_metric)
+            self.set_segment_length(settings.segment_length)
+            self.ladder_widget.setText(ladder_text(settings.ladder))
+
             if settings.color_space:
                 self.color_space_widget.setCurrentText(settings.color_space)
             else:
@@ -674,6 +759,13 @@ class AdvancedPanel(QtWidgets.QWidget):
             self.maxrate_widget.setText(str(maxrate) if maxrate and vbv else "")
             self.bufsize_widget.setText(str(bufsize) if maxrate and vbv else "")
 
+            self.set_target_quality(
+                self.app.fastflix.config.advanced_opt("target_quality", None),
+                self.app.fastflix.config.advanced_opt("target_quality_metric", "vmaf"),
+            )
+            self.set_segment_length(self.app.fastflix.config.advanced_opt("segment_length", None))
+            self.ladder_widget.setText(ladder_text(self.app.fastflix.config.advanced_opt("ladder", [])))
+
             # Equalizer
             self.brightness_widget.setText(self.app.fastflix.config.advanced_opt("brightness") or "")
             self.saturation_widget.setText(self.app.fastflix.config.advanced_opt("saturation") or "")
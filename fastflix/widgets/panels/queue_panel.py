@@ -5,22 +5,27 @@ import copy
 import sys
 import logging
 import os
+from datetime import datetime, timedelta
 from pathlib import Path
-import gc
+from typing import Dict, List, Tuple
 
 from platformdirs import user_data_dir
 import reusables
 from box import Box
 from PySide6 import QtCore, QtGui, QtWidgets
 
+from fastflix import segments
+from fastflix.encoders.common.audio import normalized
 from fastflix.language import t
+from fastflix.models.fastflix import FastFlix
 from fastflix.models.fastflix_app import FastFlixApp
 from fastflix.models.video import Video
 from fastflix.ff_queue import get_queue, save_queue
+from fastflix.queue_scheduler import policies, priority_classes
 from fastflix.resources import get_icon, get_bool_env
-from fastflix.shared import no_border, open_folder, yes_no_message, message, error_message
-from fastflix.widgets.panels.abstract_list import FlixList
+from fastflix.shared import open_folder, yes_no_message, message, error_message, timedelta_to_str
 from fastflix.exceptions import FastFlixInternalException
+from fastflix.sample_encode import rate_control
 from fastflix.windows_tools import allow_sleep_mode, prevent_sleep_mode
 from fastflix.command_runner import BackgroundRunner
 
@@ -42,175 +47,259 @@ done_actions = {
     },
 }
 
+policy_names = {
+    "fifo": "Queue Order",
+    "shortest": "Shortest First",
+    "deadline": "Earliest Deadline",
+    "best-fit": "Best Fit",
+}
+
 after_done_path = Path(user_data_dir("FastFlix", appauthor=False, roaming=True)) / "after_done_logs"
 
 
-class EncodeItem(QtWidgets.QTabWidget):
-    def __init__(self, parent, video: Video, index, first=False):
-        self.loading = True
-        super().__init__(parent)
-        self.parent = parent
-        self.index = index
-        self.first = first
-        self.last = False
-        self.video = video.copy()
-        self.setFixedHeight(60)
-
-        self.widgets = Box(
-            up_button=QtWidgets.QPushButton(
-                QtGui.QIcon(get_icon("up-arrow", self.parent.app.fastflix.config.theme)), ""
-            ),
-            down_button=QtWidgets.QPushButton(
-                QtGui.QIcon(get_icon("down-arrow", self.parent.app.fastflix.config.theme)), ""
-            ),
-            cancel_button=QtWidgets.QPushButton(
-                QtGui.QIcon(get_icon("black-x", self.parent.app.fastflix.config.theme)), ""
-            ),
-            reload_button=QtWidgets.QPushButton(
-                QtGui.QIcon(get_icon("edit-box", self.parent.app.fastflix.config.theme)), ""
-            ),
-            retry_button=QtWidgets.QPushButton(
-                QtGui.QIcon(get_icon("undo", self.parent.app.fastflix.config.theme)), ""
-            ),
-        )
+def readable_size(size: int) -> str:
+    if size >= 1_000_000_000:
+        return f"{size / 1_000_000_000:.2f}GB"
+    return f"{size / 1_000_000:.1f}MB"
 
-        for widget in self.widgets.values():
-            widget.setStyleSheet(no_border)
 
-        title = QtWidgets.QLabel(
-            video.video_settings.video_title
-            if video.video_settings.video_title
-            else video.video_settings.output_path.name
-        )
-        title.setFixedWidth(300)
+def readable_time(seconds: float) -> str:
+    return timedelta_to_str(timedelta(seconds=round(seconds)))
 
-        settings = Box(copy.deepcopy(video.video_settings.model_dump()))
-        # settings.output_path = str(settings.output_path)
-        # for i, o in enumerate(video.attachment_tracks):
-        #     if o.file_path:
-        #         o["file_path"] = str(o["file_path"])
-        # del settings.conversion_commands
 
-        title.setToolTip(settings.video_encoder_settings.to_yaml())
-        del settings
+def video_title(video: Video) -> str:
+    return video.video_settings.video_title or video.video_settings.output_path.name
 
-        open_button = QtWidgets.QPushButton(
-            QtGui.QIcon(get_icon("play", self.parent.app.fastflix.config.theme)), t("Open Directory")
-        )
-        open_button.setLayoutDirection(QtCore.Qt.RightToLeft)
-        open_button.setIconSize(QtCore.QSize(14, 14))
-        open_button.clicked.connect(lambda: open_folder(video.video_settings.output_path.parent))
 
-        view_button = QtWidgets.QPushButton(
-            QtGui.QIcon(get_icon("play", self.parent.app.fastflix.config.theme)), t("Watch")
-        )
-        view_button.setLayoutDirection(QtCore.Qt.RightToLeft)
-        view_button.setIconSize(QtCore.QSize(14, 14))
-        view_button.clicked.connect(
-            lambda: QtGui.QDesktopServices.openUrl(QtCore.QUrl.fromLocalFile(str(video.video_settings.output_path)))
+def video_status(video: Video) -> str:
+    status = t("Ready to encode")
+    if video.status.error:
+        status = t("Encoding errored")
+    elif video.status.complete:
+        status = t("Encoding complete")
+    elif video.status.running:
+        status = (
+            f"{t('Encoding command')} {video.status.current_command + 1} {t('of')} "
+            f"{len(video.video_settings.conversion_commands)}"
         )
-
-        open_button.setStyleSheet(no_border)
-        view_button.setStyleSheet(no_border)
-
-        add_retry = False
-        status = t("Ready to encode")
-        if video.status.error:
-            status = t("Encoding errored")
-        elif video.status.complete:
-            status = f"{t('Encoding complete')}"
-        elif video.status.running:
-            status = (
-                f"{t('Encoding command')} {video.status.current_command + 1} {t('of')} "
-                f"{len(video.video_settings.conversion_commands)}"
+    elif video.status.analyzing:
+        status = t("Measuring loudness")
+    elif video.status.searching:
+        status = t("Searching for target quality")
+    elif video.status.cancelled:
+        status = t("Cancelled")
+    if video.estimate and video.status.ready:
+        status = f"{status}\n~{readable_size(video.estimate.size)}, ~{readable_time(video.estimate.seconds)}"
+    return status
+
+
+def estimate_tooltip(video: Video) -> str:
+    estimate = video.estimate
+    return (
+        f"{t('Estimated from')} {estimate.samples} {t('sample encodes')}\n"
+        f"{t('Size')}: {readable_size(estimate.size_low)} - {readable_size(estimate.size_high)}\n"
+        f"{t('Time')}: {readable_time(estimate.seconds_low)} - {readable_time(estimate.seconds_high)}"
+    )
+
+
+def schedule_text(video: Video) -> str:
+    lines = []
+    if video.priority != priority_classes["Normal"]:
+        names = {level: name for name, level in priority_classes.items()}
+        lines.append(f"{t('Priority')}: {t(names.get(video.priority, str(video.priority)))}")
+    if video.deadline:
+        lines.append(f"{t('Due')} {video.deadline:%Y-%m-%d %H:%M}")
+    return "\n".join(lines)
+
+
+class QueueModel(QtCore.QAbstractListModel):
+    """
+    The queued videos as the rows of a list. The rows are a snapshot of the queue taken by `refresh`, which has to
+    be called when videos are added, removed or moved, while a change to a single video only updates its own row.
+    """
+
+    video_role = QtCore.Qt.UserRole + 1
+
+    def __init__(self, fastflix: FastFlix, parent=None):
+        super().__init__(parent)
+        self.fastflix = fastflix
+        self.videos: List[Video] = []
+        self.rows: Dict[str, int] = {}
+
+    def rowCount(self, parent=QtCore.QModelIndex()) -> int:
+        return 0 if parent.isValid() else len(self.videos)
+
+    def data(self, index: QtCore.QModelIndex, role=QtCore.Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.videos):
+            return None
+        video = self.videos[index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return video_title(video)
+        if role == self.video_role:
+            return video
+        return None
+
+    def refresh(self):
+        self.beginResetModel()
+        self.videos = list(self.fastflix.conversion_list)
+        self.rows = {video.uuid: row for row, video in enumerate(self.videos)}
+        self.endResetModel()
+
+    def video_changed(self, video: Video):
+        """Repaint the row of the video, if it is in the list"""
+        if (row := self.rows.get(video.uuid)) is not None:
+            index = self.index(row)
+            self.dataChanged.emit(index, index)
+
+
+class QueueDelegate(QtWidgets.QStyledItemDelegate):
+    """Paints the row of a queued video and handles clicks on its buttons, only the rows in view are painted"""
+
+    row_height = 66
+    columns = (
+        ("title", 300),
+        ("encoder", 140),
+        ("audio", 110),
+        ("subtitles", 100),
+        ("status", 230),
+        ("schedule", 160),
+    )
+
+    def __init__(self, queue: "EncodingQueue"):
+        super().__init__(queue)
+        self.queue = queue
+        theme = queue.app.fastflix.config.theme
+        self.icons = {
+            action: QtGui.QIcon(get_icon(icon, theme))
+            for action, icon in (
+                ("up", "up-arrow"),
+                ("down", "down-arrow"),
+                ("remove", "black-x"),
+                ("reload", "edit-box"),
+                ("retry", "undo"),
+                ("open", "play"),
+                ("watch", "play"),
             )
+        }
+        self.labels = {"open": t("Open Directory"), "watch": t("Watch")}
+
+    def sizeHint(self, option: QtWidgets.QStyleOptionViewItem, index: QtCore.QModelIndex) -> QtCore.QSize:
+        return QtCore.QSize(option.rect.width(), self.row_height)
+
+    @staticmethod
+    def card(option: QtWidgets.QStyleOptionViewItem) -> QtCore.QRect:
+        return option.rect.adjusted(2, 3, -2, -3)
+
+    def buttons(self, rect: QtCore.QRect, video: Video, metrics: QtGui.QFontMetrics) -> List[Tuple[str, QtCore.QRect]]:
+        """The buttons of the row and where they are drawn, the move buttons first"""
+        buttons = [
+            ("up", QtCore.QRect(rect.left() + 6, rect.top() + 7, 20, 20)),
+            ("down", QtCore.QRect(rect.left() + 6, rect.bottom() - 26, 20, 20)),
+        ]
+        actions = []
+        if not video.status.running:
+            actions.extend(["remove", "reload"])
+        if video.status.complete and not video.status.error and not get_bool_env("FF_DOCKERMODE"):
+            actions.extend(["open", "watch"])
         elif video.status.cancelled:
-            status = t("Cancelled")
-            add_retry = True
-
-        if not self.video.status.running:
-            self.widgets.cancel_button.clicked.connect(lambda: self.parent.remove_item(self.video))
-            self.widgets.reload_button.clicked.connect(lambda: self.parent.reload_from_queue(self.video))
-            self.widgets.cancel_button.setFixedWidth(25)
-            self.widgets.reload_button.setFixedWidth(25)
+            actions.append("retry")
+        right = rect.right() - 6
+        for action in actions:
+            width = metrics.horizontalAdvance(self.labels[action]) + 30 if action in self.labels else 25
+            right -= width
+            buttons.append((action, QtCore.QRect(right, rect.center().y() - 12, width, 24)))
+            right -= 6
+        return buttons
+
+    def column_areas(self, rect: QtCore.QRect) -> Dict[str, QtCore.QRect]:
+        areas, left = {}, rect.left() + 34
+        for name, width in self.columns:
+            areas[name] = QtCore.QRect(left, rect.top(), width, rect.height())
+            left += width + 8
+        return areas
+
+    def paint(self, painter: QtGui.QPainter, option: QtWidgets.QStyleOptionViewItem, index: QtCore.QModelIndex):
+        video: Video = index.data(QueueModel.video_role)
+        rect = self.card(option)
+        painter.save()
+        painter.setRenderHint(QtGui.QPainter.Antialiasing)
+        painter.setPen(option.palette.mid().color())
+        hovered = option.state & QtWidgets.QStyle.State_MouseOver
+        painter.setBrush(option.palette.alternateBase() if hovered else option.palette.base())
+        painter.drawRoundedRect(rect, 4, 4)
+        painter.setPen(option.palette.text().color())
+
+        buttons = self.buttons(rect, video, option.fontMetrics)
+        last_row = index.model().rowCount() - 1
+        for action, area in buttons:
+            disabled = (action == "up" and index.row() == 0) or (action == "down" and index.row() == last_row)
+            painter.setOpacity(0.35 if disabled else 1)
+            if action in self.labels:
+                self.icons[action].paint(painter, area.adjusted(area.width() - 20, 5, -4, -5))
+                painter.drawText(
+                    area.adjusted(4, 0, -22, 0), QtCore.Qt.AlignVCenter | QtCore.Qt.AlignLeft, self.labels[action]
+                )
+            else:
+                self.icons[action].paint(painter, area.adjusted(3, 3, -3, -3))
+        painter.setOpacity(1)
+
+        # Columns that would run into the buttons are cut short
+        text_right = min((area.left() for _, area in buttons[2:]), default=rect.right()) - 8
+        visible = QtCore.QRect(rect.left(), rect.top(), max(text_right - rect.left(), 0), rect.height())
+        texts = {
+            "title": video_title(video),
+            "encoder": video.video_settings.video_encoder_settings.name,
+            "audio": f"{t('Audio Tracks')}: {len([1 for x in video.audio_tracks if x.enabled])}",
+            "subtitles": f"{t('Subtitles')}: {len([1 for x in video.subtitle_tracks if x.enabled])}",
+            "status": video_status(video),
+            "schedule": schedule_text(video),
+        }
+        for name, area in self.column_areas(rect).items():
+            area = area.intersected(visible)
+            if area.isEmpty():
+                continue
+            lines = [
+                option.fontMetrics.elidedText(line, QtCore.Qt.ElideRight, area.width())
+                for line in texts[name].splitlines()
+            ]
+            painter.drawText(area, QtCore.Qt.AlignVCenter | QtCore.Qt.AlignLeft, "\n".join(lines))
+        painter.restore()
+
+    def editorEvent(
+        self, event: QtCore.QEvent, model, option: QtWidgets.QStyleOptionViewItem, index: QtCore.QModelIndex
+    ) -> bool:
+        if event.type() != QtCore.QEvent.MouseButtonRelease or event.button() != QtCore.Qt.LeftButton:
+            return False
+        video: Video = index.data(QueueModel.video_role)
+        for action, area in self.buttons(self.card(option), video, option.fontMetrics):
+            if area.contains(event.position().toPoint()):
+                # Most actions rebuild the list, so leave the view's mouse handling first
+                QtCore.QTimer.singleShot(0, lambda: self.queue.item_action(action, video))
+                return True
+        return False
+
+    def helpEvent(
+        self, event: QtGui.QHelpEvent, view, option: QtWidgets.QStyleOptionViewItem, index: QtCore.QModelIndex
+    ) -> bool:
+        if not index.isValid():
+            return super().helpEvent(event, view, option, index)
+        video: Video = index.data(QueueModel.video_role)
+        areas = self.column_areas(self.card(option))
+        tip = ""
+        if areas["title"].contains(event.pos()):
+            tip = Box(video.video_settings.video_encoder_settings.model_dump()).to_yaml()
+        elif areas["status"].contains(event.pos()) and video.estimate and video.status.ready:
+            tip = estimate_tooltip(video)
+        if tip:
+            QtWidgets.QToolTip.showText(event.globalPos(), tip, view)
         else:
-            self.widgets.cancel_button.hide()
-            self.widgets.reload_button.hide()
-
-        grid = QtWidgets.QGridLayout()
-        grid.addLayout(self.init_move_buttons(), 0, 0)
-        # grid.addWidget(self.widgets.track_number, 0, 1)
-        grid.addWidget(title, 0, 1, 1, 3)
-        grid.addWidget(QtWidgets.QLabel(f"{video.video_settings.video_encoder_settings.name}"), 0, 4)
-        grid.addWidget(
-            QtWidgets.QLabel(f"{t('Audio Tracks')}: {len([1 for x in video.audio_tracks if x.enabled])}"), 0, 5
-        )
-        grid.addWidget(
-            QtWidgets.QLabel(f"{t('Subtitles')}: {len([1 for x in video.subtitle_tracks if x.enabled])}"), 0, 6
-        )
-        grid.addWidget(QtWidgets.QLabel(status), 0, 7)
-        if not video.status.error and video.status.complete and not get_bool_env("FF_DOCKERMODE"):
-            grid.addWidget(view_button, 0, 8)
-            grid.addWidget(open_button, 0, 9)
-        elif add_retry:
-            grid.addWidget(self.widgets.retry_button, 0, 8)
-            self.widgets.retry_button.setFixedWidth(25)
-            self.widgets.retry_button.clicked.connect(lambda: self.parent.retry_video(self.video))
-
-        right_buttons = QtWidgets.QHBoxLayout()
-        right_buttons.addWidget(self.widgets.reload_button)
-        right_buttons.addWidget(self.widgets.cancel_button)
-
-        grid.addLayout(right_buttons, 0, 10, alignment=QtCore.Qt.AlignRight)
-
-        self.setLayout(grid)
-        self.loading = False
-        self.updating_burn = False
-
-    def init_move_buttons(self):
-        layout = QtWidgets.QVBoxLayout()
-        layout.setSpacing(0)
-        self.widgets.up_button.setFixedWidth(20)
-        self.widgets.up_button.clicked.connect(lambda: self.parent.move_up(self))
-        self.widgets.down_button.setFixedWidth(20)
-        self.widgets.down_button.clicked.connect(lambda: self.parent.move_down(self))
-        layout.addWidget(self.widgets.up_button)
-        layout.addWidget(self.widgets.down_button)
-        return layout
-
-    def set_first(self, first=True):
-        self.first = first
-
-    def set_last(self, last=True):
-        self.last = last
-
-    def set_outdex(self, outdex):
-        pass
-
-    @property
-    def enabled(self):
+            QtWidgets.QToolTip.hideText()
         return True
 
-    def update_enable(self):
-        pass
-
-    def page_update(self):
-        if not self.loading:
-            return self.parent.main.page_update(build_thumbnail=False)
-
-    def close(self) -> bool:
-        for widget, item in self.widgets.items():
-            item.close()
-            self.widgets[widget] = None
-        del self.video
-        del self.widgets
-        del self.parent
-        gc.collect()
-        return super().close()
-
 
-class EncodingQueue(FlixList):
+class EncodingQueue(QtWidgets.QWidget):
     def __init__(self, parent, app: FastFlixApp):
+        super().__init__(parent)
         self.main = parent.main
         self.app = app
         self.encode_paused = False
@@ -284,12 +373,21 @@ class EncodingQueue(FlixList):
         priority_label = QtWidgets.QLabel(t("Priority"))
         priority_label.setFixedWidth(55)
 
+        self.policy_combo = QtWidgets.QComboBox()
+        self.policy_combo.addItems([t(policy_names[policy]) for policy in policies])
+        if self.app.fastflix.config.queue_policy in policies:
+            self.policy_combo.setCurrentIndex(policies.index(self.app.fastflix.config.queue_policy))
+        self.policy_combo.setToolTip(t("Which video in the queue is encoded next"))
+        self.policy_combo.currentIndexChanged.connect(self.set_policy)
+
         top_layout.addWidget(self.load_queue_button, QtCore.Qt.AlignRight)
         top_layout.addWidget(self.save_queue_button, QtCore.Qt.AlignRight)
         top_layout.addStretch(1)
         top_layout.addWidget(priority_label, QtCore.Qt.AlignRight)
         top_layout.addWidget(self.priority_widget, QtCore.Qt.AlignRight)
         top_layout.addStretch(1)
+        top_layout.addWidget(QtWidgets.QLabel(t("Order")))
+        top_layout.addWidget(self.policy_combo, QtCore.Qt.AlignRight)
         top_layout.addWidget(QtWidgets.QLabel(t("After Conversion")))
         top_layout.addWidget(self.after_done_combo, QtCore.Qt.AlignRight)
         top_layout.addWidget(self.ignore_errors, QtCore.Qt.AlignRight)
@@ -297,7 +395,24 @@ class EncodingQueue(FlixList):
         top_layout.addWidget(self.pause_queue, QtCore.Qt.AlignRight)
         top_layout.addWidget(self.clear_queue, QtCore.Qt.AlignRight)
 
-        super().__init__(app, parent, t("Queue"), "queue", top_row_layout=top_layout)
+        self.model = QueueModel(self.app.fastflix, self)
+        self.view = QtWidgets.QListView(self)
+        self.view.setModel(self.model)
+        self.view.setItemDelegate(QueueDelegate(self))
+        # Every row is the same height, so the view only lays out and paints the rows in sight
+        self.view.setUniformItemSizes(True)
+        self.view.setVerticalScrollMode(QtWidgets.QAbstractItemView.ScrollPerPixel)
+        self.view.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarAlwaysOff)
+        self.view.setSelectionMode(QtWidgets.QAbstractItemView.NoSelection)
+        self.view.setMouseTracking(True)
+        self.view.setMinimumHeight(200)
+        self.view.setContextMenuPolicy(QtCore.Qt.CustomContextMenu)
+        self.view.customContextMenuRequested.connect(self.item_menu)
+
+        layout = QtWidgets.QVBoxLayout()
+        layout.addLayout(top_layout)
+        layout.addWidget(self.view)
+        self.setLayout(layout)
         try:
             self.queue_startup_check()
         except Exception:
@@ -313,7 +428,12 @@ class EncodingQueue(FlixList):
             if video.status.complete:
                 remove_vids.append(video)
             else:
+                current_command, finished = video.status.current_command, video.status.finished_commands
                 video.status.clear()
+                if segments.is_segmented(video):
+                    # Carries on from the segment it was on, the finished ones are checked before it starts
+                    video.status.current_command = current_command
+                    video.status.finished_commands = finished
 
         for video in remove_vids:
             new_queue.remove(video)
@@ -336,6 +456,14 @@ class EncodingQueue(FlixList):
         #     if metadata_file.name not in registered_metadata:
         #         metadata_file.unlink(missing_ok=True)
 
+        for video in self.app.fastflix.conversion_list:
+            if video.status.analyzing:
+                self.main.queue_loudness(video)
+            elif video.status.searching:
+                self.main.queue_target_quality(video)
+            elif not video.estimate:
+                self.main.queue_estimate(video)
+
         self.new_source()
         save_queue(self.app.fastflix.conversion_list, self.app.fastflix.queue_path, self.app.fastflix.config)
 
@@ -373,53 +501,83 @@ class EncodingQueue(FlixList):
             if is_yes:
                 self.queue_startup_check(filename)
 
-    def reorder(self, update=True):
+    def move(self, video: Video, offset: int):
+        """Move the video up or down the queue by offset places"""
         if self.app.fastflix.currently_encoding:
-            # TODO error?
             logger.warning("Reorder queue called while encoding")
             return
-        super().reorder(update=update)
-        # TODO find better reorder method
-        for i in range(len(self.tracks) - 1, -1, -1):
-            del self.app.fastflix.conversion_list[i]
-
-        self.app.fastflix.conversion_list = []
-        for track in self.tracks:
-            self.app.fastflix.conversion_list.append(track.video)
-
-        for track in self.tracks:
-            track.widgets.up_button.setDisabled(False)
-            track.widgets.down_button.setDisabled(False)
-        if self.tracks:
-            self.tracks[0].widgets.up_button.setDisabled(True)
-            self.tracks[-1].widgets.down_button.setDisabled(True)
+        queue = self.app.fastflix.conversion_list
+        index = next((i for i, queued in enumerate(queue) if queued.uuid == video.uuid), None)
+        if index is None or not 0 <= index + offset < len(queue):
+            return
+        queue.insert(index + offset, queue.pop(index))
+        self.new_source()
         save_queue(self.app.fastflix.conversion_list, self.app.fastflix.queue_path, self.app.fastflix.config)
 
     def new_source(self):
-        for i in range(len(self.tracks) - 1, -1, -1):
-            self.tracks[i].close()
-            del self.tracks[i]
-
-        self.tracks = []
-
-        for i, video in enumerate(self.app.fastflix.conversion_list, start=1):
-            self.tracks.append(EncodeItem(self, video, index=i))
-        if self.tracks:
-            self.tracks[0].widgets.up_button.setDisabled(True)
-            self.tracks[-1].widgets.down_button.setDisabled(True)
-        super()._new_source(self.tracks)
-
-        # snapshot = tracemalloc.take_snapshot()
-        # top_stats = snapshot.statistics('lineno')
-        #
-        # print("[ Top 20 ]")
-        # for stat in top_stats[:20]:
-        #     print(stat)
+        """Rebuild the list after videos were added, removed or moved"""
+        scrolled = self.view.verticalScrollBar().value()
+        self.model.refresh()
+        self.view.verticalScrollBar().setValue(scrolled)
+
+    def update_video(self, video: Video):
+        """Show the changed status of a single video"""
+        self.model.video_changed(video)
+
+    def item_action(self, action: str, video: Video):
+        if action in ("up", "down"):
+            self.move(video, -1 if action == "up" else 1)
+        elif action == "remove":
+            self.remove_item(video)
+        elif action == "reload":
+            self.reload_from_queue(video.model_copy())
+        elif action == "retry":
+            self.retry_video(video)
+        elif action == "open":
+            open_folder(video.video_settings.output_path.parent)
+        elif action == "watch":
+            QtGui.QDesktopServices.openUrl(QtCore.QUrl.fromLocalFile(str(video.video_settings.output_path)))
+
+    def item_menu(self, position: QtCore.QPoint):
+        index = self.view.indexAt(position)
+        if not index.isValid():
+            return
+        video: Video = index.data(QueueModel.video_role)
+        if not video.status.ready:
+            return
+        menu = QtWidgets.QMenu(self)
+        priorities = menu.addMenu(t("Queue Priority"))
+        for name, level in priority_classes.items():
+            action = priorities.addAction(t(name))
+            action.setCheckable(True)
+            action.setChecked(video.priority == level)
+            action.triggered.connect(lambda _=False, level=level: self.schedule(video, priority=level))
+        menu.addAction(t("Set Deadline"), lambda: self.edit_deadline(video))
+        if video.deadline:
+            menu.addAction(t("Clear Deadline"), lambda: self.schedule(video, deadline=None))
+        menu.exec(self.view.viewport().mapToGlobal(position))
+
+    def edit_deadline(self, video: Video):
+        dialog = QtWidgets.QDialog(self)
+        dialog.setWindowTitle(t("Deadline"))
+        when = QtWidgets.QDateTimeEdit(video.deadline or datetime.now().replace(second=0, microsecond=0))
+        when.setCalendarPopup(True)
+        when.setDisplayFormat("yyyy-MM-dd HH:mm")
+        when.setToolTip(t("When this video should be done by, used by the Earliest Deadline queue order"))
+        buttons = QtWidgets.QDialogButtonBox(QtWidgets.QDialogButtonBox.Ok | QtWidgets.QDialogButtonBox.Cancel)
+        buttons.accepted.connect(dialog.accept)
+        buttons.rejected.connect(dialog.reject)
+        layout = QtWidgets.QVBoxLayout()
+        layout.addWidget(when)
+        layout.addWidget(buttons)
+        dialog.setLayout(layout)
+        if dialog.exec() == QtWidgets.QDialog.Accepted:
+            self.schedule(video, deadline=when.dateTime().toPython())
 
     def clear_complete(self):
-        for queued_item in self.tracks:
-            if queued_item.video.status.complete:
-                self.remove_item(queued_item.video, part_of_clear=True)
+        for video in list(self.app.fastflix.conversion_list):
+            if video.status.complete:
+                self.remove_item(video, part_of_clear=True)
         self.new_source()
 
     def remove_item(self, video, part_of_clear=False):
@@ -435,11 +593,29 @@ class EncodingQueue(FlixList):
             logger.error("No matching video found to remove from queue")
             return
         del self.app.fastflix.conversion_list[pos]
+        segments.cleanup(video)
 
         if not part_of_clear:
             self.new_source()
         save_queue(self.app.fastflix.conversion_list, self.app.fastflix.queue_path, self.app.fastflix.config)
 
+    def schedule(self, video, **fields):
+        """Change the priority or deadline of a queued video"""
+        for queued in self.app.fastflix.conversion_list:
+            if queued.uuid == video.uuid:
+                for name, value in fields.items():
+                    setattr(queued, name, value)
+                break
+        else:
+            logger.error("No matching video found to schedule in queue")
+            return
+        self.update_video(queued)
+        save_queue(self.app.fastflix.conversion_list, self.app.fastflix.queue_path, self.app.fastflix.config)
+
+    def set_policy(self, index):
+        self.app.fastflix.config.queue_policy = policies[index]
+        self.app.fastflix.config.save()
+
     def reload_from_queue(self, video):
         try:
             self.main.reload_video_from_queue(video)
@@ -466,26 +642,32 @@ class EncodingQueue(FlixList):
         self.app.fastflix.conversion_paused = not self.app.fastflix.conversion_paused
 
     def pause_resume_encode(self):
-        if self.encode_paused:
-            allow_sleep_mode()
-            self.pause_encode.setText(t("Pause Encode"))
-            self.pause_encode.setIcon(self.app.style().standardIcon(QtWidgets.QStyle.SP_MediaPause))
-            self.app.fastflix.worker_queue.put(["resume encode"])
-        else:
-            if not yes_no_message(
-                t("WARNING: This feature is not provided by the encoder software directly")
-                + "<br><br>"
-                + t("It is NOT supported by VCE or NVENC encoders, it will break the encoding")
-                + "<br><br>"
-                + t("Are you sure you want to continue?"),
-                "Pause Warning",
-            ):
-                return
+        if not self.encode_paused and not yes_no_message(
+            t("WARNING: This feature is not provided by the encoder software directly")
+            + "<br><br>"
+            + t("It is NOT supported by VCE or NVENC encoders, it will break the encoding")
+            + "<br><br>"
+            + t("Are you sure you want to continue?"),
+            "Pause Warning",
+        ):
+            return
+        self.set_encode_paused(not self.encode_paused)
+
+    def set_encode_paused(self, paused: bool):
+        """Pause or resume the current command, also used by the control API so the button always matches"""
+        if paused == self.encode_paused:
+            return
+        if paused:
             prevent_sleep_mode()
             self.pause_encode.setText(t("Resume Encode"))
             self.pause_encode.setIcon(self.app.style().standardIcon(QtWidgets.QStyle.SP_MediaPlay))
             self.app.fastflix.worker_queue.put(["pause encode"])
-        self.encode_paused = not self.encode_paused
+        else:
+            allow_sleep_mode()
+            self.pause_encode.setText(t("Pause Encode"))
+            self.pause_encode.setIcon(self.app.style().standardIcon(QtWidgets.QStyle.SP_MediaPause))
+            self.app.fastflix.worker_queue.put(["resume encode"])
+        self.encode_paused = paused
 
     def ignore_failures(self):
         if self.ignore_errors.isChecked():
@@ -516,15 +698,7 @@ class EncodingQueue(FlixList):
         else:
             logger.error(f"Can't find video {current_video.uuid} in queue to update its status")
             return
-        self.new_source()
-
-    def move_up(self, widget):
-        if not self.app.fastflix.currently_encoding:
-            super().move_up(widget)
-
-    def move_down(self, widget):
-        if not self.app.fastflix.currently_encoding:
-            super().move_down(widget)
+        self.update_video(video)
 
     def add_to_queue(self):
         if not self.main.encoding_checks():
@@ -533,22 +707,48 @@ class EncodingQueue(FlixList):
         if not self.main.build_commands():
             return False
 
+        self.check_queueable(self.app.fastflix.current_video)
+
+        # if source_in_queue:
+        # TODO ask if ok
+        # return
+
+        self.enqueue([copy.deepcopy(self.app.fastflix.current_video)])
+        self.new_source()
+
+    def check_queueable(self, new_video: Video):
         for video in self.app.fastflix.conversion_list:
             if video.status.complete:
                 continue
             # if self.app.fastflix.current_video.source == video.source:
             #     source_in_queue = True
-            if self.app.fastflix.current_video.video_settings.output_path == video.video_settings.output_path:
+            if new_video.video_settings.output_path == video.video_settings.output_path:
                 raise FastFlixInternalException(
                     f"{video.video_settings.output_path} {t('out file is already in queue')}"
                 )
 
-        # if source_in_queue:
-        # TODO ask if ok
-        # return
-
-        self.app.fastflix.conversion_list.append(copy.deepcopy(self.app.fastflix.current_video))
-        self.new_source()
+        if new_video.video_settings.target_quality is not None:
+            if not rate_control(new_video.video_settings.video_encoder_settings):
+                raise FastFlixInternalException(
+                    f"{new_video.video_settings.video_encoder_settings.name} {t('does not support a target quality')}, "
+                    f"{t('clear it under the Advanced tab')}"
+                )
+            if new_video.video_settings.target_quality_metric == "vmaf" and (
+                "libvmaf" not in (self.app.fastflix.ffmpeg_config or [])
+            ):
+                raise FastFlixInternalException(t("FFmpeg was not built with libvmaf, use an SSIM target instead"))
+
+    def enqueue(self, videos: List[Video]):
+        """Add finished videos to the queue, start their pre-encode checks and save the queue once for all of them"""
+        for queued in videos:
+            self.app.fastflix.conversion_list.append(queued)
+            if any(normalized(track) for track in queued.audio_tracks):
+                # Measured first, so the search and estimate sample the normalized audio
+                self.main.queue_loudness(queued)
+            elif queued.video_settings.target_quality is not None:
+                self.main.queue_target_quality(queued)
+            else:
+                self.main.queue_estimate(queued)
         save_queue(self.app.fastflix.conversion_list, self.app.fastflix.queue_path, self.app.fastflix.config)
 
     def run_after_done(self):
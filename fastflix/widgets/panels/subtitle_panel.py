@@ -1,18 +1,19 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
-from typing import Union
+from typing import List, Union
 
 from box import Box
 from iso639 import iter_langs
 from iso639.exceptions import InvalidLanguageValue
 from PySide6 import QtCore, QtGui, QtWidgets
 
+from fastflix.flix import subtitle_types
 from fastflix.language import t, Language
 from fastflix.models.encode import SubtitleTrack
 from fastflix.models.fastflix_app import FastFlixApp
 from fastflix.resources import loading_movie, get_icon
 from fastflix.shared import error_message, no_border, clear_list
-from fastflix.widgets.background_tasks import ExtractSubtitleSRT
+from fastflix.widgets.background_tasks import ExtractSubtitles
 from fastflix.widgets.panels.abstract_list import FlixList
 from fastflix.widgets.windows.disposition import Disposition
 
@@ -28,17 +29,6 @@ disposition_options = [
     "hearing_impaired",
 ]
 
-subtitle_types = {
-    "dvd_subtitle": "picture",
-    "hdmv_pgs_subtitle": "pgs",
-    "dvdsub": "picture",
-    "subrip": "text",
-    "ssa": "text",
-    "ass": "text",
-    "mov_text": "text",
-    "webvtt": "text",
-    "xsub": "text",
-}
 
 language_list = [v.name for v in iter_langs() if v.pt2b and v.pt1] + ["Undefined"]
 
@@ -167,11 +157,14 @@ class Subtitle(QtWidgets.QTabWidget):
         layout.addWidget(self.widgets.down_button)
         return layout
 
+    @property
+    def extractable(self) -> bool:
+        return self.app.fastflix.current_video.subtitle_tracks[self.index].subtitle_type in ["text", "pgs"]
+
     def extract(self):
-        worker = ExtractSubtitleSRT(
-            self.parent.app, self.parent.main, self.index, self.extract_completed_signal, language=self.language
-        )
-        worker.start()
+        self.parent.extract([self])
+
+    def extraction_started(self):
         self.gif_label.show()
         self.widgets.extract.hide()
         self.movie.start()
@@ -277,7 +270,12 @@ class SubtitleList(FlixList):
         self.save_all_button = QtWidgets.QPushButton(t("Preserve All"))
         self.save_all_button.setFixedWidth(150)
         self.save_all_button.clicked.connect(lambda: self.select_all(True))
+        self.extract_all_button = QtWidgets.QPushButton(t("Extract Selected"))
+        self.extract_all_button.setFixedWidth(150)
+        self.extract_all_button.setToolTip(t("Extract every preserved text or PGS track with one read of the source"))
+        self.extract_all_button.clicked.connect(self.extract_selected)
 
+        top_layout.addWidget(self.extract_all_button)
         top_layout.addWidget(self.remove_all_button)
         top_layout.addWidget(self.save_all_button)
 
@@ -285,11 +283,38 @@ class SubtitleList(FlixList):
         self.main = parent.main
         self.app = app
         self._first_selected = False
+        self.extractors = []
 
     def select_all(self, select=True):
         for track in self.tracks:
             track.widgets.enable_check.setChecked(select)
 
+    def extract_selected(self):
+        selected = [track for track in self.tracks if track.enabled and track.extractable]
+        if not selected:
+            return error_message(t("There are no preserved text or PGS subtitle tracks to extract"))
+        self.extract(selected)
+
+    def extract(self, tracks: List[Subtitle]):
+        worker = ExtractSubtitles(
+            self.app,
+            self.main,
+            [
+                (
+                    track.index,
+                    self.app.fastflix.current_video.subtitle_tracks[track.index].model_copy(
+                        update={"language": track.language}
+                    ),
+                )
+                for track in tracks
+            ],
+            [track.extract_completed_signal for track in tracks],
+        )
+        self.extractors = [x for x in self.extractors if x.isRunning()] + [worker]
+        for track in tracks:
+            track.extraction_started()
+        worker.start()
+
     def lang_match(self, track: Union[Subtitle, dict], ignore_first=False):
         if not self.app.fastflix.config.opt("subtitle_select"):
             return False
@@ -2,12 +2,13 @@
 # -*- coding: utf-8 -*-
 import copy
 import logging
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Optional
 
 from PySide6 import QtGui, QtWidgets, QtCore
 
 from fastflix.language import t
 from fastflix.models.fastflix_app import FastFlixApp
+from fastflix.models.video import Video
 from fastflix.resources import get_icon
 from fastflix.shared import DEVMODE, error_message
 from fastflix.widgets.panels.advanced_panel import AdvancedPanel
@@ -280,8 +281,12 @@ class VideoOptions(QtWidgets.QTabWidget):
         self.info.reset()
         self.debug.reset()
 
-    def update_queue(self):
-        self.queue.new_source()
+    def update_queue(self, video: Optional[Video] = None):
+        """Show a change to the video, or to the whole queue when videos were added, removed or moved"""
+        if video:
+            self.queue.update_video(video)
+        else:
+            self.queue.new_source()
 
     def show_queue(self):
         if not self.app.fastflix.config.sticky_tabs:
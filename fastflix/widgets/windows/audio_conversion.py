@@ -177,6 +177,17 @@ class AudioConversion(QtWidgets.QWidget):
         downmix_layout.addWidget(QtWidgets.QLabel(t("Channel Layout")))
         downmix_layout.addWidget(self.downmix, 2)
 
+        # Loudness
+
+        self.normalize = QtWidgets.QCheckBox(t("Normalize loudness (EBU R128)"))
+        self.normalize.setToolTip(
+            t("Measures the track once before encoding, then evens out its loudness to -23 LUFS in the same encode")
+        )
+        self.normalize.setChecked(self.audio_track.normalize)
+        encoder_name = app.fastflix.current_video.video_settings.video_encoder_settings.name
+        self.normalize_available = "encc" not in encoder_name.lower()
+        self.set_normalize_enabled()
+
         # Yes No
 
         yes_no_layout = QtWidgets.QHBoxLayout()
@@ -191,6 +202,7 @@ class AudioConversion(QtWidgets.QWidget):
         layout.addLayout(conversion_layout)
         layout.addLayout(quality_layout)
         layout.addLayout(downmix_layout)
+        layout.addWidget(self.normalize)
         layout.addLayout(yes_no_layout)
 
         self.setLayout(layout)
@@ -210,6 +222,11 @@ class AudioConversion(QtWidgets.QWidget):
         else:
             self.aq.setEnabled(True)
             # self.bitrate.setDisabled(True)
+        self.set_normalize_enabled()
+
+    def set_normalize_enabled(self):
+        # The filter needs a decode, so there is nothing to normalize when copying the track
+        self.normalize.setEnabled(self.normalize_available and self.conversion_codec.currentIndex() != 0)
 
     def save(self):
         if self.conversion_codec.currentIndex() != 0:
@@ -228,5 +245,9 @@ class AudioConversion(QtWidgets.QWidget):
             self.audio_track.downmix = self.downmix.currentText()
         else:
             self.audio_track.downmix = None
+
+        self.audio_track.normalize = self.normalize.isEnabled() and self.normalize.isChecked()
+        # Measured for the channel layout being encoded, so measure again when the queue item is made
+        self.audio_track.loudness = None
         self.audio_track_update()
         self.close()
@@ -1,9 +1,6 @@
 # -*- coding: utf-8 -*-
 import logging
-from pathlib import Path
-from subprocess import run, PIPE
-from typing import Optional, TYPE_CHECKING
-import secrets
+from typing import TYPE_CHECKING
 
 from PySide6 import QtWidgets, QtCore, QtGui
 
@@ -13,6 +10,7 @@ from fastflix.flix import (
 from fastflix.encoders.common import helpers
 from fastflix.resources import get_icon
 from fastflix.language import t
+from fastflix.widgets.background_tasks import PreviewScheduler
 
 if TYPE_CHECKING:
     from fastflix.widgets.main import Main
@@ -47,8 +45,9 @@ class LargePreview(QtWidgets.QWidget):
         self.setMaximumHeight(size.height())
         self.setMinimumSize(400, 400)
         self.current_image = QtGui.QPixmap(get_icon("onyx-cover", self.main.app.fastflix.config.theme))
-        self.last_path: Optional[Path] = None
         self.last_command = "NOPE"
+        self.preview_scheduler = PreviewScheduler(self, name="large preview")
+        self.preview_scheduler.completed.connect(self.image_generated)
         self.setWindowTitle(t("Preview - Press Q to Exit"))
 
     def keyPressEvent(self, a0: QtGui.QKeyEvent) -> None:
@@ -74,33 +73,29 @@ class LargePreview(QtWidgets.QWidget):
             **settings,
         )
 
-        output = self.main.app.fastflix.config.work_path / f"large_preview_{secrets.token_hex(16)}.tiff"
-
         thumb_command = generate_thumbnail_command(
             config=self.main.app.fastflix.config,
             source=self.main.source_material,
-            output=output,
+            output=None,
             filters=filters,
             start_time=self.main.preview_place,
             input_track=self.main.app.fastflix.current_video.video_settings.selected_track,
+            image_codec="png",
         )
         if thumb_command == self.last_command:
             return
+        self.last_command = thumb_command
 
         logger.info(f"Generating large thumbnail: {thumb_command}")
+        self.preview_scheduler.submit(thumb_command)
 
-        thumb_run = run(thumb_command, shell=True, stderr=PIPE, stdout=PIPE)
-        if thumb_run.returncode > 0:
-            logger.warning(f"Could not generate large thumbnail: {thumb_run.stdout} |----| {thumb_run.stderr}")
+    def image_generated(self, status, job):
+        if status != 1:
+            logger.warning(f"Could not generate large thumbnail: {job.stderr}")
+            self.last_command = "NOPE"
             return
 
-        self.current_image = QtGui.QPixmap(str(output))
-        if self.last_path:
-            try:
-                self.last_path.unlink(missing_ok=True)
-            except OSError:
-                logger.warning(f"Could not delete last large preview {self.last_path}")
-        self.last_path = output
+        self.current_image = QtGui.QPixmap.fromImage(job.image)
         self.label.setPixmap(self.current_image)
         self.resize(self.current_image.width(), self.current_image.height())
 
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+import logging
+from pathlib import Path
+
+from PySide6 import QtCore, QtWidgets
+
+from fastflix.language import t
+
+logger = logging.getLogger("fastflix")
+
+
+class WatchFoldersWindow(QtWidgets.QWidget):
+    def __init__(self, app, main):
+        super().__init__(None)
+        self.app = app
+        self.main = main
+        self.setStyleSheet("font-size: 14px")
+        self.setWindowTitle(t("Watch Folders"))
+        self.setMinimumWidth(700)
+
+        self.table = QtWidgets.QTableWidget(0, 2)
+        self.table.setHorizontalHeaderLabels([t("Folder"), t("Profile")])
+        self.table.verticalHeader().hide()
+        self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectionBehavior.SelectRows)
+        self.table.horizontalHeader().setSectionResizeMode(0, QtWidgets.QHeaderView.Stretch)
+        self.table.setColumnWidth(1, 250)
+        for folder, profile in self.app.fastflix.config.watch_folders.items():
+            self.add_row(folder, profile)
+
+        add_button = QtWidgets.QPushButton(t("Add Folder"))
+        add_button.clicked.connect(self.select_folder)
+        remove_button = QtWidgets.QPushButton(t("Remove"))
+        remove_button.clicked.connect(self.remove_selected)
+        save_button = QtWidgets.QPushButton(t("Save"))
+        save_button.clicked.connect(self.save)
+
+        top_bar = QtWidgets.QHBoxLayout()
+        top_bar.addWidget(add_button)
+        top_bar.addWidget(remove_button)
+        top_bar.addStretch(1)
+        top_bar.addWidget(save_button)
+
+        layout = QtWidgets.QVBoxLayout()
+        layout.addLayout(top_bar)
+        layout.addWidget(
+            QtWidgets.QLabel(
+                t("New videos saved into these folders are added to the queue with the profile set for the folder")
+            )
+        )
+        layout.addWidget(self.table)
+        self.setLayout(layout)
+
+    def add_row(self, folder: str, profile: str):
+        row = self.table.rowCount()
+        self.table.insertRow(row)
+        item = QtWidgets.QTableWidgetItem(folder)
+        item.setFlags(item.flags() & ~QtCore.Qt.ItemIsEditable)
+        self.table.setItem(row, 0, item)
+        profile_box = QtWidgets.QComboBox()
+        profile_box.addItems(self.app.fastflix.config.profiles.keys())
+        profile_box.setCurrentText(profile)
+        self.table.setCellWidget(row, 1, profile_box)
+
+    def select_folder(self):
+        folder = QtWidgets.QFileDialog.getExistingDirectory(
+            self, dir=str(self.app.fastflix.config.source_directory or Path.home())
+        )
+        if not folder:
+            return
+        self.add_row(str(Path(folder)), self.app.fastflix.config.selected_profile)
+
+    def remove_selected(self):
+        for row in sorted({index.row() for index in self.table.selectedIndexes()}, reverse=True):
+            self.table.removeRow(row)
+
+    def save(self):
+        self.app.fastflix.config.watch_folders = {
+            self.table.item(row, 0).text(): self.table.cellWidget(row, 1).currentText()
+            for row in range(self.table.rowCount())
+        }
+        self.app.fastflix.config.save()
+        self.main.start_folder_watch()
+        self.close()
@@ -1,6 +1,37 @@
 # -*- coding: utf-8 -*-
 
-from fastflix.encoders.common.audio import audio_quality_converter, build_audio, channel_list, lossless
+from pathlib import Path
+
+from fastflix.encoders.common.audio import (
+    audio_quality_converter,
+    build_audio,
+    channel_list,
+    loudness_analysis_command,
+    lossless,
+    parse_loudness,
+)
+from fastflix.models.encode import LoudnessMeasurement
+
+loudnorm_output = """
+[Parsed_loudnorm_3 @ 0x2]
+{
+	"input_i" : "-inf",
+	"input_tp" : "-inf",
+	"input_lra" : "0.00",
+	"input_thresh" : "-inf",
+	"target_offset" : "inf"
+}
+[Parsed_loudnorm_1 @ 0x1]
+{
+	"input_i" : "-17.52",
+	"input_tp" : "-1.20",
+	"input_lra" : "9.30",
+	"input_thresh" : "-27.80",
+	"output_i" : "-23.01",
+	"normalization_type" : "dynamic",
+	"target_offset" : "0.01"
+}
+"""
 
 
 def test_channel_list():
@@ -216,3 +247,43 @@ def test_build_audio_with_strict_codecs(sample_audio_tracks):
 
     # Check that -strict -2 is added
     assert "-strict -2" in result
+
+
+def test_loudness_analysis_command(sample_audio_tracks):
+    """Every track is measured in the same decode, each in its own filter chain."""
+    sample_audio_tracks[1].downmix = "mono"
+    command = loudness_analysis_command(Path("ffmpeg"), Path("input.mkv"), sample_audio_tracks[:2])
+
+    chains = command[command.index("-filter_complex") + 1].split(";")
+    assert chains[0].startswith("[0:1]aformat=channel_layouts=5.1(side),loudnorm=I=-23:TP=-1:LRA=7")
+    assert chains[1].startswith("[0:2]aformat=channel_layouts=mono,loudnorm=")
+    assert chains[1].endswith("print_format=json[loud1]")
+    assert command.count("-map") == 2
+    assert command[-3:] == ["-f", "null", "-"]
+
+
+def test_parse_loudness(sample_audio_tracks):
+    """Results are matched to tracks by filter order, silent tracks are skipped."""
+    measurements = parse_loudness(loudnorm_output, sample_audio_tracks[:2])
+    assert list(measurements) == [0]
+    assert measurements[0].input_i == -17.52
+    assert measurements[0].target_offset == 0.01
+    assert parse_loudness("no loudnorm here", sample_audio_tracks) == {}
+
+
+def test_build_audio_normalized(sample_audio_tracks):
+    """Measured tracks get the second loudnorm pass in their existing audio filter."""
+    for track in sample_audio_tracks[:2]:
+        track.conversion_codec = "aac"
+        track.normalize = True
+    sample_audio_tracks[0].loudness = LoudnessMeasurement(
+        input_i=-17.52, input_tp=-1.2, input_lra=9.3, input_thresh=-27.8, target_offset=0.01
+    )
+
+    result = build_audio(sample_audio_tracks)
+    assert (
+        '-filter:0 "aformat=channel_layouts=5.1(side),loudnorm=I=-23:TP=-1:LRA=7:measured_I=-17.52'
+        ':measured_TP=-1.2:measured_LRA=9.3:measured_thresh=-27.8:offset=0.01:linear=true,aresample=48000"'
+    ) in result
+    # Not measured yet, so not normalized
+    assert '-filter:1 "aformat=channel_layouts=stereo"' in result
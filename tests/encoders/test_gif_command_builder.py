@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+from pathlib import Path
+
+from fastflix.encoders.gif.command_builder import build
+from fastflix.models.encode import GIFSettings
+from fastflix.models.video import VideoSettings
+
+from tests.conftest import create_fastflix_instance
+
+
+def gif_instance(**settings):
+    fastflix = create_fastflix_instance(
+        encoder_settings=GIFSettings(**settings),
+        video_settings=VideoSettings(remove_hdr=False, output_path=Path("output.gif")),
+    )
+    fastflix.current_video.work_path = Path("work")
+    return fastflix
+
+
+def test_gif_single_pass():
+    """Test the palette being made and used in one command."""
+    result = build(gif_instance(fps="10", dither="none", single_pass=True))
+
+    assert len(result) == 1, f"Expected 1 Command object, got {len(result)}"
+    assert result[0].command.count("-i ") == 1
+    assert (
+        '-filter_complex "[0:0]fps=10[v];[v]split[a][b];[a]palettegen=stats_mode=full[p];'
+        '[b][p]paletteuse=dither=none[o]" -map "[o]"'
+    ) in result[0].command
+    assert "temp_palette" not in result[0].command
+
+
+def test_gif_single_pass_per_frame_palette():
+    """Test a new palette for every frame when the statistics mode is single."""
+    (command,) = build(gif_instance(stats_mode="single", max_colors="64", single_pass=True))
+
+    assert "palettegen=stats_mode=single:max_colors=64[p]" in command.command
+    assert "paletteuse=dither=sierra2_4a:new=1[o]" in command.command
+
+
+def test_gif_two_pass():
+    """Test the palette pass into a temporary file, followed by the GIF pass, which is the default."""
+    result = build(gif_instance())
+
+    assert [command.name for command in result] == ["Pallet generation", "GIF creation"]
+    assert "palettegen=stats_mode=full" in result[0].command
+    assert "temp_palette_" in result[1].command
@@ -166,6 +166,43 @@ def test_generate_filters_with_multiple_options():
     assert result == expected
 
 
+def test_generate_filters_ladder():
+    """Test the generate_filters function splitting the filtered video into ladder renditions."""
+    ladder = [{"height": 720}, {"height": 480}]
+    result = generate_filters(
+        selected_track=0,
+        source=Path("input.mkv"),
+        crop={"width": 1920, "height": 800, "left": 0, "top": 140},
+        scale="1280:-8",
+        ladder=ladder,
+        ladder_output=0,
+    )
+
+    expected = (
+        ' -filter_complex "[0:0]crop=1920:800:0:140[v];[v]split=3[v_split0][v_split1][v_split2];'
+        "[v_split0]scale=1280:-8:flags=lanczos,setsar=1:1[v0];[v_split1]scale=-2:720:flags=lanczos,setsar=1:1[v1];"
+        '[v_split2]scale=-2:480:flags=lanczos,setsar=1:1[v2]" -map "[v0]" '
+    )
+    assert result == expected
+
+    # Later outputs only map their part of the graph
+    assert generate_filters(selected_track=0, ladder=ladder, ladder_output=2) == ' -map "[v2]" '
+
+
+def test_generate_filters_input_index():
+    """Test the generate_filters function reading from another input with a custom output label."""
+    result = generate_filters(
+        selected_track=0,
+        source=Path("input.mkv"),
+        scale="440:-8",
+        raw_filters=True,
+        input_index=3,
+        output_label="v3",
+    )
+
+    assert result == "[3:0]scale=440:-8:flags=lanczos,setsar=1:1[v3]"
+
+
 def test_generate_all(fastflix_instance):
     """Test the generate_all function."""
     # Mock the component functions to isolate the test
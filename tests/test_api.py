@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+import subprocess
+import sys
+
+import pytest
+
+from fastflix.api import plan
+from fastflix.exceptions import FlixError
+from fastflix.models.encode import x265Settings
+from tests.conftest import create_fastflix_instance
+
+
+def test_api_is_qt_free():
+    code = (
+        "import sys\n"
+        "from pathlib import Path\n"
+        "from fastflix.api import load_encoders\n"
+        "from fastflix.models.config import Config\n"
+        "config = Config(version='4.0.0', ffmpeg=Path('ffmpeg'), ffprobe=Path('ffprobe'), work_path=Path('.'))\n"
+        "encoders = load_encoders(config, ['libx265'])\n"
+        "assert 'HEVC (x265)' in encoders and 'AVC (x264)' not in encoders\n"
+        "assert all(callable(encoder.build) for encoder in encoders.values())\n"
+        "print(sorted(m for m in sys.modules if m.startswith('PySide6')))\n"
+    )
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[]"
+
+
+def test_api_plan_unknown_profile(tmp_path):
+    fastflix = create_fastflix_instance(x265Settings())
+    with pytest.raises(FlixError):
+        plan(tmp_path / "movie.mkv", "No Such Profile", fastflix=fastflix, work_path=tmp_path)
@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+import os
+import time
+
+from fastflix.cache import FileCache, cache_key, source_identity
+
+
+def test_cache_key_stable():
+    assert cache_key("a", 1, None) == cache_key("a", 1, None)
+    assert cache_key("a", 1) != cache_key("a", 2)
+    assert cache_key("ab", "c") != cache_key("a", "bc")
+
+
+def test_source_identity_changes(tmp_path):
+    source = tmp_path / "video.mkv"
+    source.write_bytes(b"123")
+    first = source_identity(source)
+    assert first == source_identity(source)
+    source.write_bytes(b"123456")
+    assert first != source_identity(source)
+
+
+def test_file_cache_lru(tmp_path):
+    cache = FileCache(tmp_path / "cache", max_size=25, suffix=".jpg")
+    cache.store("one", b"1" * 10)
+    cache.store("two", b"2" * 10)
+    assert cache.get("one").read_bytes() == b"1" * 10
+
+    cache.store("three", b"3" * 10)
+    assert "two" not in cache
+    assert "one" in cache
+    assert "three" in cache
+    assert not (tmp_path / "cache" / "two.jpg").exists()
+    assert cache.size == 20
+
+
+def test_file_cache_add_and_reload(tmp_path):
+    rendered = tmp_path / "render.jpg"
+    rendered.write_bytes(b"image")
+
+    cache = FileCache(tmp_path / "cache", max_size=1000, suffix=".jpg")
+    assert cache.add("thumb", rendered, move=True) == tmp_path / "cache" / "thumb.jpg"
+    assert not rendered.exists()
+
+    old = time.time() - 100
+    os.utime(cache.path("thumb"), (old, old))
+    cache.store("newer", b"data")
+
+    reloaded = FileCache(tmp_path / "cache", max_size=1000, suffix=".jpg")
+    assert len(reloaded) == 2
+    assert reloaded.read("thumb") == b"image"
+    assert list(reloaded._entries) == ["newer", "thumb"]
+
+
+def test_file_cache_keeps_newest(tmp_path):
+    cache = FileCache(tmp_path, max_size=0)
+    cache.store("big", b"too big for the cache")
+    assert cache.read("big") == b"too big for the cache"
+    cache.store("bigger", b"also too big for the cache")
+    assert "big" not in cache
+    assert len(cache) == 1
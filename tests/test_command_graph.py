@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+from pathlib import Path
+
+from fastflix.command_graph import all_finished, dependencies, finish_command, ready_commands
+from fastflix.encoders.common.helpers import Command
+from fastflix.models.video import Video, VideoSettings
+
+
+def video_with(*depends_on) -> Video:
+    commands = [Command(command="", name=f"Step {i + 1}") for i in range(len(depends_on))]
+    for command, depends in zip(commands, depends_on):
+        command.depends_on = None if depends is None else [commands[i].uuid for i in depends]
+    return Video(source=Path("source.mkv"), video_settings=VideoSettings(conversion_commands=commands))
+
+
+def test_command_dependencies():
+    video = video_with(None, None, [], [0, 2], [])
+    commands = video.video_settings.conversion_commands
+    assert [dependencies(commands, i) for i in range(4)] == [[], [0], [], [0, 2]]
+    # Only earlier commands can be waited on, anything else waits on all of them
+    commands[4].depends_on = ["unknown"]
+    assert dependencies(commands, 4) == [0, 1, 2, 3]
+
+
+def test_command_ready_and_finish():
+    video = video_with([], [], [0, 1])
+    assert ready_commands(video) == [0, 1]
+    assert ready_commands(video, running=[0]) == [1]
+
+    finish_command(video, 1)
+    assert video.status.current_command == 0
+    assert ready_commands(video) == [0]
+
+    finish_command(video, 0)
+    assert video.status.current_command == 2 and video.status.finished_commands == []
+    assert ready_commands(video) == [2]
+    finish_command(video, 2)
+    assert all_finished(video)
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+import json
+import urllib.error
+import urllib.request
+from datetime import datetime
+from queue import Queue
+
+import pytest
+
+from fastflix.control_server import INVALID_PARAMS, METHOD_NOT_FOUND, UNAVAILABLE, ControlServer, ProgressLog
+
+
+@pytest.fixture
+def server():
+    control = ControlServer(Queue(), Queue(), token="secret")
+    control.start()
+    yield control
+    control.stop()
+
+
+def post(server, body, content_type="application/json", token="secret", host=None):
+    headers = {"Content-Type": content_type, "Authorization": f"Bearer {token}"}
+    if host:
+        headers["Host"] = host
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{server.port}/rpc", data=json.dumps(body).encode(), headers=headers
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return json.loads(response.read() or "null")
+
+
+def call(server, method, **params):
+    return post(server, {"jsonrpc": "2.0", "id": 1, "method": method, "params": params})
+
+
+def test_control_server_rpc(server, tmp_path):
+    assert call(server, "pause")["result"] is True
+    assert call(server, "priority", priority="Idle")["result"] is True
+    assert server.worker_queue.get_nowait() == ["priority", "Idle"]
+    assert server.worker_queue.empty()
+    # Pausing goes through the GUI so its pause button follows, or straight to the worker without one
+    assert server.status_queue.get_nowait() == ("pause encode",)
+    server.gui_alive = lambda: False
+    assert call(server, "resume")["result"] is True
+    assert server.worker_queue.get_nowait() == ["resume encode"]
+    assert call(server, "start")["error"]["code"] == UNAVAILABLE
+    server.gui_alive = lambda: True
+
+    assert call(server, "priority", priority="Fastest")["error"]["code"] == INVALID_PARAMS
+    assert call(server, "enqueue", source=str(tmp_path / "missing.mkv"))["error"]["code"] == INVALID_PARAMS
+    assert call(server, "reboot")["error"]["code"] == METHOD_NOT_FOUND
+
+    video = tmp_path / "movie.mkv"
+    video.touch()
+    assert call(server, "enqueue", source=str(video), start=True)["result"] is True
+    assert server.status_queue.get_nowait() == ("enqueue", str(video), "", True, {"priority": 0, "deadline": None})
+    assert call(server, "enqueue", source=str(video), priority=2, deadline="2026-10-20T18:30")["result"] is True
+    assert server.status_queue.get_nowait()[-1] == {"priority": 2, "deadline": datetime(2026, 10, 20, 18, 30)}
+    assert call(server, "enqueue", source=str(video), deadline="tomorrow")["error"]["code"] == INVALID_PARAMS
+
+    server.publish({"event": "start", "video": "a", "command": "b", "priority": "Normal"})
+    assert call(server, "status")["result"]["video"] == "a"
+    server.publish({"event": "complete", "video": "a", "command": "b"})
+    assert call(server, "status")["result"]["encoding"] is False
+
+
+def test_control_server_rejects_requests(server):
+    with pytest.raises(urllib.error.HTTPError) as err:
+        post(server, {"jsonrpc": "2.0", "method": "cancel"}, token="wrong")
+    assert err.value.code == 401
+    with pytest.raises(urllib.error.HTTPError) as err:
+        post(server, {"jsonrpc": "2.0", "method": "cancel"}, content_type="text/plain")
+    assert err.value.code == 415
+    # Only addressed to the loopback address or localhost, whatever name resolved to it
+    with pytest.raises(urllib.error.HTTPError) as err:
+        post(server, {"jsonrpc": "2.0", "method": "cancel"}, host=f"rebind.example.com:{server.port}")
+    assert err.value.code == 403
+    assert post(server, {"jsonrpc": "2.0", "method": "cancel"}, host=f"localhost:{server.port}") is None
+    assert server.worker_queue.get_nowait() == ["cancel"]
+    assert server.worker_queue.empty()
+
+
+def test_control_server_events(server):
+    request = urllib.request.Request(
+        f"http://127.0.0.1:{server.port}/events", headers={"Authorization": "Bearer secret"}
+    )
+    with urllib.request.urlopen(request, timeout=5) as response:
+
+        def next_event():
+            line = response.readline().decode()
+            response.readline()
+            return json.loads(line.removeprefix("data: "))
+
+        assert next_event()["event"] == "status"
+        log_queue = Queue()
+        progress = ProgressLog(log_queue, server.publish, interval=0)
+        server.publish({"event": "start", "video": "a", "command": "b", "priority": "Normal"})
+        progress.put("frame=  240 fps= 48 q=28.0 size=    1024kB time=00:01:10.01 bitrate= 838.8kbits/s speed=1.2x")
+        progress.put("Stream mapping:")
+        assert next_event()["event"] == "start"
+        assert next_event() == {
+            "event": "progress",
+            "frame": 240,
+            "fps": 48.0,
+            "time": 70.01,
+            "speed": 1.2,
+            "bitrate": "838.8kbits/s",
+            "video": "a",
+            "command": "b",
+        }
+        assert log_queue.qsize() == 2
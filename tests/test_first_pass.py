@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+from fastflix.cache import FileCache
+from fastflix.encoders.avc_x264 import main as x264
+from fastflix.encoders.hevc_x265 import main as x265
+from fastflix.first_pass import first_pass_key, reuse_first_pass, stats_location, stats_prefix, store_first_pass
+from fastflix.models.encode import x264Settings, x265Settings
+from fastflix.models.video import VideoSettings
+from tests.conftest import create_fastflix_instance
+
+
+def two_pass_video(tmp_path, encoder, settings):
+    fastflix = create_fastflix_instance(settings, VideoSettings())
+    video = fastflix.current_video
+    video.work_path = tmp_path
+    video.video_settings.conversion_commands = encoder.build(fastflix=fastflix)
+    return video
+
+
+def test_first_pass_key(tmp_path):
+    low = two_pass_video(tmp_path / "low", x264, x264Settings(bitrate="2000k", crf=None))
+    high = two_pass_video(tmp_path, x264, x264Settings(bitrate="6000k", crf=None))
+    slower = two_pass_video(tmp_path, x264, x264Settings(bitrate="2000k", crf=None, preset="slower"))
+    assert first_pass_key(low, 0)
+    assert first_pass_key(low, 0) == first_pass_key(high, 0)
+    assert first_pass_key(low, 0) != first_pass_key(slower, 0)
+    # The second pass is never cached
+    assert first_pass_key(low, 1) is None
+    assert first_pass_key(two_pass_video(tmp_path, x264, x264Settings(crf=23)), 0) is None
+
+    hevc = two_pass_video(tmp_path, x265, x265Settings(bitrate="4000k", crf=None))
+    assert stats_prefix(hevc.video_settings.conversion_commands[0].command).endswith(".log")
+    assert first_pass_key(hevc, 0) == first_pass_key(
+        two_pass_video(tmp_path, x265, x265Settings(bitrate="8000k", crf=None)), 0
+    )
+
+
+def test_first_pass_reuse(tmp_path):
+    cache = FileCache(tmp_path / "cache", 1_000_000)
+    first = two_pass_video(tmp_path / "first", x265, x265Settings(bitrate="4000k", crf=None))
+    folder, name = stats_location(first, stats_prefix(first.video_settings.conversion_commands[0].command))
+    folder.mkdir(parents=True)
+    (folder / name).write_text("stats")
+    (folder / f"{name}.cutree").write_text("cutree")
+    store_first_pass(first, 0, cache)
+
+    second = two_pass_video(tmp_path / "second", x265, x265Settings(bitrate="8000k", crf=None))
+    assert reuse_first_pass(second, cache) is True
+    assert second.status.current_command == 1
+    folder, name = stats_location(second, stats_prefix(second.video_settings.conversion_commands[0].command))
+    assert (folder / name).read_text() == "stats"
+    assert (folder / f"{name}.cutree").read_text() == "cutree"
+
+    other = two_pass_video(tmp_path / "other", x265, x265Settings(bitrate="8000k", crf=None, preset="slow"))
+    assert reuse_first_pass(other, cache) is False
+    assert other.status.current_command == 0
@@ -88,3 +88,264 @@ def test_nvenc_parse():
 def test_qsv_parse():
     for qsv_test in test_logs["qsv"]:
         assert parse_qsv_devices(qsv_test["text"]) == qsv_test["result"]
+
+
+def test_generate_thumbnail_command_pipe():
+    from box import Box
+    from fastflix.flix import generate_thumbnail_command
+
+    config = Box(ffmpeg="ffmpeg")
+    command = generate_thumbnail_command(
+        config=config, source=Path("in.mkv"), output=None, filters="-vf scale=440:-8", start_time=5, input_track=1
+    )
+    assert command[:3] == ["ffmpeg", "-ss", "5"]
+    assert command[-6:] == ["1", "-f", "image2pipe", "-c:v", "mjpeg", "-"]
+    assert ["-map", "0:1"] == command[command.index("-map") : command.index("-map") + 2]
+
+    command = generate_thumbnail_command(
+        config=config, source=Path("in.mkv"), output=Path("out.png"), filters="-vf scale=440:-8"
+    )
+    assert command[-1] == "out.png"
+    assert "image2pipe" not in command
+
+
+def test_generate_filmstrip_command():
+    from box import Box
+    from fastflix.flix import generate_filmstrip_command
+
+    command = generate_filmstrip_command(
+        config=Box(ffmpeg="ffmpeg"),
+        source=Path("in.mkv"),
+        tile_filters=["[0:0]scale=44:-8[v0]", "[1:0]scale=44:-8[v1]"],
+        start_times=[0, 30.5],
+    )
+    assert command.count("-i") == 2
+    assert command[command.index("-i") - 1] == "0"
+    assert "30.5" in command
+    assert command[command.index("-filter_complex") + 1] == (
+        "[0:0]scale=44:-8[v0];[1:0]scale=44:-8[v1];[v0][v1]hstack=inputs=2[strip]"
+    )
+    assert command[-1] == "-"
+
+
+def test_measure_loudness_cache(monkeypatch, tmp_path):
+    from box import Box
+    from fastflix import flix
+    from fastflix.cache import FileCache
+    from fastflix.models.encode import AudioTrack
+
+    source = tmp_path / "in.mkv"
+    source.write_bytes(b"video")
+    tracks = [
+        AudioTrack(index=i, outdex=i - 1, conversion_codec="aac", normalize=True, raw_info=Box(channel_layout="stereo"))
+        for i in (1, 2)
+    ]
+    decodes = []
+
+    def fake_execute(command, **_):
+        decodes.append(command)
+        output = "".join(
+            f'[Parsed_loudnorm_{i * 2 + 1} @ 0x0]\n{{"input_i": "-{20 + i}", "input_tp": "-2", '
+            f'"input_lra": "5", "input_thresh": "-30", "target_offset": "0.1"}}\n'
+            for i in range(command[command.index("-filter_complex") + 1].count("loudnorm"))
+        )
+        return Box(returncode=0, stderr=output)
+
+    monkeypatch.setattr(flix, "execute", fake_execute)
+    cache = FileCache(tmp_path / "cache", 1_000_000, suffix=".json")
+
+    first = flix.measure_loudness(Path("ffmpeg"), source, tracks[:1], cache)
+    assert first[0].input_i == -20
+    assert len(decodes) == 1
+
+    # Only the track not seen before is decoded again
+    both = flix.measure_loudness(Path("ffmpeg"), source, tracks, cache)
+    assert len(decodes) == 2
+    assert decodes[1][decodes[1].index("-filter_complex") + 1].startswith("[0:2]")
+    assert both[0] == first[0]
+    assert both[1].input_i == -20
+
+    flix.measure_loudness(Path("ffmpeg"), source, tracks, cache)
+    assert len(decodes) == 2
+
+
+def test_execute_cancel():
+    import sys
+    import threading
+    import time
+
+    from fastflix.flix import execute
+
+    cancel = threading.Event()
+    threading.Timer(0.3, cancel.set).start()
+    started = time.monotonic()
+    result = execute([sys.executable, "-c", "import time; time.sleep(30)"], cancel_event=cancel)
+    assert result.returncode != 0
+    assert time.monotonic() - started < 10
+    assert execute([sys.executable, "-c", "print('done')"], cancel_event=threading.Event()).stdout.strip() == "done"
+
+
+def test_parse_probed_details(monkeypatch):
+    from types import SimpleNamespace
+
+    from box import Box
+    from fastflix import flix
+    from fastflix.models.encode import x265Settings
+    from tests.conftest import create_fastflix_instance
+
+    def no_probe(*_):
+        raise AssertionError("Probed again")
+
+    monkeypatch.setattr(flix, "probe", no_probe)
+    app = SimpleNamespace(fastflix=create_fastflix_instance(x265Settings()))
+    details = Box(
+        streams=[
+            {"index": 0, "codec_type": "video", "pix_fmt": "yuv420p10le", "bits_per_raw_sample": "10"},
+            {"index": 1, "codec_type": "audio"},
+        ],
+        format={"duration": "42.5"},
+    )
+    flix.parse(app, details=details)
+    video = app.fastflix.current_video
+    assert video.duration == 42.5
+    assert video.streams.video[0].bit_depth == 10
+    assert len(video.streams.audio) == 1
+
+
+def test_subtitle_extraction_command():
+    from fastflix.flix import subtitle_extraction_command
+
+    command = subtitle_extraction_command(
+        Path("ffmpeg"), Path("in.mkv"), [(3, "subrip", "out.0.eng.srt"), (5, "hdmv_pgs_subtitle", "out.2.jpn.sup")]
+    )
+    assert command.count("-i") == 1
+    assert command[command.index("-progress") + 1] == "pipe:1"
+    first = command.index("-map")
+    assert command[first : first + 8] == ["-map", "0:3", "-c", "srt", "-f", "srt", "out.0.eng.srt", "-map"]
+    assert command[-5:] == ["-map", "0:5", "-c", "copy", "out.2.jpn.sup"]
+
+
+def test_extract_attachments(monkeypatch, tmp_path):
+    from box import Box
+    from fastflix import flix
+    from fastflix.cache import FileCache
+
+    streams = Box(
+        attachment=[
+            {"index": 5, "tags": {"filename": "cover.jpg"}},
+            {"index": 6, "tags": {"filename": "font.ttf"}},
+            {"index": 7, "tags": {"filename": "cover_land.png"}},
+        ]
+    )
+    covers = flix.cover_attachments(streams)
+    assert covers == [(5, "cover.jpg"), (7, "cover_land.png")]
+    command = flix.attachment_extraction_command(Path("ffmpeg"), Path("in.mkv"), covers)
+    assert command.count("-i") == 1
+    assert command[-7:] == ["-map", "0:7", "-c", "copy", "-frames:v", "1", "cover_land.png"]
+
+    source = tmp_path / "in.mkv"
+    source.write_bytes(b"video")
+    runs = []
+
+    class FakePopen:
+        returncode = 0
+
+        def __init__(self, command, cwd, **_):
+            runs.append(command)
+            for name in command[command.index("-i") + 8 :: 7]:
+                (Path(cwd) / name).write_bytes(name.encode())
+
+        def communicate(self, timeout=None):
+            return b"", b""
+
+    monkeypatch.setattr(flix, "Popen", FakePopen)
+    cache = FileCache(tmp_path / "cache", 1_000_000)
+
+    files = flix.extract_attachments(Path("ffmpeg"), source, covers, tmp_path / "first", cache)
+    assert [x.name for x in files] == ["cover.jpg", "cover_land.png"]
+    assert len(runs) == 1
+
+    # A later load of the same source is copied out of the cache
+    files = flix.extract_attachments(Path("ffmpeg"), source, covers, tmp_path / "second", cache)
+    assert len(runs) == 1
+    assert (tmp_path / "second" / "cover.jpg").read_bytes() == b"cover.jpg"
+
+
+def test_extract_hdr10plus_metadata(monkeypatch, tmp_path):
+    import io
+
+    from box import Box
+    from packaging import version
+    from fastflix import flix
+    from fastflix.cache import FileCache
+
+    source = tmp_path / "in.mkv"
+    source.write_bytes(b"video")
+    monkeypatch.setattr(flix, "HDR10_parser_version", version.parse("1.6.0"))
+    config = Box(ffmpeg="ffmpeg", hdr10plus_parser="hdr10plus_tool")
+    runs = []
+
+    class FakePopen:
+        def __init__(self, command, **_):
+            runs.append(command)
+            self.command = command
+            self.returncode = 0
+            self.stdout = io.BytesIO()
+            self.stderr = io.BytesIO(
+                b"frame=24\nfps=12.5\nout_time=00:00:01.000000\nspeed=0.5x\nprogress=continue\n"
+                b"frame=48\nout_time=00:00:02.000000\nprogress=end\n"
+            )
+
+        def wait(self):
+            return 0
+
+        def communicate(self):
+            Path(self.command[self.command.index("-o") + 1]).write_text('{"SceneInfo": []}')
+            return "done", ""
+
+    monkeypatch.setattr(flix, "Popen", FakePopen)
+    cache = FileCache(tmp_path / "cache", 1_000_000, suffix=".json")
+    updates = []
+
+    output = flix.extract_hdr10plus_metadata(config, source, 0, tmp_path / "metadata.json", cache, updates.append)
+    assert output.read_text() == '{"SceneInfo": []}'
+    assert runs[0][runs[0].index("-progress") + 1] == "pipe:2"
+    assert runs[1][:2] == ["hdr10plus_tool", "extract"]
+    assert updates == [
+        "frame=24 fps=12.5 time=00:00:01.000000 speed=0.5x",
+        "frame=48 fps=0 time=00:00:02.000000 speed=",
+    ]
+
+    # The same track of the same source comes straight from the cache
+    again = flix.extract_hdr10plus_metadata(config, source, 0, tmp_path / "again.json", cache)
+    assert len(runs) == 2
+    assert again.read_text() == '{"SceneInfo": []}'
+
+
+def test_concat_index(monkeypatch, tmp_path):
+    from box import Box
+    from fastflix import flix
+
+    files = []
+    for name in ("a.mkv", "b.mkv", "c.png"):
+        files.append(tmp_path / name)
+        files[-1].write_bytes(b"")
+    concat_file = tmp_path / "concat.txt"
+    concat_file.write_text("\n".join(f"file '{x}'" for x in files))
+    durations = {"a.mkv": '{"format": {"duration": "10.5"}}', "b.mkv": '{"format": {"duration": "20"}}'}
+    monkeypatch.setattr(
+        flix, "execute", lambda command, **_: Box(stdout=durations.get(Path(command[-1]).name, "{}"), returncode=0)
+    )
+
+    index = flix.build_concat_index(Box(ffprobe="ffprobe"), concat_file)
+    assert index.durations == [10.5, 20, 0]
+    assert index.offsets == [0, 10.5, 30.5]
+    assert index.duration == 30.5
+    assert index.locate(0) == (files[0], 0)
+    assert index.locate(12) == (files[1], 1.5)
+    assert index.locate(100) == (files[2], 0)
+    assert index.locate_fraction(0.5) == (files[1], 4.75)
+
+    stills = index.model_copy(update={"durations": [0, 0, 0], "offsets": [0, 0, 0]})
+    assert stills.locate_fraction(0.5) == (files[1], 0)
+    assert stills.locate_fraction(1) == (files[2], 0)
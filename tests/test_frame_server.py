@@ -0,0 +1,47 @@
+# -*- coding: utf-8 -*-
+import io
+from pathlib import Path
+from types import SimpleNamespace
+
+from fastflix.frame_server import FrameServer
+
+
+def fake_server(times, frames, returncode=0, duration=0):
+    server = FrameServer(ffmpeg=Path("ffmpeg"), source=Path("in.mkv"), filters="[0:0]null[v]", duration=duration)
+    stderr = "".join(
+        f"[Parsed_showinfo_1 @ 0x0] n:{i} pts:{int(t * 1000)} pts_time:{t} duration:1\n" for i, t in enumerate(times)
+    )
+    server.process = SimpleNamespace(
+        stdout=io.BytesIO(b"".join(b"\xff\xd8" + frame + b"\xff\xd9" for frame in frames)),
+        stderr=io.BytesIO(stderr.encode("utf-8")),
+        wait=lambda: returncode,
+    )
+    server._read_timestamps()
+    server._read_frames()
+    return server
+
+
+def test_frame_server_nearest_keyframe():
+    server = fake_server([0.0, 2.0, 4.0], [b"a", b"b", b"c"])
+    assert "[v]showinfo[shown]" in server.command[server.command.index("-filter_complex") + 1]
+    assert server.finished
+    assert server.frame(0.4) == b"\xff\xd8a\xff\xd9"
+    assert server.frame(1.2) == b"\xff\xd8b\xff\xd9"
+    assert server.frame(100) == b"\xff\xd8c\xff\xd9"
+
+
+def test_frame_server_incomplete():
+    server = fake_server([0.0, 2.0], [b"a", b"b"], returncode=1)
+    assert not server.finished
+    assert server.frame(1.9) == b"\xff\xd8b\xff\xd9"
+    assert server.frame(2.5) is None
+
+
+def test_frame_server_thins_frames():
+    thinned = FrameServer(ffmpeg=Path("ffmpeg"), source=Path("in.mkv"), filters="", duration=10, max_frames=10)
+    assert thinned.min_interval == 1
+    thinned._pending_times = [0.0, 0.5, 1.0, 1.5, 2.0]
+    for frame in (b"a", b"b", b"c", b"d", b"e"):
+        thinned._add_frame(frame)
+    assert thinned.timestamps == [0.0, 1.0, 2.0]
+    assert thinned.scanned_to == 2.0
@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+import subprocess
+import sys
+from pathlib import Path
+
+from fastflix.encoders.common.helpers import Command
+from fastflix.headless import QueueRunner, parse_progress
+from fastflix.models.video import Video, VideoSettings
+
+
+def python_command(code: str) -> Command:
+    return Command(command=f'"{sys.executable}" -c "{code}"')
+
+
+def queued_video(tmp_path: Path, *codes: str) -> Video:
+    return Video(
+        source=tmp_path / "source.mkv",
+        duration=20,
+        work_path=tmp_path / "work",
+        video_settings=VideoSettings(
+            output_path=tmp_path / "output.mkv",
+            conversion_commands=[python_command(code) for code in codes],
+        ),
+    )
+
+
+def run(queue, **kwargs):
+    events, saves = [], []
+    runner = QueueRunner(queue, save=saves.append, emit=events.append, poll=0.01, progress_interval=0, **kwargs)
+    return runner.run(), events, saves
+
+
+def test_headless_parse_progress():
+    line = "frame=  240 fps= 48 q=28.0 size=    1024kB time=00:01:10.01 bitrate= 838.8kbits/s speed=1.2x"
+    assert parse_progress(line) == {"frame": 240, "fps": 48.0, "time": 70.01, "speed": 1.2, "bitrate": "838.8kbits/s"}
+    assert parse_progress("frame=    0 fps=0.0 q=0.0 size=N/A time=N/A bitrate=N/A speed=N/A") == {"frame": 0, "fps": 0}
+    assert parse_progress("Stream mapping:") is None
+
+
+def test_headless_queue_runner(tmp_path):
+    progress = "import sys; sys.stderr.write('frame= 10 fps=5 time=00:00:05.00 speed=2x' + chr(10))"
+    two_step = queued_video(tmp_path, progress, "print(1)")
+    failing = queued_video(tmp_path, "raise SystemExit(3)")
+    done = queued_video(tmp_path, "print(1)")
+    done.status.complete = True
+    # Left over from a run that was stopped part way through
+    two_step.status.running = True
+
+    success, events, saves = run([two_step, failing, done], workers=2, ignore_errors=True)
+    assert not success
+    assert two_step.status.complete and two_step.status.current_command == 2
+    assert failing.status.error
+    assert [e["event"] for e in events if e.get("video") == two_step.uuid] == [
+        "start",
+        "progress",
+        "command_complete",
+        "start",
+        "complete",
+    ]
+    assert next(e for e in events if e["event"] == "progress")["percent"] == 25
+    assert events[-1] == {"event": "done", "complete": 2, "error": 1, "remaining": 0}
+    assert len(saves) == 3
+
+
+def test_headless_stops_on_error(tmp_path):
+    queue = [queued_video(tmp_path, "raise SystemExit(1)"), queued_video(tmp_path, "print(1)")]
+    success, events, _ = run(queue)
+    assert not success
+    assert queue[1].status.ready
+    assert events[-1]["remaining"] == 1
+
+
+def test_headless_does_not_import_qt():
+    code = "import sys, fastflix.entry, fastflix.headless; print(any(m.startswith('PySide6') for m in sys.modules))"
+    assert subprocess.run([sys.executable, "-c", code], capture_output=True, text=True).stdout.strip() == "False"
+
+
+def test_headless_runs_independent_commands_together(tmp_path):
+    marker = tmp_path / "started"
+    # The first command waits for the second to start, so only finishes if they run side by side
+    wait = f"import time, pathlib; exec('while not pathlib.Path(r\\'{marker}\\').exists(): time.sleep(0.01)')"
+    video = queued_video(tmp_path, wait, f"import pathlib; pathlib.Path(r'{marker}').touch()", "print(1)")
+    first, second, last = video.video_settings.conversion_commands
+    first.depends_on, second.depends_on = [], []
+    last.depends_on = [first.uuid, second.uuid]
+
+    success, events, _ = run([video], workers=2)
+    assert success and video.status.complete
+    assert video.status.current_command == 3 and video.status.finished_commands == []
+    steps = [(e["event"], e["command"]) for e in events if e["event"] in ("start", "command_complete")]
+    assert steps[:2] == [("start", 1), ("start", 2)]
+    assert sorted(steps[2:4]) == [("command_complete", 1), ("command_complete", 2)]
+    assert steps[4:] == [("start", 3)]
+
+
+def test_headless_uses_saved_config(tmp_path, monkeypatch):
+    from fastflix import headless
+    from fastflix.ff_queue import save_queue
+    from fastflix.models.config import Config
+
+    for name in ("ffmpeg", "ffprobe"):
+        (tmp_path / name).touch()
+    config_file = tmp_path / "fastflix.yaml"
+    saved = Config(ffmpeg=tmp_path / "ffmpeg", ffprobe=tmp_path / "ffprobe", work_path=tmp_path / "ws")
+    saved.config_path = config_file
+    saved.save()
+    queue_file = tmp_path / "queue.yaml"
+    save_queue([], queue_file)
+    monkeypatch.setenv("FF_CONFIG", str(config_file))
+
+    used = {}
+
+    class Runner:
+        def __init__(self, queue, **kwargs):
+            used.update(kwargs)
+
+        def run(self):
+            return True
+
+    monkeypatch.setattr(headless, "QueueRunner", Runner)
+    assert headless.run_queue(["--queue", str(queue_file)]) == 0
+    assert used["config"].ffprobe == tmp_path / "ffprobe"
+    assert used["config"].work_path == tmp_path / "ws"
@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from pathlib import Path
+
+from fastflix import ladder
+from fastflix.encoders.avc_x264 import main as x264
+from fastflix.models.encode import x264Settings
+from fastflix.models.video import Crop, Rendition, VideoSettings
+from tests.conftest import create_fastflix_instance
+
+
+def ladder_instance(tmp_path, renditions, **settings):
+    fastflix = create_fastflix_instance(
+        x264Settings(**settings), VideoSettings(ladder=ladder.parse_ladder(renditions), remove_hdr=False)
+    )
+    fastflix.current_video.work_path = tmp_path
+    fastflix.current_video.video_settings.output_path = tmp_path / "output.mkv"
+    fastflix.current_video.streams.video[0].update(width=1920, height=1080)
+    return fastflix
+
+
+def test_parse_ladder():
+    assert ladder.parse_ladder("720p 24, 480 1500k, 360p 2.5M, 240p 27.5") == [
+        Rendition(height=720, quality=24),
+        Rendition(height=480, bitrate="1500k"),
+        Rendition(height=360, bitrate="2.5M"),
+        Rendition(height=240, quality=27.5),
+    ]
+    assert ladder.parse_ladder("720p, fast, ") == []
+    # Each height is written to its own file name, so only the first of a height is kept
+    assert ladder.parse_ladder("720p 3000k, 720p 1500k") == [Rendition(height=720, bitrate="3000k")]
+    assert ladder.ladder_text(ladder.parse_ladder("720p 24, 480p 1500k")) == "720p 24, 480p 1500k"
+    assert ladder.rendition_path(Path("movie.mkv"), 720) == Path("movie_720p.mkv")
+
+
+def test_ladder_build(tmp_path):
+    fastflix = ladder_instance(tmp_path, "720p 26, 480p 28", crf=22)
+    (command,) = ladder.build(fastflix, x264)
+    assert command.name == "Single pass CRF, 3 renditions"
+    assert command.command.count("-i ") == 1
+    assert command.command.count("-filter_complex") == 1
+    assert "split=3" in command.command
+    for label, crf, output in (("v0", 22, "output"), ("v1", 26, "output_720p"), ("v2", 28, "output_480p")):
+        assert f'-map "[{label}]"' in command.command
+        assert f"-crf:v {crf}" in command.command
+        assert f'"{tmp_path / output}.mkv"' in command.command
+
+    # Renditions are never upscaled, or written twice to the same file
+    fastflix = ladder_instance(tmp_path, "720p 26", crf=22)
+    fastflix.current_video.video_settings.ladder += [Rendition(height=720, quality=30), Rendition(height=2160)]
+    (command,) = ladder.build(fastflix, x264)
+    assert command.name == "Single pass CRF, 2 renditions"
+    assert "split=2" in command.command and "2160" not in command.command
+    assert command.command.count(f'"{tmp_path / "output_720p"}.mkv"') == 1
+    fastflix.current_video.video_settings.crop = Crop(width=1920, height=536)
+    (command,) = ladder.build(fastflix, x264)
+    assert "split" not in command.command and "output_720p" not in command.command
+
+    # Two pass renditions run both passes together
+    first, second = ladder.build(ladder_instance(tmp_path, "720p 3000k", crf=None, bitrate="6000k"), x264)
+    assert first.command.count("-pass 1") == 2
+    assert second.command.count("-pass 2") == 2
+
+    # Renditions have to match the main output's passes, or they are left out
+    (command,) = ladder.build(ladder_instance(tmp_path, "720p 3000k", crf=22), x264)
+    assert "-map" in command.command and "split" not in command.command
@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+from pathlib import Path
+
+from box import Box
+
+from fastflix.encoders.hevc_x265 import main as x265
+from fastflix.flix import auto_crop_times, select_auto_crop
+from fastflix.models.encode import x265Settings
+from fastflix.models.profiles import AdvancedOptions, AudioMatch, MatchItem, MatchType, Profile
+from fastflix.planner import apply_profile, audio_tracks, output_name, source_hdr10, subtitle_tracks
+from tests.conftest import create_fastflix_instance
+
+
+def audio_stream(index, language, channels, title=""):
+    return Box(
+        index=index,
+        codec_name="ac3",
+        channels=channels,
+        tags={"language": language, "title": title},
+        disposition={"default": int(index == 1)},
+    )
+
+
+def subtitle_stream(index, language, **disposition):
+    return Box(
+        index=index,
+        codec_name="subrip",
+        tags={"language": language},
+        disposition={"default": 0, "forced": 0, **disposition},
+    )
+
+
+def source_video():
+    fastflix = create_fastflix_instance(x265Settings())
+    video = fastflix.current_video
+    video.streams.audio = [
+        audio_stream(1, "eng", 6),
+        audio_stream(2, "jpn", 2),
+        audio_stream(3, "eng", 2, "Commentary"),
+    ]
+    video.streams.subtitle = [
+        subtitle_stream(4, "jpn", forced=1),
+        subtitle_stream(5, "eng"),
+        subtitle_stream(6, "eng", forced=1),
+    ]
+    video.streams.attachment = []
+    return fastflix, video
+
+
+def test_planner_audio_filters():
+    _, video = source_video()
+    assert all(track.enabled for track in audio_tracks(video, Profile()))
+
+    profile = Profile(
+        audio_filters=[
+            AudioMatch(match_type=MatchType.ALL, match_item=MatchItem.LANGUAGE, match_input="eng", conversion="aac"),
+            AudioMatch(match_type=MatchType.FIRST, match_item=MatchItem.CHANNELS, match_input="6", downmix="stereo"),
+        ]
+    )
+    tracks = audio_tracks(video, profile)
+    assert [(track.index, track.enabled, track.original) for track in tracks] == [
+        (1, True, True),
+        (2, False, True),
+        (3, True, True),
+        (1, True, False),
+    ]
+    assert tracks[0].conversion_codec == "aac"
+    assert tracks[3].downmix == "stereo"
+    assert len(audio_tracks(video, profile, original_only=True)) == 3
+
+    # Nothing matching still leaves the video with some audio
+    no_match = Profile(
+        audio_filters=[AudioMatch(match_type=MatchType.ALL, match_item=MatchItem.TRACK, match_input="9")]
+    )
+    assert [track.enabled for track in audio_tracks(video, no_match)] == [True, False, False]
+
+
+def test_planner_subtitle_selection():
+    fastflix, video = source_video()
+    profile = Profile(
+        subtitle_select=True,
+        subtitle_select_preferred_language=True,
+        subtitle_language="eng",
+        subtitle_select_first_matching=True,
+        subtitle_automatic_burn_in=True,
+    )
+    tracks = subtitle_tracks(video, profile, fastflix.config)
+    assert [track.enabled for track in tracks] == [False, True, False]
+    assert [track.burn_in for track in tracks] == [False, False, True]
+
+    fastflix.config.disable_automatic_subtitle_burn_in = True
+    assert not any(track.burn_in for track in subtitle_tracks(video, profile, fastflix.config))
+    assert not any(track.enabled for track in subtitle_tracks(video, Profile(), fastflix.config))
+
+
+def test_planner_apply_profile(tmp_path):
+    fastflix, video = source_video()
+    fastflix.encoders = {x265.name: x265}
+    fastflix.config.output_directory = tmp_path
+    fastflix.config.output_name_format = "{source}-encoded"
+    master_display = Box(red="(1,1)", green="(1,1)", blue="(1,1)", white="(1,1)", luminance="(1000,1)")
+    video.hdr10_streams = [Box(index=0, master_display=master_display, cll="1000,300")]
+    profile = Profile(
+        encoder=x265.name,
+        output_type=".mp4",
+        x265=x265Settings(crf=20),
+        subtitle_select=True,
+        subtitle_automatic_burn_in=True,
+        advanced_options=AdvancedOptions(denoise_type_index=1, denoise_strength_index=2, brightness="0.1"),
+    )
+    apply_profile(fastflix, video, profile)
+
+    settings = video.video_settings
+    assert settings.output_path == tmp_path / "input-encoded.mp4"
+    assert settings.video_encoder_settings.crf == 20
+    assert settings.video_encoder_settings.hdr10 and settings.video_encoder_settings.repeat_headers
+    assert profile.x265.hdr10 is False
+    assert settings.denoise.startswith("nlmeans")
+    assert settings.brightness == "0.1"
+    assert settings.fast_seek is False
+    assert [track.outdex for track in video.audio_tracks] == [1, 2, 3]
+    assert [(track.outdex, track.enabled) for track in video.subtitle_tracks][0] == (4, True)
+    assert "-crf:v 20" in settings.conversion_commands[0].command
+
+
+def test_planner_hdr10_follows_source():
+    _, video = source_video()
+    settings = x265Settings(hdr10=True, hdr10_opt=True, repeat_headers=True)
+    source_hdr10(settings, video)
+    assert not settings.hdr10 and not settings.hdr10_opt and not settings.repeat_headers
+
+
+def test_planner_auto_crop_and_names():
+    assert auto_crop_times(100, 4) == [10, 28, 46, 64]
+    assert auto_crop_times(2, 10) == [0, 1]
+    assert select_auto_crop([[0, 140, 0, 140], [0, 130, 0, 138]], 1920, 1080) == [0, 130, 0, 138]
+    assert select_auto_crop([[0, 1000, 0, 0]], 1920, 1080) is None
+    assert select_auto_crop([], 1920, 1080) is None
+
+    fastflix, _ = source_video()
+    fastflix.config.output_name_format = "{source}-{rand_8}"
+    name = output_name(fastflix.config, Path("movies", "film.mkv"))
+    assert name.startswith("film-") and len(name) == len("film-") + 8
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+import sys
+import time
+
+from PySide6 import QtCore
+
+from fastflix.widgets.background_tasks import PreviewScheduler
+
+
+png = "iVBORw0KGgoAAAANSUhEUgAAAAIAAAACCAIAAAD91JpzAAAACXBIWXMAAA9hAAAPYQGoP6dpAAAAC0lEQVQImWNgQAYAAA4AAbGa6gYAAAAASUVORK5CYII="
+
+
+def write_image(delay=0.0):
+    return [
+        sys.executable,
+        "-c",
+        f"import base64, sys, time; time.sleep({delay}); sys.stdout.buffer.write(base64.b64decode('{png}'))",
+    ]
+
+
+def wait_for(condition, timeout=10):
+    app = QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+    end = time.time() + timeout
+    while not condition() and time.time() < end:
+        app.processEvents()
+        time.sleep(0.01)
+
+
+def test_preview_scheduler_latest_wins():
+    scheduler = PreviewScheduler(None)
+    results = []
+    scheduler.completed.connect(lambda status, job: results.append((status, job)))
+
+    slow = scheduler.submit(write_image(delay=5))
+    skipped = scheduler.submit(write_image())
+    latest = scheduler.submit(write_image(), key="abc")
+
+    wait_for(lambda: results)
+    wait_for(lambda: scheduler._running is None, timeout=2)
+
+    assert len(results) == 1
+    status, job = results[0]
+    assert status == 1
+    assert job is latest
+    assert job.key == "abc"
+    assert slow.cancelled
+    assert skipped.process is None
+    assert not slow.data
+    assert job.image.width() == 2
+    assert job.data.startswith(b"\x89PNG")
+
+
+def test_preview_scheduler_failure():
+    scheduler = PreviewScheduler(None)
+    results = []
+    scheduler.completed.connect(lambda status, job: results.append(status))
+
+    scheduler.submit([sys.executable, "-c", "raise SystemExit(1)"])
+    wait_for(lambda: results)
+    assert results == [0]
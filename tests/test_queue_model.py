@@ -0,0 +1,40 @@
+# -*- coding: utf-8 -*-
+from pathlib import Path
+
+from fastflix.models.encode import x265Settings
+from fastflix.models.video import Video
+from fastflix.widgets.panels.queue_panel import QueueModel, schedule_text, video_status
+from tests.conftest import create_fastflix_instance
+
+
+def test_queue_model_rows():
+    fastflix = create_fastflix_instance(x265Settings())
+    fastflix.conversion_list = [Video(source=Path(f"{name}.mkv"), duration=60) for name in ("a", "b", "c")]
+    for video in fastflix.conversion_list:
+        video.video_settings.output_path = video.source.with_suffix(".mp4")
+    model = QueueModel(fastflix)
+    model.refresh()
+    assert model.rowCount() == 3
+    assert model.data(model.index(1)) == "b.mp4"
+    assert model.data(model.index(2), QueueModel.video_role) is fastflix.conversion_list[2]
+
+    # A changed video only updates its own row
+    changed = []
+    model.dataChanged.connect(lambda first, last: changed.append((first.row(), last.row())))
+    fastflix.conversion_list[1].status.running = True
+    model.video_changed(fastflix.conversion_list[1])
+    assert changed == [(1, 1)]
+    assert video_status(model.data(model.index(1), QueueModel.video_role)).startswith("Encoding command 1")
+
+    # Rows only move once the queue is refreshed
+    removed = fastflix.conversion_list.pop(0)
+    model.video_changed(removed)
+    assert model.rowCount() == 3
+    model.refresh()
+    assert model.rowCount() == 2
+    model.video_changed(removed)
+    assert changed == [(1, 1), (0, 0)]
+    assert model.rowCount(model.index(0)) == 0
+
+    fastflix.conversion_list[0].priority = 2
+    assert schedule_text(fastflix.conversion_list[0]) == "Priority: Urgent"
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+from datetime import datetime
+from pathlib import Path
+
+from fastflix.encoders.common.helpers import Command
+from fastflix.models.video import EncodeEstimate, Video, VideoSettings
+from fastflix.queue_scheduler import next_video, queue_order
+
+
+def queued(name: str, duration: float, **fields) -> Video:
+    return Video(
+        source=Path(f"{name}.mkv"),
+        duration=duration,
+        video_settings=VideoSettings(conversion_commands=[Command(command="a"), Command(command="b")]),
+        **fields,
+    )
+
+
+def names(videos):
+    return [video.source.stem for video in videos]
+
+
+def test_queue_order_policies():
+    feature = queued("feature", 36000, deadline=datetime(2026, 10, 21, 9))
+    clip = queued("clip", 120)
+    episode = queued("episode", 2700, deadline=datetime(2026, 10, 20, 18))
+    done = queued("done", 60)
+    done.status.complete = True
+    queue = [feature, clip, episode, done]
+
+    assert names(queue_order(queue)) == ["feature", "clip", "episode"]
+    assert names(queue_order(queue, "shortest")) == ["clip", "episode", "feature"]
+    assert names(queue_order(queue, "deadline")) == ["episode", "feature", "clip"]
+    assert names(queue_order(queue, "unknown")) == ["feature", "clip", "episode"]
+
+    # Higher priority classes go first whatever the policy
+    clip.priority = -1
+    feature.priority = 1
+    assert names(queue_order(queue, "shortest")) == ["feature", "episode", "clip"]
+    assert next_video([done]) is None
+
+
+def test_queue_order_estimates_and_best_fit():
+    short_slow = queued("short_slow", 600)
+    long_fast = queued("long_fast", 1200)
+    assert names(queue_order([short_slow, long_fast], "shortest")) == ["short_slow", "long_fast"]
+    # Estimates are used once every video has one
+    short_slow.estimate = EncodeEstimate(
+        size=1, size_low=1, size_high=1, seconds=900, seconds_low=800, seconds_high=1000
+    )
+    long_fast.estimate = short_slow.estimate.model_copy(update={"seconds": 300})
+    assert names(queue_order([short_slow, long_fast], "shortest")) == ["long_fast", "short_slow"]
+
+    feature = queued("feature", 36000)
+    clip = queued("clip", 120)
+    episode = queued("episode", 2700)
+    movie = queued("movie", 7200)
+    queue = [movie, clip, episode]
+    # Nothing encoding yet, so in queue order
+    assert names(queue_order(queue, "best-fit")) == ["movie", "clip", "episode"]
+    # Half of the feature is left, the longest video that is done before it goes first
+    feature.status.running = True
+    feature.status.current_command = 1
+    assert names(queue_order([feature, *queue], "best-fit", running=[feature])) == ["movie", "episode", "clip"]
+    # With less time left than the movie needs, it waits for the ones that fit
+    feature.duration = 6000
+    assert names(queue_order([feature, *queue], "best-fit", running=[feature])) == ["episode", "clip", "movie"]
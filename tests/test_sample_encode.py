@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+from pathlib import Path
+
+from fastflix.encoders.hevc_x265.command_builder import build
+from fastflix.models.encode import x265Settings
+from fastflix.sample_encode import (
+    QualityReport,
+    SampleResult,
+    SampleWindow,
+    parse_scores,
+    quality_command,
+    sample_video,
+    sample_windows,
+)
+
+from tests.conftest import create_fastflix_instance
+
+ffmpeg_output = """
+[Parsed_ssim_4 @ 0x1] SSIM Y:0.981 (17.2) U:0.990 (20.1) V:0.989 (19.8) All:0.984321 (18.05)
+[Parsed_psnr_5 @ 0x2] PSNR y:38.1 u:44.0 v:43.5 average:39.612345 min:35.1 max:45.2
+[Parsed_libvmaf_6 @ 0x3] VMAF score: 93.456789
+"""
+
+
+def test_sample_windows():
+    windows = sample_windows(100, count=4, length=5)
+    assert [x.start for x in windows] == [10, 35, 60, 85]
+    assert all(x.duration == 5 for x in windows)
+
+    trimmed = sample_windows(100, count=2, length=5, start=20, end=40)
+    assert [x.start for x in trimmed] == [22.5, 32.5]
+
+    assert [(x.start, x.duration) for x in sample_windows(12, count=4, length=5)] == [(0, 12)]
+    assert sample_windows(0) == []
+
+
+def test_parse_scores():
+    assert parse_scores(ffmpeg_output) == {"ssim": 0.984321, "psnr": 39.612345, "vmaf": 93.456789}
+    assert parse_scores("PSNR y:inf u:inf v:inf average:inf min:inf max:inf") == {"psnr": 100.0}
+    assert parse_scores("nothing here") == {}
+
+
+def test_sample_commands():
+    fastflix = create_fastflix_instance(encoder_settings=x265Settings(crf=22))
+    window = SampleWindow(index=1, start=30, duration=5)
+    video = sample_video(fastflix.current_video, window, Path("work", "sample_1.mkv"), Path("work"))
+
+    assert fastflix.current_video.video_settings.start_time == 0
+    assert video.video_settings.end_time == 35
+    assert video.audio_tracks == []
+
+    command = build(fastflix=fastflix.model_copy(update={"current_video": video}))[0].command
+    assert "-ss 30.0 -to 35.0 -i" in command
+    assert "sample_1.mkv" in command
+
+    result = SampleResult(window=window, output=Path("work", "sample_1.mkv"))
+    compare = quality_command(fastflix, video, result, ["ssim", "psnr", "libvmaf"])
+    filters = compare[compare.index("-filter_complex") + 1]
+    assert compare[compare.index("-ss") + 1] == "30.0"
+    assert "split=3[ref0][ref1][ref2]" in filters
+    assert filters.endswith("[dist2][ref2]libvmaf[dist3]")
+    assert compare[compare.index("-map") + 1] == "[dist3]"
+
+
+def test_quality_report():
+    window = SampleWindow(index=0, start=0, duration=2)
+    report = QualityReport(
+        samples=[
+            SampleResult(window=window, output=Path("a"), encode_seconds=2, frames=48, size=250_000, ssim=0.9, psnr=40),
+            SampleResult(window=window, output=Path("b"), encode_seconds=1, frames=48, ssim=0.8, psnr=30),
+            SampleResult(window=window, output=Path("c"), error="Cancelled"),
+        ],
+        wall_seconds=2,
+    )
+    assert report.samples[0].fps == 24
+    assert report.samples[0].bitrate == 1_000_000
+    assert round(report.ssim, 4) == 0.85
+    assert report.psnr == 35
+    assert report.vmaf is None
+    assert report.fps == 48
+    assert "Cancelled" in report.summary()
+
+
+def test_target_quality_search(monkeypatch, tmp_path):
+    from fastflix import sample_encode
+    from fastflix.sample_encode import apply_rate, rate_control, target_quality_search
+
+    fastflix = create_fastflix_instance(encoder_settings=x265Settings(crf=22, bitrate="3000k"))
+    assert rate_control(fastflix.current_video.video_settings.video_encoder_settings).attribute == "crf"
+
+    encoded = []
+
+    def fake_encode(sample_flix, build, window, work_dir, metrics, cancel_event, suffix, tag=""):
+        crf = sample_flix.current_video.video_settings.video_encoder_settings.crf
+        assert sample_flix.current_video.video_settings.video_encoder_settings.bitrate is None
+        assert metrics == ["ssim"]
+        encoded.append((window.index, crf))
+        return SampleResult(window=window, output=work_dir / f"{window.index}{tag}", ssim=1 - crf / 100)
+
+    monkeypatch.setattr(sample_encode, "encode_sample", fake_encode)
+    cache = {}
+    result = target_quality_search(fastflix, build, tmp_path, target=0.75, metric="ssim", count=2, cache=cache)
+    assert result.value == 25
+    assert result.reached
+    assert len(encoded) == 2 * len(result.scores)
+
+    # Every (sample, crf) pair is cached, so the same search again does not encode anything
+    encoded.clear()
+    again = target_quality_search(fastflix, build, tmp_path, target=0.75, metric="ssim", count=2, cache=cache)
+    assert again.value == 25
+    assert encoded == []
+
+    unreachable = target_quality_search(fastflix, build, tmp_path, target=1.5, metric="ssim", count=2, cache=cache)
+    assert unreachable.value == 1
+    assert not unreachable.reached
+
+    apply_rate(fastflix.current_video, result.value)
+    assert fastflix.current_video.video_settings.video_encoder_settings.crf == 25
+    assert "-crf:v 25" in build(fastflix=fastflix)[0].command
+
+
+def test_estimate_encode(monkeypatch, tmp_path):
+    from fastflix import sample_encode
+    from fastflix.sample_encode import confidence_bounds, estimate_encode
+
+    assert confidence_bounds([5.0]) == (5.0, 5.0, 5.0)
+    mean, low, high = confidence_bounds([100.0, 102.0])
+    assert mean == 101
+    assert round(high - mean, 3) == round(mean - low, 3) == 12.706
+    assert confidence_bounds([1.0, 9.0])[1] == 0
+
+    fastflix = create_fastflix_instance(encoder_settings=x265Settings(crf=22))
+    sizes = iter([1_000_000, 1_200_000, 800_000, 1_000_000])
+
+    def fake_encode(sample_flix, build, window, work_dir, metrics, cancel_event, suffix, tag="", keep_audio=False):
+        assert keep_audio
+        assert metrics == []
+        return SampleResult(window=window, output=work_dir / "x", size=next(sizes), encode_seconds=window.duration * 2)
+
+    monkeypatch.setattr(sample_encode, "encode_sample", fake_encode)
+    estimate = estimate_encode(fastflix, build, tmp_path, count=4, length=4)
+    assert estimate.samples == 4
+    # 250 KB per second of source over 60 seconds, taking twice real time
+    assert estimate.size == 15_000_000
+    assert estimate.size_low < estimate.size < estimate.size_high
+    assert estimate.seconds == estimate.seconds_low == estimate.seconds_high == 120
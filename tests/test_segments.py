@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+import json
+
+from fastflix import segments
+from fastflix.encoders.hevc_x265 import main as x265
+from fastflix.models.encode import x265Settings
+from fastflix.models.video import VideoSettings
+from tests.conftest import create_fastflix_instance
+
+
+def segmented_instance(tmp_path, **settings):
+    fastflix = create_fastflix_instance(x265Settings(**settings), VideoSettings(segment_length=20))
+    fastflix.current_video.work_path = tmp_path
+    fastflix.current_video.video_settings.output_path = tmp_path / "output.mkv"
+    return fastflix
+
+
+def test_segment_bounds():
+    assert segments.segment_bounds(0, 60, 20) == [(0, 20), (20, 40), (40, 60)]
+    # A short leftover joins the last segment
+    assert segments.segment_bounds(10, 74, 20) == [(10, 30), (30, 50), (50, 74)]
+    assert segments.segment_bounds(0, 15, 20) == [(0, 15)]
+
+
+def test_segments_build(tmp_path):
+    fastflix = segmented_instance(tmp_path)
+    commands = segments.build(fastflix, x265)
+    assert [command.name for command in commands] == [
+        "Segment 1 of 3",
+        "Segment 2 of 3",
+        "Segment 3 of 3",
+        "Join segments",
+    ]
+    assert "-ss 20 -to 40" in commands[1].command
+    assert str(tmp_path / "segments" / "segment_0001.mkv") in commands[1].command
+    assert "-map 1:v -c:v copy" in commands[-1].command
+    assert commands[-1].command.endswith(f'"{tmp_path / "output.mkv"}"')
+    # Segments can run side by side, the join waits on all of them
+    assert commands[1].depends_on == []
+    assert commands[-1].depends_on == [command.uuid for command in commands[:-1]]
+    assert segments.is_segmented(fastflix.current_video.model_copy(update={"video_settings": VideoSettings()})) is False
+
+    # Two pass encodes are left whole
+    two_pass = segmented_instance(tmp_path, bitrate="5000k", crf=None)
+    assert len(segments.build(two_pass, x265)) == 2
+
+
+def test_segments_resume(tmp_path):
+    fastflix = segmented_instance(tmp_path)
+    video = fastflix.current_video
+    video.video_settings.conversion_commands = segments.build(fastflix, x265)
+    folder = tmp_path / "segments"
+
+    video.status.current_command = 3
+    assert segments.resume(video) == 0
+    assert (folder / "segments.txt").read_text() == "".join(f"file 'segment_000{i}.mkv'\n" for i in range(3))
+
+    for i in range(3):
+        (folder / f"segment_000{i}.mkv").write_bytes(b"0" * 10)
+    (folder / "segment_0001.mkv").unlink()
+    video.status.current_command = 3
+    assert segments.resume(video) == 1
+
+    # Segments finished out of order are kept
+    video.status.current_command = 1
+    video.status.finished_commands = [video.video_settings.conversion_commands[2].uuid]
+    assert segments.resume(video) == 1
+    assert video.status.finished_commands == [video.video_settings.conversion_commands[2].uuid]
+
+    video.status.current_command = 3
+    (folder / "segment_0001.mkv").write_bytes(b"0" * 10)
+    assert segments.resume(video) == 3
+    assert json.loads((folder / "manifest.json").read_text())["segments"][2] == [40, 60]
+
+    segments.cleanup(video)
+    assert not folder.exists()
@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+import os
+import threading
+
+from box import Box
+
+from fastflix.watch_folder import FolderWatcher, has_video, ignored_file
+
+
+def test_watch_folder_scan(tmp_path):
+    existing = tmp_path / "existing.mkv"
+    existing.write_bytes(b"old")
+    watcher = FolderWatcher({tmp_path: "1080p Film"}, probe_file=None, found=None, settle=5)
+    watcher.seen.update(watcher._files(tmp_path))
+
+    video = tmp_path / "new.mkv"
+    video.write_bytes(b"a")
+    (tmp_path / "download.mkv.part").write_bytes(b"a")
+    (tmp_path / ".hidden.mkv").write_bytes(b"a")
+    assert watcher.scan(now=0) == []
+    assert list(watcher.pending) == [video]
+
+    # Still being written to
+    with open(video, "ab") as f:
+        f.write(b"more")
+    os.utime(video, ns=(1, 1))
+    assert watcher.scan(now=4) == []
+    assert watcher.scan(now=8) == []
+
+    assert watcher.scan(now=9) == [(video, "1080p Film")]
+    assert watcher.scan(now=20) == []
+    assert watcher.pending == {}
+
+    # Removed files are forgotten, so putting one back counts as new
+    existing.unlink()
+    watcher.scan(now=21)
+    assert existing not in watcher.seen
+    existing.write_bytes(b"new")
+    watcher.scan(now=22)
+    assert watcher.scan(now=30) == [(existing, "1080p Film")]
+
+
+def test_watch_folder_empty_files_wait(tmp_path):
+    watcher = FolderWatcher({tmp_path: "Standard Profile"}, probe_file=None, found=None, settle=1)
+    (tmp_path / "placeholder.mp4").touch()
+    watcher.scan(now=0)
+    assert watcher.scan(now=10) == []
+
+
+def test_watch_folder_probe(tmp_path):
+    found = []
+    done = threading.Event()
+
+    def probe_file(path):
+        if path.name == "song.flac":
+            return Box(streams=[{"codec_type": "audio"}, {"codec_type": "video", "disposition": {"attached_pic": 1}}])
+        if path.name == "notes.txt":
+            raise ValueError("Not a video")
+        return Box(streams=[{"codec_type": "video"}, {"codec_type": "audio"}])
+
+    def on_found(path, profile, details):
+        found.append((path.name, profile))
+        done.set()
+
+    watcher = FolderWatcher({tmp_path: "Standard Profile"}, probe_file=probe_file, found=on_found)
+    for name in ("song.flac", "notes.txt", "movie.mkv"):
+        watcher._probe(tmp_path / name, "Standard Profile")
+    assert done.is_set()
+    assert found == [("movie.mkv", "Standard Profile")]
+
+    assert not has_video(Box(streams=[]))
+    assert ignored_file(tmp_path / "Thumbs.db")
+    assert ignored_file(tmp_path / "movie.MKV.crdownload")
+    assert not ignored_file(tmp_path / "movie.mkv")